@@ -0,0 +1,199 @@
+"""
+批量采集多个视频的评论
+
+从文件读取视频ID或分享链接（每行一个，# 开头的行为注释），在同一个进程内
+用异步工作池并发采集，所有视频共享签名、HTTP连接、速率控制器和Cookie池。
+每个视频的结果逐页写入 data/v1/{aweme_id}/comments.csv（或 .parquet），最后输出JSON格式的汇总。
+
+命令行用法:
+    python batch.py videos.txt [--concurrency 4] [--per-cookie 2] [--replies] [--delta] [--format csv] [--dataset] [--summary summary.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+
+from cookie_pool import CookiePool
+from http_client import client_session, get_client
+from main import crawl_video, get_cookie_source
+
+# 默认同时采集的视频数
+DEFAULT_CONCURRENCY = int(os.getenv('DOUYIN_BATCH_CONCURRENCY', '4'))
+# 默认每个Cookie同时进行的请求数
+DEFAULT_PER_COOKIE = int(os.getenv('DOUYIN_BATCH_PER_COOKIE', '2'))
+
+VIDEO_ID_PATTERNS = [
+    r'/video/(\d+)',
+    r'/note/(\d+)',
+    r'modal_id=(\d+)',
+]
+SHORT_LINK_PATTERN = r'https?://v\.douyin\.com/[^\s<>"]+'
+
+
+def read_video_list(path: str) -> List[str]:
+    """读取视频列表文件，忽略空行和注释"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+async def resolve_video_id(text: str) -> Optional[str]:
+    """
+    从视频ID、视频链接或分享文本中提取视频ID
+
+    Args:
+        text: 视频ID、完整链接或包含短链接的分享文本
+
+    Returns:
+        Optional[str]: 视频ID，无法识别时返回None
+    """
+    if text.isdigit():
+        return text
+    for pattern in VIDEO_ID_PATTERNS:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(1)
+
+    # 短链接需要跟随重定向获取完整链接
+    match = re.search(SHORT_LINK_PATTERN, text)
+    if not match:
+        return None
+    try:
+        response = await get_client().get(match.group(0), follow_redirects=True, timeout=10)
+    except Exception as e:
+        logger.warning(f"解析短链接失败: {str(e)}")
+        return None
+    for pattern in VIDEO_ID_PATTERNS:
+        match = re.search(pattern, str(response.url))
+        if match:
+            return match.group(1)
+    return None
+
+
+async def run_batch(entries: List[str], concurrency: int = DEFAULT_CONCURRENCY, per_cookie: int = DEFAULT_PER_COOKIE,
+                    get_replies: bool = False, delta: bool = False, output_format: Optional[str] = None,
+                    export_dataset: Optional[bool] = None) -> dict:
+    """
+    并发采集多个视频
+
+    使用Cookie池时，每个Cookie最多同时进行 per_cookie 个请求，请求在池中的Cookie之间分配；
+    只有单个Cookie时，同时采集的视频数不超过 per_cookie。
+    解析后视频ID相同的条目（如同一个视频的分享链接和ID）只采集一次，其余标记为 duplicate。
+
+    Args:
+        entries: 视频ID或分享链接列表
+        concurrency: 同时采集的视频数
+        per_cookie: 每个Cookie的并发上限
+        get_replies: 是否采集回复
+        delta: 已有采集结果时是否只采集新增评论
+        output_format: csv 或 parquet，默认读取 DOUYIN_OUTPUT_FORMAT 环境变量
+        export_dataset: 是否把结果追加到分区 Parquet 数据集，默认读取 DOUYIN_EXPORT_DATASET 环境变量
+
+    Returns:
+        dict: 批量采集汇总
+    """
+    cookie = get_cookie_source()
+    if isinstance(cookie, CookiePool):
+        cookie.max_in_flight = per_cookie
+    else:
+        concurrency = min(concurrency, per_cookie)
+    concurrency = max(1, concurrency)
+
+    queue = asyncio.Queue()
+    for index, entry in enumerate(entries):
+        queue.put_nowait((index, entry))
+    results = [None] * len(entries)
+    claimed = {}  # 视频ID -> 第一次出现的条目序号
+    started_at = time.time()
+
+    async def worker():
+        while True:
+            try:
+                index, entry = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = {'input': entry, 'aweme_id': None, 'status': 'failed', 'comments': 0, 'replies': 0,
+                      'path': None, 'dataset_path': None, 'duration': 0.0, 'error': None}
+            video_started = time.time()
+            try:
+                aweme_id = await resolve_video_id(entry)
+                if not aweme_id:
+                    raise ValueError("无法识别视频ID")
+                result['aweme_id'] = aweme_id
+                if aweme_id in claimed:
+                    # 同时写同一个结果文件和断点会互相覆盖
+                    result['status'] = 'duplicate'
+                    result['error'] = f"与第 {claimed[aweme_id] + 1} 项是同一个视频"
+                    logger.warning(f"[{index + 1}/{len(entries)}] {entry} {result['error']}，跳过")
+                    results[index] = result
+                    continue
+                claimed[aweme_id] = index
+                logger.info(f"[{index + 1}/{len(entries)}] 开始采集视频 {aweme_id}")
+                stats = await crawl_video(aweme_id, get_replies=get_replies, delta=delta, output_format=output_format,
+                                          export_dataset=export_dataset)
+                result.update(stats)
+                result['status'] = 'ok' if stats['path'] else 'empty'
+            except Exception as e:
+                result['error'] = str(e)
+                logger.error(f"[{index + 1}/{len(entries)}] 采集 {entry} 失败: {str(e)}")
+            result['duration'] = round(time.time() - video_started, 2)
+            results[index] = result
+
+    logger.info(f"开始批量采集 {len(entries)} 个视频，并发数: {concurrency}")
+    async with client_session():
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(entries)))))
+
+    return {
+        'started_at': datetime.fromtimestamp(started_at).isoformat(timespec='seconds'),
+        'duration': round(time.time() - started_at, 2),
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'empty': sum(1 for r in results if r['status'] == 'empty'),
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'duplicate': sum(1 for r in results if r['status'] == 'duplicate'),
+        'comments': sum(r['comments'] for r in results),
+        'replies': sum(r['replies'] for r in results),
+        'videos': results,
+    }
+
+
+def main(argv: List[str]) -> int:
+    """批量采集命令行"""
+    parser = argparse.ArgumentParser(description="批量采集抖音视频评论")
+    parser.add_argument('file', help="视频ID或分享链接列表文件，每行一个")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="同时采集的视频数")
+    parser.add_argument('--per-cookie', type=int, default=DEFAULT_PER_COOKIE, help="每个Cookie的并发上限")
+    parser.add_argument('--replies', action='store_true', help="同时采集评论回复")
+    parser.add_argument('--delta', action='store_true', help="已有采集结果时只采集新增评论")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="结果文件格式，默认读取 DOUYIN_OUTPUT_FORMAT 环境变量，未设置时为csv")
+    parser.add_argument('--dataset', action='store_true', default=None,
+                        help="把结果追加到按视频ID和采集日期分区的 Parquet 数据集，默认读取 DOUYIN_EXPORT_DATASET 环境变量")
+    parser.add_argument('--summary', help="汇总JSON保存路径，默认 data/v1/batch_<时间>.json")
+    args = parser.parse_args(argv)
+
+    entries = read_video_list(args.file)
+    if not entries:
+        logger.error("视频列表为空")
+        return 1
+
+    summary = asyncio.run(run_batch(entries, args.concurrency, args.per_cookie, args.replies, args.delta, args.format,
+                                  args.dataset))
+
+    summary_path = args.summary or f"data/v1/batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    logger.info(f"批量采集完成，成功 {summary['succeeded']}，无评论 {summary['empty']}，失败 {summary['failed']}，重复 {summary['duplicate']}，汇总已保存到 {summary_path}")
+    return 0 if summary['failed'] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
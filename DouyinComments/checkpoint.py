@@ -0,0 +1,122 @@
+"""
+评论采集断点
+
+长时间采集时定期把进度（下一页cursor、已写入的页数和评论数）保存到本地文件，
+采集中断或达到最大重试次数后可以从最后一个成功的cursor继续，不必从头开始。
+断点文件大小固定，不随采集量增长；继续采集时已获取的评论ID从结果写入器的临时文件重建。
+"""
+import json
+import os
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+# 断点文件默认保存目录
+DEFAULT_CHECKPOINT_DIR = os.getenv(
+    'DOUYIN_CHECKPOINT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints'),
+)
+# 每写入多少页保存一次断点
+CHECKPOINT_INTERVAL = int(os.getenv('DOUYIN_CHECKPOINT_INTERVAL', '5'))
+
+
+class CrawlCheckpoint:
+    """
+    单个视频的采集断点
+
+    Args:
+        aweme_id: 视频ID
+        directory: 断点文件目录
+        interval: 每写入多少页保存一次
+        on_save: 保存断点前调用，用于先把已处理的页面写入磁盘
+    """
+
+    def __init__(self, aweme_id: str, directory: str = DEFAULT_CHECKPOINT_DIR, interval: int = CHECKPOINT_INTERVAL,
+                 on_save: Optional[Callable[[], None]] = None):
+        self.aweme_id = aweme_id
+        self.on_save = on_save
+        self.path = os.path.join(directory, f"{aweme_id}.json")
+        self.interval = max(1, interval)
+        self.cursor = "0"
+        self.pages_written = 0
+        self.comments_written = 0
+        self._unsaved_pages = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> bool:
+        """
+        从文件加载断点
+
+        Returns:
+            bool: 存在可用断点时返回 True
+        """
+        if not self.exists():
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取采集断点失败: {str(e)}，将从头开始采集")
+            return False
+
+        self.cursor = str(data.get('cursor', '0'))
+        self.pages_written = int(data.get('pages_written', 0))
+        self.comments_written = int(data.get('comments_written', 0))
+        logger.info(f"已加载采集断点，cursor: {self.cursor}，已写入 {self.pages_written} 页 {self.comments_written} 条评论")
+        return True
+
+    def save(self):
+        """保存断点，先写临时文件再替换，避免中断时损坏原文件"""
+        if self.on_save is not None:
+            self.on_save()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            'aweme_id': self.aweme_id,
+            'cursor': self.cursor,
+            'pages_written': self.pages_written,
+            'comments_written': self.comments_written,
+            'updated_at': int(time.time()),
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self._unsaved_pages = 0
+
+    def advance(self, cursor: str, comment_count: int = 0):
+        """
+        记录一页已经写入，按保存间隔自动保存
+
+        Args:
+            cursor: 下一页的cursor
+            comment_count: 本页评论数
+        """
+        self.cursor = str(cursor)
+        self.comments_written += comment_count
+        self.pages_written += 1
+        self._unsaved_pages += 1
+        if self._unsaved_pages >= self.interval:
+            self.save()
+
+    def flush(self):
+        """保存尚未写入文件的进度"""
+        if self._unsaved_pages:
+            self.save()
+
+    def clear(self):
+        """采集完成后删除断点"""
+        self.cursor = "0"
+        self.pages_written = 0
+        self.comments_written = 0
+        self._unsaved_pages = 0
+        if self.exists():
+            os.remove(self.path)
+
+
+def load_checkpoint(aweme_id: str, directory: str = DEFAULT_CHECKPOINT_DIR) -> Optional[CrawlCheckpoint]:
+    """加载视频的采集断点，不存在时返回 None"""
+    checkpoint = CrawlCheckpoint(aweme_id, directory)
+    return checkpoint if checkpoint.load() else None
@@ -1,14 +1,19 @@
 import requests
-import execjs
 import urllib.parse
 import re
 import random
 import cookiesparser
-import platform
 import os
+import time
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from loguru import logger
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List, Sequence
 from retry import retry
+from douyin_sign import sign_datail, sign_reply
+from sign_pool import SignPool, SignWorkerError
 
 # 常量定义
 HOST = 'https://www.douyin.com'
@@ -60,27 +65,29 @@ COMMON_HEADERS = {
     "dnt": "1",
 }
 
-# 根据操作系统选择不同的Node.js运行时配置
-if platform.system() == 'Windows':
-    node_path = r'C:\Program Files\nodejs\node.exe'  # Windows默认Node.js路径
-    execjs.register('Node', {'runtime_path': node_path})
-else:
-    node_path = '/usr/local/bin/node'  # Mac默认Node.js路径
-    execjs.register('Node', {'runtime_path': node_path})
-
-try:
-    # 加载签名脚本
-    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'douyin.js')
-    with open(script_path, 'r', encoding='utf-8') as f:
-        js_code = f.read()
-        # 处理可能的编码问题
-        js_code = js_code.replace('\ufeff', '')  # 移除BOM
-        js_code = js_code.encode('utf-8').decode('utf-8-sig')  # 处理编码
-    DOUYIN_SIGN = execjs.compile(js_code)
-    logger.success("成功加载签名脚本")
-except Exception as e:
-    logger.error(f"加载签名脚本失败: {str(e)}")
-    raise
+# 签名方式：native 为进程内Python实现，node 为常驻Node.js进程池
+SIGN_BACKEND = os.getenv('DOUYIN_SIGN_BACKEND', 'native')
+
+_sign_pool = None
+_sign_pool_lock = threading.Lock()
+
+# common_async 使用的执行器：thread 为线程池，process 为进程池
+SIGN_EXECUTOR = os.getenv('DOUYIN_SIGN_EXECUTOR', 'thread')
+SIGN_EXECUTOR_WORKERS = int(os.getenv('DOUYIN_SIGN_EXECUTOR_WORKERS', '4'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 签名统计信息，用于评估执行器规模
+_sign_stats = {
+    'in_flight': 0,         # 已提交但尚未完成的任务数
+    'completed': 0,
+    'failed': 0,
+    'total_latency': 0.0,   # 执行耗时累计（秒）
+    'max_latency': 0.0,
+    'total_wait': 0.0,      # 排队等待耗时累计（秒）
+}
+_sign_stats_lock = threading.Lock()
 
 @retry(tries=3, delay=2)
 def get_webid(headers: Dict) -> Optional[str]:
@@ -183,6 +190,62 @@ def get_webid(params=None):
         logger.error(f"生成webid时出错: {str(e)}")
         return '7362810250930783783'  # 返回一个默认的webid
 
+def get_sign_pool() -> SignPool:
+    """获取全局Node签名进程池，首次调用时启动"""
+    global _sign_pool
+    with _sign_pool_lock:
+        if _sign_pool is None:
+            _sign_pool = SignPool()
+            atexit.register(_sign_pool.close)
+        return _sign_pool
+
+def sign_many(queries: Sequence[str], user_agent: str, kind: str = 'detail') -> List[str]:
+    """
+    批量生成签名
+    
+    Node 后端一次往返完成整批签名。目前爬虫每个请求在 common() 中单独签名，
+    还没有按流水线预取窗口提前批量签名后续页面。
+    
+    Args:
+        queries: 已构建好的查询字符串列表
+        user_agent: 请求使用的User-Agent
+        kind: 签名类型，detail 为评论列表，reply 为评论回复
+        
+    Returns:
+        List[str]: 与 queries 一一对应的签名结果
+        
+    Raises:
+        ValueError: 签名生成失败
+    """
+    try:
+        if SIGN_BACKEND == 'node':
+            # 一次往返完成整批签名
+            return get_sign_pool().sign_many(queries, user_agent, kind)
+        sign_func = sign_reply if kind == 'reply' else sign_datail
+        return [sign_func(query, user_agent) for query in queries]
+    except SignWorkerError as e:
+        raise ValueError(f"签名生成失败: {str(e)}")
+    except (TypeError, KeyError, IndexError) as e:
+        logger.error(f"签名算法运行错误: {str(e)}")
+        raise ValueError(f"签名生成失败: {str(e)}")
+
+def build_query(params: Dict) -> str:
+    """
+    构建参与签名的查询字符串
+    
+    Args:
+        params: 请求参数
+        
+    Returns:
+        str: 按参数名排序并编码后的查询字符串
+    """
+    query_items = []
+    for k, v in sorted(params.items()):  # 对参数排序以保证一致性
+        if v is not None:
+            encoded_value = urllib.parse.quote(str(v))
+            query_items.append(f'{k}={encoded_value}')
+    return '&'.join(query_items)
+
 def common(uri: str, params: Dict, headers: Dict) -> Tuple[Dict, Dict]:
     """
     处理通用请求参数和头信息
@@ -213,28 +276,18 @@ def common(uri: str, params: Dict, headers: Dict) -> Tuple[Dict, Dict]:
         # 生成签名
         try:
             # 构建查询字符串
-            query_items = []
-            for k, v in sorted(params.items()):  # 对参数排序以保证一致性
-                if v is not None:
-                    encoded_value = urllib.parse.quote(str(v))
-                    query_items.append(f'{k}={encoded_value}')
-            query = '&'.join(query_items)
+            query = build_query(params)
             
-            # 根据URI选择签名函数
-            call_name = 'sign_reply' if 'reply' in uri else 'sign_datail'
+            # 根据URI选择签名类型
+            kind = 'reply' if 'reply' in uri else 'detail'
             
-            try:
-                # 生成签名
-                a_bogus = DOUYIN_SIGN.call(call_name, query, headers["User-Agent"])
-                if not a_bogus:
-                    raise ValueError("签名生成结果为空")
-                    
-                params["X-Bogus"] = a_bogus
-                logger.debug(f"成功生成签名: {a_bogus[:20]}...")
+            # 生成签名
+            a_bogus = sign_many([query], headers["User-Agent"], kind)[0]
+            if not a_bogus:
+                raise ValueError("签名生成结果为空")
                 
-            except execjs.RuntimeError as e:
-                logger.error(f"JavaScript运行时错误: {str(e)}")
-                raise ValueError(f"签名生成失败: {str(e)}")
+            params["X-Bogus"] = a_bogus
+            logger.debug(f"成功生成签名: {a_bogus[:20]}...")
                 
         except Exception as e:
             logger.error(f"生成签名时发生错误: {str(e)}")
@@ -245,3 +298,90 @@ def common(uri: str, params: Dict, headers: Dict) -> Tuple[Dict, Dict]:
     except Exception as e:
         logger.error(f"处理请求信息时发生错误: {str(e)}")
         raise
+
+
+def _timed_common(uri: str, params: Dict, headers: Dict) -> Tuple[Dict, Dict, float, float]:
+    """在执行器中运行common，同时返回开始时间和执行耗时"""
+    started_at = time.time()
+    params, headers = common(uri, params, headers)
+    return params, headers, started_at, time.time() - started_at
+
+def get_executor() -> Executor:
+    """获取common_async使用的全局执行器，首次调用时创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if SIGN_EXECUTOR == 'process':
+                _executor = ProcessPoolExecutor(max_workers=SIGN_EXECUTOR_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=SIGN_EXECUTOR_WORKERS, thread_name_prefix='douyin-sign')
+            atexit.register(shutdown_executor)
+            logger.info(f"签名执行器已启动: {SIGN_EXECUTOR}，并发数: {SIGN_EXECUTOR_WORKERS}")
+        return _executor
+
+def shutdown_executor():
+    """关闭全局执行器"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+async def common_async(uri: str, params: Dict, headers: Dict) -> Tuple[Dict, Dict]:
+    """
+    common的异步版本，在执行器中完成参数处理和签名，避免阻塞事件循环
+    
+    Args:
+        uri: 请求URI
+        params: 请求参数
+        headers: 请求头
+        
+    Returns:
+        Tuple[Dict, Dict]: 处理后的参数和头信息
+    """
+    loop = asyncio.get_running_loop()
+    submitted_at = time.time()
+    with _sign_stats_lock:
+        _sign_stats['in_flight'] += 1
+
+    try:
+        params, headers, started_at, latency = await loop.run_in_executor(
+            get_executor(), _timed_common, uri, params, headers
+        )
+        with _sign_stats_lock:
+            _sign_stats['completed'] += 1
+            _sign_stats['total_latency'] += latency
+            _sign_stats['max_latency'] = max(_sign_stats['max_latency'], latency)
+            _sign_stats['total_wait'] += max(started_at - submitted_at, 0.0)
+        return params, headers
+    except Exception:
+        with _sign_stats_lock:
+            _sign_stats['failed'] += 1
+        raise
+    finally:
+        with _sign_stats_lock:
+            _sign_stats['in_flight'] -= 1
+
+def get_sign_stats() -> Dict:
+    """
+    获取签名执行器的统计信息
+    
+    Returns:
+        Dict: 执行器类型、并发数、排队任务数以及平均/最大签名耗时（毫秒）
+    """
+    with _sign_stats_lock:
+        stats = dict(_sign_stats)
+    completed = stats['completed']
+    return {
+        'backend': SIGN_BACKEND,
+        'executor': SIGN_EXECUTOR,
+        'max_workers': SIGN_EXECUTOR_WORKERS,
+        # 执行器按提交顺序取任务，超出并发数的部分即为排队中的任务
+        'queue_depth': max(stats['in_flight'] - SIGN_EXECUTOR_WORKERS, 0),
+        'in_flight': stats['in_flight'],
+        'completed': completed,
+        'failed': stats['failed'],
+        'avg_latency_ms': round(stats['total_latency'] / completed * 1000, 2) if completed else 0.0,
+        'max_latency_ms': round(stats['max_latency'] * 1000, 2),
+        'avg_wait_ms': round(stats['total_wait'] / completed * 1000, 2) if completed else 0.0,
+    }
@@ -0,0 +1,6 @@
+"""
+pytest 配置
+
+test_login.py 和 test_api.py 是需要图形界面或线上服务的手动测试脚本，不参与自动测试收集。
+"""
+collect_ignore = ["test_login.py", "test_api.py"]
@@ -0,0 +1,400 @@
+"""
+多账号Cookie池
+
+每个Cookie有独立的请求预算（每分钟请求数）、健康分和冷却时间，数据保存在SQLite中，
+命令行工具和API服务可以共享同一个Cookie池。请求遇到“Cookie已失效”或限流错误时，
+自动切换到其他可用的Cookie。
+
+命令行用法:
+    python cookie_pool.py add cookie.txt [名称] [每分钟请求数]
+    python cookie_pool.py list
+    python cookie_pool.py remove <id>
+    python cookie_pool.py reset <id>
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+from loguru import logger
+
+from rate_limit import is_throttle_error
+
+DEFAULT_DB_PATH = os.getenv(
+    'DOUYIN_COOKIE_POOL',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cookie_pool.db'),
+)
+
+# 判定为Cookie失效的错误关键字
+INVALID_KEYWORDS = ("Cookie已失效", "Cookie不能为空")
+
+BUDGET_WINDOW = 60.0        # 请求预算的统计窗口（秒）
+BASE_COOLDOWN = 30.0        # 首次限流的冷却时间（秒）
+MAX_COOLDOWN = 3600.0       # 最长冷却时间（秒）
+MAX_WAIT = 120.0            # 所有Cookie都不可用时最长等待时间（秒）
+IN_FLIGHT_POLL = 0.05       # Cookie达到并发上限时的重试间隔（秒）
+
+T = TypeVar('T')
+
+
+def is_cookie_error(error) -> bool:
+    """判断错误是否由Cookie失效引起"""
+    message = str(error)
+    return any(keyword in message for keyword in INVALID_KEYWORDS)
+
+
+class NoCookieAvailable(ValueError):
+    """Cookie池中没有可用的Cookie"""
+    pass
+
+
+class CookieAccount:
+    """Cookie池中的一个账号"""
+
+    __slots__ = (
+        'id', 'name', 'cookie', 'health', 'rate_per_minute', 'cooldown_until',
+        'window_start', 'window_count', 'failures', 'disabled', 'last_used', 'last_error',
+    )
+
+    def __init__(self, row: sqlite3.Row):
+        for key in self.__slots__:
+            setattr(self, key, row[key])
+
+    def to_dict(self, mask: bool = True) -> dict:
+        """转换为字典，默认隐藏Cookie内容"""
+        data = {key: getattr(self, key) for key in self.__slots__}
+        if mask:
+            data['cookie'] = f"{self.cookie[:20]}..." if self.cookie else ''
+        return data
+
+
+class CookiePool:
+    """
+    基于SQLite的Cookie池
+
+    Args:
+        db_path: 数据库文件路径，默认读取 DOUYIN_COOKIE_POOL 环境变量
+        max_in_flight: 本进程内每个Cookie同时进行的最大请求数，默认读取
+            DOUYIN_COOKIE_MAX_IN_FLIGHT 环境变量，0表示不限制
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_in_flight: Optional[int] = None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        if max_in_flight is None:
+            max_in_flight = int(os.getenv('DOUYIN_COOKIE_MAX_IN_FLIGHT', '0'))
+        self.max_in_flight = max_in_flight
+        self._in_flight: Dict[int, int] = {}
+        self._in_flight_lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cookie_accounts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT,
+                    cookie TEXT NOT NULL UNIQUE,
+                    health REAL NOT NULL DEFAULT 1.0,
+                    rate_per_minute INTEGER NOT NULL DEFAULT 30,
+                    cooldown_until REAL NOT NULL DEFAULT 0,
+                    window_start REAL NOT NULL DEFAULT 0,
+                    window_count INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    disabled INTEGER NOT NULL DEFAULT 0,
+                    last_used REAL NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+
+    def add(self, cookie: str, name: Optional[str] = None, rate_per_minute: int = 30) -> int:
+        """
+        添加或更新Cookie
+
+        Args:
+            cookie: Cookie字符串
+            name: 账号名称
+            rate_per_minute: 每分钟最多请求数
+
+        Returns:
+            int: 账号ID
+        """
+        cookie = cookie.strip()
+        if not cookie:
+            raise ValueError("Cookie不能为空")
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO cookie_accounts (name, cookie, rate_per_minute)
+                VALUES (?, ?, ?)
+                ON CONFLICT(cookie) DO UPDATE SET
+                    name = COALESCE(excluded.name, name),
+                    rate_per_minute = excluded.rate_per_minute,
+                    disabled = 0,
+                    health = 1.0,
+                    failures = 0,
+                    cooldown_until = 0
+                """,
+                (name, cookie, rate_per_minute),
+            )
+            row = conn.execute("SELECT id FROM cookie_accounts WHERE cookie = ?", (cookie,)).fetchone()
+        logger.info(f"Cookie已加入Cookie池，ID: {row['id']}")
+        return row['id']
+
+    def remove(self, account_id: int):
+        """删除Cookie"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cookie_accounts WHERE id = ?", (account_id,))
+
+    def reset(self, account_id: int):
+        """重置Cookie的健康分、冷却时间和禁用状态"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cookie_accounts SET health = 1.0, failures = 0, cooldown_until = 0, disabled = 0, "
+                "last_error = NULL WHERE id = ?",
+                (account_id,),
+            )
+
+    def accounts(self) -> List[CookieAccount]:
+        """获取所有账号"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM cookie_accounts ORDER BY id").fetchall()
+        return [CookieAccount(row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cookie_accounts WHERE disabled = 0").fetchone()[0]
+
+    def try_acquire(self, exclude: Optional[Set[int]] = None) -> Optional[CookieAccount]:
+        """
+        尝试取出一个可用的Cookie并占用一次请求预算
+
+        Args:
+            exclude: 本次不使用的账号ID
+
+        Returns:
+            Optional[CookieAccount]: 可用的账号，暂时没有时返回None
+        """
+        exclude = exclude or set()
+        now = time.time()
+        with self._connect() as conn:
+            # 使用写事务保证多个进程不会超出同一个Cookie的预算
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT * FROM cookie_accounts
+                    WHERE disabled = 0 AND cooldown_until <= ?
+                    ORDER BY health DESC, last_used ASC
+                    """,
+                    (now,),
+                ).fetchall()
+                for row in rows:
+                    if row['id'] in exclude:
+                        continue
+                    window_start, window_count = row['window_start'], row['window_count']
+                    if now - window_start >= BUDGET_WINDOW:
+                        window_start, window_count = now, 0
+                    if window_count >= row['rate_per_minute']:
+                        continue
+                    conn.execute(
+                        "UPDATE cookie_accounts SET window_start = ?, window_count = ?, last_used = ? WHERE id = ?",
+                        (window_start, window_count + 1, now, row['id']),
+                    )
+                    conn.execute("COMMIT")
+                    account = CookieAccount(row)
+                    account.window_start, account.window_count, account.last_used = window_start, window_count + 1, now
+                    return account
+                conn.execute("COMMIT")
+                return None
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def next_available_in(self, exclude: Optional[Set[int]] = None) -> Optional[float]:
+        """
+        计算最早有Cookie可用的等待时间
+
+        Returns:
+            Optional[float]: 等待秒数，没有未禁用的Cookie时返回None
+        """
+        exclude = exclude or set()
+        now = time.time()
+        waits = []
+        for account in self.accounts():
+            if account.disabled or account.id in exclude:
+                continue
+            wait = max(account.cooldown_until - now, 0.0)
+            if account.window_count >= account.rate_per_minute:
+                wait = max(wait, account.window_start + BUDGET_WINDOW - now)
+            waits.append(wait)
+        return min(waits) if waits else None
+
+    async def acquire(self, exclude: Optional[Set[int]] = None, max_wait: float = MAX_WAIT) -> CookieAccount:
+        """
+        取出一个可用的Cookie，所有Cookie都在冷却或预算用尽时等待
+
+        SQLite读写在线程池中执行，不阻塞事件循环。
+
+        Raises:
+            NoCookieAvailable: 没有可用的Cookie或等待超时
+        """
+        exclude = exclude or set()
+        deadline = time.time() + max_wait
+        while True:
+            busy = self._busy_accounts()
+            account = await asyncio.to_thread(self.try_acquire, exclude | busy)
+            if account is not None:
+                return account
+            wait = await asyncio.to_thread(self.next_available_in, exclude | busy)
+            if busy - exclude:
+                # 有Cookie达到并发上限，等待其请求完成
+                wait = IN_FLIGHT_POLL if wait is None else min(wait, IN_FLIGHT_POLL)
+            if wait is None:
+                raise NoCookieAvailable("Cookie池中没有可用的Cookie")
+            if time.time() + wait > deadline:
+                raise NoCookieAvailable(f"Cookie池暂无可用Cookie，需等待 {wait:.0f} 秒")
+            await asyncio.sleep(max(wait, 0.1))
+
+    def _busy_accounts(self) -> Set[int]:
+        """达到并发上限的账号ID"""
+        if not self.max_in_flight:
+            return set()
+        with self._in_flight_lock:
+            return {account_id for account_id, count in self._in_flight.items() if count >= self.max_in_flight}
+
+    def _track(self, account_id: int, delta: int):
+        with self._in_flight_lock:
+            count = self._in_flight.get(account_id, 0) + delta
+            if count > 0:
+                self._in_flight[account_id] = count
+            else:
+                self._in_flight.pop(account_id, None)
+
+    def report_success(self, account: CookieAccount):
+        """请求成功，提高健康分"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cookie_accounts SET health = MIN(1.0, health + 0.05), failures = 0 WHERE id = ?",
+                (account.id,),
+            )
+
+    def report_failure(self, account: CookieAccount, error: Exception):
+        """
+        请求失败，根据错误类型降低健康分、进入冷却或禁用
+
+        Args:
+            account: 出错的账号
+            error: 请求错误
+        """
+        message = str(error)[:200]
+        with self._connect() as conn:
+            if is_cookie_error(error):
+                conn.execute(
+                    "UPDATE cookie_accounts SET disabled = 1, health = 0, last_error = ? WHERE id = ?",
+                    (message, account.id),
+                )
+                logger.warning(f"Cookie {account.id} 已失效，已从Cookie池中停用")
+            elif is_throttle_error(error):
+                cooldown = min(BASE_COOLDOWN * (2 ** account.failures), MAX_COOLDOWN)
+                conn.execute(
+                    "UPDATE cookie_accounts SET health = health * 0.5, failures = failures + 1, "
+                    "cooldown_until = ?, last_error = ? WHERE id = ?",
+                    (time.time() + cooldown, message, account.id),
+                )
+                logger.warning(f"Cookie {account.id} 被限流，冷却 {cooldown:.0f} 秒")
+            else:
+                conn.execute(
+                    "UPDATE cookie_accounts SET health = health * 0.9, last_error = ? WHERE id = ?",
+                    (message, account.id),
+                )
+
+    async def call(self, func: Callable[[str], Awaitable[T]], max_attempts: Optional[int] = None) -> T:
+        """
+        使用池中的Cookie执行请求，Cookie失效或被限流时自动切换
+
+        Args:
+            func: 接收Cookie字符串的异步请求函数
+            max_attempts: 最多尝试的Cookie数量，默认为池中可用Cookie数
+
+        Returns:
+            请求函数的返回值
+        """
+        attempts = max_attempts or max(await asyncio.to_thread(len, self), 1)
+        tried = set()
+        last_error = None
+        for _ in range(attempts):
+            try:
+                account = await self.acquire(exclude=tried)
+            except NoCookieAvailable:
+                if last_error is not None:
+                    raise last_error
+                raise
+            tried.add(account.id)
+            self._track(account.id, 1)
+            try:
+                result = await func(account.cookie)
+            except Exception as e:
+                await asyncio.to_thread(self.report_failure, account, e)
+                if is_cookie_error(e) or is_throttle_error(e):
+                    logger.warning(f"Cookie {account.id} 请求失败，切换其他Cookie: {str(e)}")
+                    last_error = e
+                    continue
+                raise
+            finally:
+                self._track(account.id, -1)
+            await asyncio.to_thread(self.report_success, account)
+            return result
+        raise last_error
+
+
+_default_pool: Optional[CookiePool] = None
+_default_lock = threading.Lock()
+
+
+def get_cookie_pool() -> CookiePool:
+    """获取进程内共享的默认Cookie池"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = CookiePool()
+        return _default_pool
+
+
+def main(argv: List[str]):
+    """Cookie池管理命令行"""
+    pool = get_cookie_pool()
+    command = argv[0] if argv else 'list'
+    if command == 'add' and len(argv) >= 2:
+        with open(argv[1], 'r', encoding='utf-8') as f:
+            cookie = f.read().strip()
+        name = argv[2] if len(argv) >= 3 else os.path.basename(argv[1])
+        rate = int(argv[3]) if len(argv) >= 4 else 30
+        pool.add(cookie, name, rate)
+    elif command == 'remove' and len(argv) >= 2:
+        pool.remove(int(argv[1]))
+    elif command == 'reset' and len(argv) >= 2:
+        pool.reset(int(argv[1]))
+    elif command == 'list':
+        for account in pool.accounts():
+            status = '停用' if account.disabled else ('冷却中' if account.cooldown_until > time.time() else '可用')
+            print(f"{account.id}\t{account.name}\t{status}\t健康分 {account.health:.2f}\t"
+                  f"{account.rate_per_minute} 次/分钟\t{account.last_error or ''}")
+    else:
+        print(__doc__)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,293 @@
+"""
+分区 Parquet 数据集导出
+
+每次采集的结果文件会被下一次采集覆盖，历史数据无法保留，大量 CSV 的读取也很慢。
+导出时把一次采集的结果追加为数据集中的一个 Parquet 文件，按视频ID和采集日期分区：
+
+    data/dataset/aweme_id={视频ID}/crawl_date={采集日期}/part-{采集时间}-{随机后缀}.parquet
+
+所有文件使用统一的列类型，默认 zstd 压缩。压缩（compact）时把每个视频的多次采集合并，
+按评论ID去重并保留最近一次采集的数据，每个采集日期只保留一个文件。
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from loguru import logger
+
+from sink import PARQUET_ROW_GROUP_SIZE, READ_CHUNK_SIZE
+
+# 数据集默认保存目录
+DEFAULT_DATASET_DIR = os.getenv('DOUYIN_DATASET_DIR', 'data/dataset')
+# 数据集文件的压缩方式
+COMPRESSION = os.getenv('DOUYIN_DATASET_COMPRESSION', 'zstd').lower()
+SUPPORTED_COMPRESSION = ('zstd', 'snappy', 'gzip', 'none')
+# 采集完成后是否自动导出到数据集
+EXPORT_DATASET = os.getenv('DOUYIN_EXPORT_DATASET', 'false').lower() == 'true'
+# 判断记录是否重复的列
+KEY_COLUMN = "评论ID"
+STRING_COLUMNS = ["评论ID", "评论内容", "用户昵称", "用户抖音号", "ip归属"]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("导出Parquet数据集需要安装 pyarrow")
+    return pyarrow
+
+
+def _schema(pa):
+    """数据集中所有文件统一的列类型"""
+    return pa.schema([
+        ("评论ID", pa.string()),
+        ("评论内容", pa.string()),
+        ("点赞数", pa.int64()),
+        ("评论时间", pa.timestamp('s')),
+        ("用户昵称", pa.string()),
+        ("用户抖音号", pa.string()),
+        ("ip归属", pa.dictionary(pa.int32(), pa.string())),
+        ("回复总数", pa.int64()),
+    ])
+
+
+def _compression(compression: Optional[str]) -> Optional[str]:
+    compression = (compression or COMPRESSION).lower()
+    if compression not in SUPPORTED_COMPRESSION:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    return None if compression == 'none' else compression
+
+
+def video_dir(aweme_id: str, directory: str = DEFAULT_DATASET_DIR) -> str:
+    """视频在数据集中的分区目录"""
+    return os.path.join(directory, f"aweme_id={aweme_id}")
+
+
+def _video_ids(directory: str) -> List[str]:
+    """数据集中的所有视频ID"""
+    if not os.path.isdir(directory):
+        return []
+    return [name[len('aweme_id='):] for name in sorted(os.listdir(directory))
+            if name.startswith('aweme_id=') and os.path.isdir(os.path.join(directory, name))]
+
+
+def _part_files(aweme_id: str, directory: str) -> List[str]:
+    """视频的所有数据文件，按采集日期和采集时间排序"""
+    root = video_dir(aweme_id, directory)
+    if not os.path.isdir(root):
+        return []
+    files = []
+    for date_dir in sorted(os.listdir(root)):
+        path = os.path.join(root, date_dir)
+        if date_dir.startswith('crawl_date=') and os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.startswith('part-') and name.endswith('.parquet'))
+    return files
+
+
+def _read_result(path: str) -> Iterable[pd.DataFrame]:
+    """分块读取采集结果文件"""
+    if path.endswith('.parquet'):
+        pq = _pyarrow().parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=READ_CHUNK_SIZE):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, dtype={column: str for column in STRING_COLUMNS},
+                               parse_dates=["评论时间"], chunksize=READ_CHUNK_SIZE)
+
+
+def _to_table(pa, schema, df: pd.DataFrame):
+    """把表格转换为数据集的列类型，缺少的列填充为空"""
+    table = pa.Table.from_pandas(df.reindex(columns=schema.names), schema=schema, preserve_index=False)
+    return table.replace_schema_metadata(None)
+
+
+def export_result(aweme_id: str, source: str, directory: str = DEFAULT_DATASET_DIR,
+                  crawled_at: Optional[float] = None, compression: Optional[str] = None) -> Optional[str]:
+    """
+    把一次采集的结果文件追加到数据集
+
+    Args:
+        aweme_id: 视频ID
+        source: 采集结果文件，CSV 或 Parquet
+        directory: 数据集目录
+        crawled_at: 采集时间戳，决定写入的日期分区，默认为当前时间
+        compression: 压缩方式，默认读取 DOUYIN_DATASET_COMPRESSION 环境变量
+
+    Returns:
+        Optional[str]: 写入的数据文件路径，结果为空时返回 None
+
+    Raises:
+        ValueError: 结果文件不存在、未安装 pyarrow 或不支持的压缩方式
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"采集结果文件不存在: {source}")
+    pa = _pyarrow()
+    schema = _schema(pa)
+    compression = _compression(compression)
+    crawled_at = time.time() if crawled_at is None else crawled_at
+    stamp = datetime.fromtimestamp(crawled_at)
+
+    date_dir = os.path.join(video_dir(aweme_id, directory), f"crawl_date={stamp.strftime('%Y-%m-%d')}")
+    os.makedirs(date_dir, exist_ok=True)
+    path = os.path.join(date_dir, f"part-{stamp.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+    temp_path = f"{path}.tmp"
+
+    rows = 0
+    writer = pa.parquet.ParquetWriter(temp_path, schema, compression=compression)
+    try:
+        for chunk in _read_result(source):
+            writer.write_table(_to_table(pa, schema, chunk), row_group_size=PARQUET_ROW_GROUP_SIZE)
+            rows += len(chunk)
+    except Exception:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+
+    if rows == 0:
+        os.remove(temp_path)
+        logger.warning(f"视频 {aweme_id} 的采集结果为空，未导出到数据集")
+        return None
+    os.replace(temp_path, path)
+    logger.info(f"已导出 {rows} 条记录到数据集 {path}")
+    return path
+
+
+def compact(aweme_id: str, directory: str = DEFAULT_DATASET_DIR, compression: Optional[str] = None) -> int:
+    """
+    合并视频的多次采集并按评论ID去重
+
+    同一条评论保留最近一次采集的数据（点赞数、回复总数等会随时间变化），放在最近一次采集的日期分区中；
+    每个日期分区合并为一个文件，不再包含任何记录的分区会被删除。
+
+    Args:
+        aweme_id: 视频ID
+        directory: 数据集目录
+        compression: 压缩方式，默认读取 DOUYIN_DATASET_COMPRESSION 环境变量
+
+    Returns:
+        int: 合并后的记录数
+    """
+    files = _part_files(aweme_id, directory)
+    if not files:
+        return 0
+    pa = _pyarrow()
+    if len(files) == 1 and files[0].endswith('-compacted.parquet'):
+        # 已经合并过且没有新的采集
+        return pa.parquet.ParquetFile(files[0]).metadata.num_rows
+    schema = _schema(pa)
+    compression = _compression(compression)
+
+    frames = []
+    for path in files:
+        df = pa.parquet.read_table(path, schema=schema).to_pandas()
+        df['_date_dir'] = os.path.dirname(path)
+        frames.append(df)
+    merged = pd.concat(frames, ignore_index=True)
+    before = len(merged)
+    # 文件按采集时间排序，保留每条评论最后出现的记录
+    merged = merged.drop_duplicates(subset=[KEY_COLUMN], keep='last')
+
+    # 每个日期分区使用该分区中最新的文件名，之后采集的文件仍然排在后面
+    latest = {os.path.dirname(path): os.path.basename(path) for path in files}
+    outputs = {}
+    for date_dir, df in merged.groupby('_date_dir', sort=False):
+        name = latest[date_dir]
+        if not name.endswith('-compacted.parquet'):
+            name = name[:-len('.parquet')] + '-compacted.parquet'
+        path = os.path.join(date_dir, name)
+        table = _to_table(pa, schema, df.drop(columns=['_date_dir']))
+        pa.parquet.write_table(table, f"{path}.tmp", compression=compression, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        outputs[path] = len(df)
+
+    # 新文件全部写完后再替换，中断时只会留下重复的记录，下次合并时会再次去重
+    for path in outputs:
+        os.replace(f"{path}.tmp", path)
+    for path in files:
+        if path not in outputs:
+            os.remove(path)
+    for date_dir in latest:
+        if not os.listdir(date_dir):
+            shutil.rmtree(date_dir)
+
+    logger.info(f"视频 {aweme_id}: 合并 {len(files)} 个文件，去除 {before - len(merged)} 条重复记录，剩余 {len(merged)} 条")
+    return len(merged)
+
+
+def compact_all(directory: str = DEFAULT_DATASET_DIR, compression: Optional[str] = None) -> Dict[str, int]:
+    """
+    合并数据集中所有视频
+
+    Returns:
+        Dict[str, int]: 每个视频合并后的记录数
+    """
+    return {aweme_id: compact(aweme_id, directory, compression) for aweme_id in _video_ids(directory)}
+
+
+def load_dataset(directory: str = DEFAULT_DATASET_DIR, aweme_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    读取数据集
+
+    分区列 aweme_id 按字符串读取，crawl_date 按日期读取，避免视频ID被推断为整数。
+    未合并的数据集中同一条评论可能出现多次，需要去重时先调用 compact。
+
+    Args:
+        directory: 数据集目录
+        aweme_id: 只读取指定视频
+
+    Returns:
+        pd.DataFrame: 包含 aweme_id 和 crawl_date 列的评论表格
+    """
+    pa = _pyarrow()
+    import pyarrow.dataset as ds
+
+    # 只读取已完成的数据文件，跳过写入中的临时文件
+    if aweme_id:
+        files = _part_files(aweme_id, directory)
+    else:
+        files = [path for video in _video_ids(directory) for path in _part_files(video, directory)]
+    if not files:
+        return pd.DataFrame()
+    partitioning = ds.partitioning(pa.schema([("aweme_id", pa.string()), ("crawl_date", pa.date32())]), flavor='hive')
+    dataset = ds.dataset(files, format='parquet', partitioning=partitioning, partition_base_dir=directory)
+    return dataset.to_table().to_pandas()
+
+
+def main(argv: List[str]) -> int:
+    """数据集命令行"""
+    parser = argparse.ArgumentParser(description="导出和合并评论 Parquet 数据集")
+    parser.add_argument('--dir', default=DEFAULT_DATASET_DIR, help="数据集目录")
+    parser.add_argument('--compression', choices=SUPPORTED_COMPRESSION, help="压缩方式，默认 zstd")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="把采集结果文件追加到数据集")
+    export_parser.add_argument('aweme_id', help="视频ID")
+    export_parser.add_argument('source', nargs='?', help="采集结果文件，默认 data/v1/{视频ID}/comments.csv")
+    compact_parser = commands.add_parser('compact', help="合并多次采集并按评论ID去重")
+    compact_parser.add_argument('aweme_id', nargs='?', help="视频ID，默认合并所有视频")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'export':
+            source = args.source or f"data/v1/{args.aweme_id}/comments.csv"
+            export_result(args.aweme_id, source, args.dir, compression=args.compression)
+        elif args.aweme_id:
+            compact(args.aweme_id, args.dir, args.compression)
+        else:
+            results = compact_all(args.dir, args.compression)
+            logger.info(f"已合并 {len(results)} 个视频，共 {sum(results.values())} 条记录")
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+评论去重索引
+
+SeenIndex 在采集过程中增量维护已获取的评论ID集合，每条评论的判重都是O(1)，
+不再需要每页都从全部评论重新构建集合。跨多次运行的去重由水位线（watermark.py）负责。
+"""
+from typing import Iterable, List
+
+from records import CommentRecord
+
+
+class SeenIndex:
+    """
+    增量维护的评论ID索引
+
+    Args:
+        ids: 初始的已知评论ID
+    """
+
+    def __init__(self, ids: Iterable[str] = ()):
+        self.ids = set(ids)
+
+    def add(self, key: str) -> bool:
+        """
+        记录一个ID
+
+        Returns:
+            bool: ID此前不存在时返回 True
+        """
+        if key in self.ids:
+            return False
+        self.ids.add(key)
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    def __len__(self) -> int:
+        """已记录的ID数量"""
+        return len(self.ids)
+
+    def filter_new(self, items: Iterable, key: str = "cid") -> List:
+        """
+        过滤出未见过的记录并加入索引，同一批中的重复记录只保留第一条
+
+        Args:
+            items: 评论记录或字典列表
+            key: ID字段名
+
+        Returns:
+            List[dict]: 新记录
+        """
+        return [
+            item for item in items
+            if isinstance(item, (dict, CommentRecord)) and key in item and self.add(str(item[key]))
+        ]
@@ -0,0 +1,366 @@
+"""
+a_bogus 签名算法的纯 Python 实现
+
+与 douyin.js 中的 generate_rc4_bb_str / sign / sign_datail / sign_reply 输出逐字节一致，
+在进程内完成 SM3 + RC4 + result_encrypt 计算，不再需要为每次签名启动 Node.js 进程。
+"""
+import random
+import struct
+import time
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+# 编码表，对应 douyin.js 中 result_encrypt 的 s_obj
+ENCRYPT_TABLES = {
+    "s0": "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=",
+    "s1": "Dkdpgh4ZKsQB80/Mfvw36XI1R25+WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe=",
+    "s2": "Dkdpgh4ZKsQB80/Mfvw36XI1R25-WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe=",
+    "s3": "ckdp1h4ZKsUB80/Mfvw36XIgR25+WQAlEi7NLboqYTOPuzmFjJnryx9HVGDaStCe",
+    "s4": "Dkdpgh2ZmsQB80/MfvV36XI1R45-WUAlEixNLwoqYTOPuzKFjJnry79HbGcaStCe",
+}
+
+# 浏览器环境指纹，与 douyin.js 中 sign 使用的值保持一致
+WINDOW_ENV_STR = "1536|747|1536|834|0|30|0|0|1536|834|1536|864|1525|747|24|24|Win32"
+
+# 签名参数，分别对应 sign_datail 和 sign_reply
+DETAIL_ARGUMENTS = (0, 1, 14)
+REPLY_ARGUMENTS = (0, 1, 8)
+
+# 固定配置项，对应 generate_rc4_bb_str 中的 b[15]
+PAGE_ID = 6241
+AID = 6383
+
+_SM3_IV = (
+    0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+    0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E,
+)
+_MASK32 = 0xFFFFFFFF
+
+
+def _rotl(x: int, n: int) -> int:
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & _MASK32
+
+
+# 预先计算每一轮的 T_j 循环左移结果
+_SM3_T = tuple(_rotl(0x79CC4519 if j < 16 else 0x7A879D8A, j) for j in range(64))
+
+
+def _sm3_compress(v: List[int], block: bytes) -> List[int]:
+    """SM3 压缩函数，处理一个64字节分组"""
+    w = list(struct.unpack(">16I", block))
+    for j in range(16, 68):
+        x = w[j - 16] ^ w[j - 9] ^ _rotl(w[j - 3], 15)
+        x = x ^ _rotl(x, 15) ^ _rotl(x, 23)
+        w.append(x ^ _rotl(w[j - 13], 7) ^ w[j - 6])
+
+    a, b, c, d, e, f, g, h = v
+    for j in range(64):
+        a12 = _rotl(a, 12)
+        ss1 = _rotl((a12 + e + _SM3_T[j]) & _MASK32, 7)
+        ss2 = ss1 ^ a12
+        if j < 16:
+            ff = a ^ b ^ c
+            gg = e ^ f ^ g
+        else:
+            ff = (a & b) | (a & c) | (b & c)
+            gg = (e & f) | (~e & g)
+        tt1 = (ff + d + ss2 + (w[j] ^ w[j + 4])) & _MASK32
+        tt2 = (gg + h + ss1 + w[j]) & _MASK32
+        d = c
+        c = _rotl(b, 9)
+        b = a
+        a = tt1
+        h = g
+        g = _rotl(f, 19)
+        f = e
+        e = tt2 ^ _rotl(tt2, 9) ^ _rotl(tt2, 17)
+    return [x ^ y for x, y in zip(v, (a, b, c, d, e, f, g, h))]
+
+
+def sm3_sum(data) -> List[int]:
+    """
+    计算SM3摘要，对应 douyin.js 中的 SM3.prototype.sum
+
+    Args:
+        data: 字符串（按UTF-8编码）或字节序列
+
+    Returns:
+        List[int]: 32字节摘要
+    """
+    if isinstance(data, str):
+        message = data.encode("utf-8")
+    else:
+        message = bytes(data)
+
+    length = len(message)
+    message += b"\x80" + b"\x00" * ((55 - length) % 64) + struct.pack(">Q", length * 8)
+
+    v = list(_SM3_IV)
+    for offset in range(0, len(message), 64):
+        v = _sm3_compress(v, message[offset:offset + 64])
+    return list(struct.pack(">8I", *v))
+
+
+def rc4_encrypt(plaintext: Sequence[int], key: Sequence[int]) -> List[int]:
+    """
+    RC4加密，对应 douyin.js 中的 rc4_encrypt
+
+    与JS实现一样按字符编码逐个异或，明文中大于255的编码会被原样保留高位。
+    """
+    s = list(range(256))
+    j = 0
+    key_length = len(key)
+    for i in range(256):
+        j = (j + s[i] + key[i % key_length]) % 256
+        s[i], s[j] = s[j], s[i]
+
+    i = j = 0
+    cipher = []
+    for code in plaintext:
+        i = (i + 1) % 256
+        j = (j + s[i]) % 256
+        s[i], s[j] = s[j], s[i]
+        cipher.append(s[(s[i] + s[j]) % 256] ^ code)
+    return cipher
+
+
+def result_encrypt(codes: Sequence[int], table: str) -> str:
+    """
+    自定义Base64编码，对应 douyin.js 中的 result_encrypt
+
+    Args:
+        codes: 待编码的字符编码列表
+        table: 编码表名称，s0-s4
+
+    Returns:
+        str: 编码结果
+    """
+    alphabet = ENCRYPT_TABLES[table]
+    length = len(codes)
+    # JS中越界的 charCodeAt 为 NaN，参与位运算时按0处理
+    padded = list(codes) + [0, 0]
+    result = []
+    long_int = 0
+    for i in range(-(-length * 4 // 3)):
+        key = i % 4
+        if key == 0:
+            offset = i // 4 * 3
+            long_int = (padded[offset] << 16) | (padded[offset + 1] << 8) | padded[offset + 2]
+            value = (long_int & 16515072) >> 18
+        elif key == 1:
+            value = (long_int & 258048) >> 12
+        elif key == 2:
+            value = (long_int & 4032) >> 6
+        else:
+            value = long_int & 63
+        # charAt 越界时返回空字符串
+        if value < len(alphabet):
+            result.append(alphabet[value])
+    return "".join(result)
+
+
+def _char_codes(text: str) -> List[int]:
+    """按JS的 charCodeAt 语义获取UTF-16编码单元"""
+    raw = text.encode("utf-16-le")
+    return [raw[i] | (raw[i + 1] << 8) for i in range(0, len(raw), 2)]
+
+
+def gener_random(value: float, option: Sequence[int]) -> List[int]:
+    """对应 douyin.js 中的 gener_random"""
+    value = int(value)
+    return [
+        (value & 255 & 170) | option[0] & 85,
+        (value & 255 & 85) | option[0] & 170,
+        (value >> 8 & 255 & 170) | option[1] & 85,
+        (value >> 8 & 255 & 85) | option[1] & 170,
+    ]
+
+
+def generate_random_str(random_values: Optional[Sequence[float]] = None) -> List[int]:
+    """
+    生成签名前缀，对应 douyin.js 中的 generate_random_str
+
+    Args:
+        random_values: 三个 [0, 1) 区间的随机数，默认随机生成，便于测试时固定结果
+
+    Returns:
+        List[int]: 12个字符编码
+    """
+    if random_values is None:
+        random_values = (random.random(), random.random(), random.random())
+    codes = []
+    for value, option in zip(random_values, ((3, 45), (1, 0), (1, 5))):
+        codes.extend(gener_random(value * 10000, option))
+    return codes
+
+
+@lru_cache(maxsize=32)
+def _suffix_digest(suffix: str) -> Tuple[int, ...]:
+    """后缀两次SM3的结果，只与后缀有关，可以缓存"""
+    return tuple(sm3_sum(sm3_sum(suffix)))
+
+
+@lru_cache(maxsize=32)
+def _user_agent_digest(user_agent: str, argument: int) -> Tuple[int, ...]:
+    """UA处理后的SM3结果，只与UA和签名参数有关，可以缓存"""
+    key = [0, 1, argument & 0xFFFF]
+    encrypted = result_encrypt(rc4_encrypt(_char_codes(user_agent), key), "s3")
+    return tuple(sm3_sum(encrypted))
+
+
+def generate_rc4_bb_str(
+    url_search_params: str,
+    user_agent: str,
+    window_env_str: str = WINDOW_ENV_STR,
+    suffix: str = "cus",
+    arguments: Sequence[int] = DETAIL_ARGUMENTS,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+) -> List[int]:
+    """
+    生成签名主体，对应 douyin.js 中的 generate_rc4_bb_str
+
+    Args:
+        url_search_params: 请求查询字符串
+        user_agent: 请求使用的User-Agent
+        window_env_str: 浏览器环境指纹
+        suffix: 参与摘要计算的后缀
+        arguments: 签名参数
+        start_time: 加密开始时间（毫秒），默认取当前时间
+        end_time: 加密结束时间（毫秒），默认取当前时间
+
+    Returns:
+        List[int]: RC4加密后的字符编码
+    """
+    if start_time is None:
+        start_time = int(time.time() * 1000)
+
+    url_search_params_list = sm3_sum(sm3_sum(url_search_params + suffix))
+    cus = _suffix_digest(suffix)
+    ua = _user_agent_digest(user_agent, arguments[2])
+
+    if end_time is None:
+        end_time = int(time.time() * 1000)
+
+    b = {}
+    b[8] = 3
+    b[10] = end_time
+    b[16] = start_time
+    b[18] = 44
+
+    b[20] = (b[16] >> 24) & 255
+    b[21] = (b[16] >> 16) & 255
+    b[22] = (b[16] >> 8) & 255
+    b[23] = b[16] & 255
+    b[24] = b[16] // 4294967296
+    b[25] = b[16] // 1099511627776
+
+    b[26] = (arguments[0] >> 24) & 255
+    b[27] = (arguments[0] >> 16) & 255
+    b[28] = (arguments[0] >> 8) & 255
+    b[29] = arguments[0] & 255
+
+    b[30] = (arguments[1] // 256) & 255
+    b[31] = (arguments[1] % 256) & 255
+    b[32] = (arguments[1] >> 24) & 255
+    b[33] = (arguments[1] >> 16) & 255
+
+    b[34] = (arguments[2] >> 24) & 255
+    b[35] = (arguments[2] >> 16) & 255
+    b[36] = (arguments[2] >> 8) & 255
+    b[37] = arguments[2] & 255
+
+    b[38] = url_search_params_list[21]
+    b[39] = url_search_params_list[22]
+    b[40] = cus[21]
+    b[41] = cus[22]
+    b[42] = ua[23]
+    b[43] = ua[24]
+
+    b[44] = (b[10] >> 24) & 255
+    b[45] = (b[10] >> 16) & 255
+    b[46] = (b[10] >> 8) & 255
+    b[47] = b[10] & 255
+    b[48] = b[8]
+    b[49] = b[10] // 4294967296
+    b[50] = b[10] // 1099511627776
+
+    b[52] = (PAGE_ID >> 24) & 255
+    b[53] = (PAGE_ID >> 16) & 255
+    b[54] = (PAGE_ID >> 8) & 255
+    b[55] = PAGE_ID & 255
+
+    b[57] = AID & 255
+    b[58] = (AID >> 8) & 255
+    b[59] = (AID >> 16) & 255
+    b[60] = (AID >> 24) & 255
+
+    window_env_list = _char_codes(window_env_str)
+    b[64] = len(window_env_list)
+    b[65] = b[64] & 255
+    b[66] = (b[64] >> 8) & 255
+
+    b[69] = 0
+    b[70] = b[69] & 255
+    b[71] = (b[69] >> 8) & 255
+
+    b[72] = 0
+    for index in (18, 20, 26, 30, 38, 40, 42, 21, 27, 31, 35, 39, 41, 43, 22,
+                  28, 32, 36, 23, 29, 33, 37, 44, 45, 46, 47, 48, 49, 50, 24,
+                  25, 52, 53, 54, 55, 57, 58, 59, 60, 65, 66, 70, 71):
+        b[72] ^= b[index]
+
+    bb = [b[index] for index in (
+        18, 20, 52, 26, 30, 34, 58, 38, 40, 53, 42, 21, 27, 54, 55, 31,
+        35, 57, 39, 41, 43, 22, 28, 32, 60, 36, 23, 29, 33, 37, 44, 45,
+        59, 46, 47, 48, 49, 50, 24, 25, 65, 66, 70, 71,
+    )]
+    bb.extend(window_env_list)
+    bb.append(b[72])
+    # String.fromCharCode 会把编码截断为16位
+    return rc4_encrypt([code & 0xFFFF for code in bb], [121])
+
+
+def sign(
+    url_search_params: str,
+    user_agent: str,
+    arguments: Sequence[int],
+    random_values: Optional[Sequence[float]] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+) -> str:
+    """
+    生成a_bogus签名，对应 douyin.js 中的 sign
+
+    Args:
+        url_search_params: 请求查询字符串
+        user_agent: 请求使用的User-Agent
+        arguments: 签名参数
+        random_values: 随机前缀使用的随机数，默认随机生成
+        start_time: 加密开始时间（毫秒），默认取当前时间
+        end_time: 加密结束时间（毫秒），默认取当前时间
+
+    Returns:
+        str: 签名结果
+    """
+    result_str = generate_random_str(random_values) + generate_rc4_bb_str(
+        url_search_params,
+        user_agent,
+        WINDOW_ENV_STR,
+        "cus",
+        arguments,
+        start_time,
+        end_time,
+    )
+    return result_encrypt(result_str, "s4") + "="
+
+
+def sign_datail(params: str, user_agent: str, **kwargs) -> str:
+    """生成评论列表接口的签名"""
+    return sign(params, user_agent, DETAIL_ARGUMENTS, **kwargs)
+
+
+def sign_reply(params: str, user_agent: str, **kwargs) -> str:
+    """生成评论回复接口的签名"""
+    return sign(params, user_agent, REPLY_ARGUMENTS, **kwargs)
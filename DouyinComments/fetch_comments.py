@@ -1,17 +1,50 @@
 import asyncio
+import os
 import httpx
 from loguru import logger
-from common import common
+from common import common_async
+from http_client import get_client
+from rate_limit import RateController, get_rate_controller
+from cookie_pool import CookiePool
+from dedup import SeenIndex
+from checkpoint import CrawlCheckpoint
+from watermark import VideoWatermark
+from records import decode_comment_page
 from retry import retry
-import random
 import time
+from typing import Optional, Union
 
 # 配置常量
 url = "https://www.douyin.com/aweme/v1/web/comment/list/"
+# 流水线模式同时在途的页面数，0或1表示逐页采集
+PREFETCH_PAGES = int(os.getenv('DOUYIN_PREFETCH_PAGES', '0'))
+# 第一页的评论数，同时用于判断评论总数
+PROBE_COUNT = "20"
+
+class CrawlIncompleteError(ValueError):
+    """达到最大重试次数时仍有未采集的评论，可以从断点继续"""
+    pass
 
 @retry(tries=3, delay=2)
-async def fetch_comments(aweme_id: str, cookie: str, cursor: str = "0", count: str = "100"):
-    """获取评论数据"""
+async def fetch_comments(aweme_id: str, cookie: Union[str, CookiePool], cursor: str = "0", count: str = "100"):
+    """
+    获取评论数据
+    
+    Args:
+        aweme_id: 视频ID
+        cookie: Cookie字符串，或Cookie池（失效或限流时自动切换Cookie）
+        cursor: 分页游标
+        count: 每页评论数
+    
+    Returns:
+        tuple: (评论记录列表, 是否还有更多, 下一页cursor, 评论总数)
+    """
+    if isinstance(cookie, CookiePool):
+        return await cookie.call(lambda c: _fetch_comments_page(aweme_id, c, cursor, count))
+    return await _fetch_comments_page(aweme_id, cookie, cursor, count)
+
+async def _fetch_comments_page(aweme_id: str, cookie: str, cursor: str, count: str):
+    """使用指定Cookie获取一页评论数据"""
     try:
         if not cookie:
             raise ValueError("Cookie不能为空")
@@ -29,72 +62,46 @@ async def fetch_comments(aweme_id: str, cookie: str, cursor: str = "0", count: s
         
         # 使用common模块处理参数
         try:
-            params, headers = common(url, params, headers)
+            params, headers = await common_async(url, params, headers)
         except Exception as e:
             logger.error(f"处理请求参数时出错: {str(e)}")
             raise ValueError(f"签名生成失败: {str(e)}")
         
-        async with httpx.AsyncClient(timeout=60) as client:
-            try:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    raise ValueError("视频不存在或已被删除")
-                elif e.response.status_code == 403:
-                    raise ValueError("访问被拒绝，请检查Cookie是否有效")
-                else:
-                    raise ValueError(f"HTTP请求失败: {e.response.status_code}")
-            
-            try:
-                data = response.json()
-            except Exception as e:
-                logger.error(f"解析响应数据失败: {str(e)}")
-                logger.error(f"响应内容: {response.text[:200]}")  # 只记录前200个字符
-                raise ValueError("返回数据格式错误")
-            
-            if not isinstance(data, dict):
-                logger.error(f"返回数据格式错误: {data}")
-                return [], 0, cursor, 0
-                
-            if data.get("status_code") != 0:
-                error_msg = data.get('status_msg', '未知错误')
-                logger.error(f"请求失败: {error_msg}")
-                if "登录" in error_msg:
-                    raise ValueError("Cookie已失效，请更新Cookie")
-                elif "禁止访问" in error_msg:
-                    raise ValueError("IP被限制，请稍后再试")
-                elif "不存在" in error_msg:
-                    raise ValueError("视频不存在或已被删除")
-                raise ValueError(f"请求失败: {error_msg}")
-            
-            comments = data.get("comments", [])
-            if comments is None:
-                comments = []
-                
-            has_more = data.get("has_more", 0)
-            next_cursor = data.get("cursor", cursor)
-            total = data.get("total", 0)  # 获取总评论数
-            
-            # 验证数据类型
-            if not isinstance(comments, list):
-                logger.error(f"评论数据格式错误: {comments}")
-                comments = []
-                
-            if not isinstance(has_more, (int, bool)):
-                logger.error(f"has_more格式错误: {has_more}")
-                has_more = 0
-                
-            if not isinstance(next_cursor, (str, int)):
-                logger.error(f"cursor格式错误: {next_cursor}")
-                next_cursor = cursor
-                
-            if not isinstance(total, int):
-                logger.error(f"total格式错误: {total}")
-                total = 0
-                
-            return comments, has_more, str(next_cursor), total
-            
+        # 复用共享客户端，避免每页重新握手
+        client = get_client()
+        try:
+            response = await client.get(url, params=params, headers=headers, timeout=60)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                raise ValueError("视频不存在或已被删除")
+            elif e.response.status_code == 403:
+                raise ValueError("访问被拒绝，请检查Cookie是否有效")
+            else:
+                raise ValueError(f"HTTP请求失败: {e.response.status_code}")
+        
+        # 按声明的结构一次完成解码、校验和字段投影，不在内存中保留完整的原始数据
+        try:
+            data = decode_comment_page(response.content)
+        except ValueError as e:
+            logger.error(f"解析响应数据失败: {str(e)}")
+            logger.error(f"响应内容: {response.text[:200]}")  # 只记录前200个字符
+            raise ValueError("返回数据格式错误")
+        
+        if data.status_code != 0:
+            error_msg = data.status_msg or '未知错误'
+            logger.error(f"请求失败: {error_msg}")
+            if "登录" in error_msg:
+                raise ValueError("Cookie已失效，请更新Cookie")
+            elif "禁止访问" in error_msg:
+                raise ValueError("IP被限制，请稍后再试")
+            elif "不存在" in error_msg:
+                raise ValueError("视频不存在或已被删除")
+            raise ValueError(f"请求失败: {error_msg}")
+        
+        next_cursor = cursor if data.cursor is None else data.cursor
+        return data.comments, data.has_more or 0, str(next_cursor), data.total or 0
+        
     except ValueError as e:
         logger.error(f"获取评论失败: {str(e)}")
         raise
@@ -105,64 +112,376 @@ async def fetch_comments(aweme_id: str, cookie: str, cursor: str = "0", count: s
         logger.error(f"获取评论时发生未知错误: {str(e)}")
         raise ValueError(f"获取评论失败: {str(e)}")
 
-async def check_comments_count(aweme_id: str, cookie: str) -> int:
-    """检查视频的总评论数"""
-    try:
-        comments, _, _, total = await fetch_comments(aweme_id, cookie, "0", "1")
-        if total == 0 and comments:
-            # 如果返回的total为0但实际有评论，使用评论列表长度
-            return len(comments)
-        return total
-    except Exception as e:
-        logger.error(f"检查评论数量时发生错误: {str(e)}")
-        raise  # 向上传递错误，让调用者处理
+def _valid_comments(comments, seen: SeenIndex) -> list:
+    """过滤已获取过的评论，并记录新评论的cid，格式不正确的评论在解析时已经跳过"""
+    return seen.filter_new(comments)
 
-async def fetch_all_comments(aweme_id: str, cookie: str, use_batch_mode: bool = None):
-    """获取所有评论"""
+async def _iter_pages_pipelined(aweme_id: str, cookie: Union[str, CookiePool], count: str, prefetch: int,
+                                rate_controller: RateController, max_retries: int, max_empty_pages: int,
+                                seen: SeenIndex, start_cursor: str = "0", stop_when_known: bool = False):
+    """
+    流水线方式逐页获取评论
+    
+    cursor是评论偏移量，因此可以按 cursor + k * count 预测后续页面，
+    同时保持 prefetch 个页面请求在途。每个请求发送前都要经过速率控制器，
+    并发数只决定在途请求的上限，实际请求速率仍由速率控制器决定。
+    结果按实际返回的 cursor/has_more 顺序合并，预测错误的页面会被取消，
+    已完成的页面仍会按 cid 去重后合并。
+    
+    Args:
+        aweme_id: 视频ID
+        cookie: Cookie字符串或Cookie池
+        count: 每页评论数
+        prefetch: 同时在途的页面数
+        rate_controller: 速率控制器
+        max_retries: 单个页面的最大重试次数
+        max_empty_pages: 最大连续空页面数
+        seen: 已获取评论的去重索引
+        start_cursor: 起始cursor，断点续采时为上次保存的cursor
+        stop_when_known: 遇到整页都是已知评论时停止，用于增量采集
+    
+    Yields:
+        tuple: (本页新获取的评论, 下一页cursor)
+    """
+    step = int(count)
+    cursor = int(start_cursor)
+    in_flight = {}  # 偏移量 -> 请求任务
+    retry_count = 0
+    empty_page_count = 0
+    
+    async def fetch_page(offset: int):
+        await rate_controller.wait()
+        return await fetch_comments(aweme_id, cookie, str(offset), count)
+    
     try:
-        # 如果未指定模式，先检查评论总数
-        if use_batch_mode is None:
+        while True:
+            # 补齐预测窗口内的请求
+            for k in range(prefetch):
+                offset = cursor + k * step
+                if offset not in in_flight:
+                    in_flight[offset] = asyncio.ensure_future(fetch_page(offset))
+            
+            task = in_flight.pop(cursor)
             try:
-                total_comments = await check_comments_count(aweme_id, cookie)
-                use_batch_mode = total_comments > 1000  # 超过1000条评论使用批量模式
-                logger.info(f"检测到总评论数: {total_comments}，{'使用' if use_batch_mode else '不使用'}批量模式")
-            except Exception as e:
-                logger.warning(f"检查评论数量失败: {str(e)}，将使用默认模式")
-                use_batch_mode = False
+                comments, has_more, next_cursor, _ = await task
+            except ValueError as e:
+                if "Cookie已失效" in str(e) or "视频不存在" in str(e):
+                    raise  # 这些错误直接抛出
+                retry_count += 1
+                rate_controller.record_error(e)
+                logger.warning(f"获取评论出错: {str(e)}，cursor {cursor} 第{retry_count}次重试")
+                if retry_count >= max_retries:
+                    if seen:
+                        raise CrawlIncompleteError(f"达到最大重试次数，采集未完成，停止于cursor {cursor}")
+                    return
+                continue
+            
+            if not comments and has_more:
+                empty_page_count += 1
+                retry_count += 1
+                rate_controller.record_empty()
+                logger.warning(f"未获取到评论但has_more为真，cursor {cursor} 连续空页面次数：{empty_page_count}")
+                if empty_page_count >= max_empty_pages or retry_count >= max_retries:
+                    logger.warning("连续多次未获取到评论，可能已到达末尾")
+                    return
+                continue
+            
+            empty_page_count = 0
+            page = _valid_comments(comments, seen)
+            if not page and stop_when_known:
+                logger.info("本页评论均为已知评论，增量采集结束")
+                return
+            
+            if not has_more:
+                next_offset = None
+            else:
+                next_offset = int(next_cursor)
+                if next_offset <= cursor:
+                    # cursor异常，按预测的偏移量继续
+                    next_offset = cursor + step
+                    logger.warning(f"cursor异常，按预测偏移量继续: {next_offset}")
+                elif next_offset != cursor + step:
+                    # 预测错误，按实际步长重新预测，合并已完成的页面后丢弃不在新偏移序列上的请求
+                    logger.debug(f"实际cursor {next_offset} 与预测值 {cursor + step} 不一致，重新规划预取")
+                    step = next_offset - cursor
+                    for offset in list(in_flight):
+                        if offset < next_offset or (offset - next_offset) % step:
+                            stale = in_flight.pop(offset)
+                            if stale.done() and not stale.cancelled() and stale.exception() is None:
+                                page.extend(_valid_comments(stale.result()[0], seen))
+                            else:
+                                stale.cancel()
+            
+            if page:
+                retry_count = 0
+                rate_controller.record_success()
+                yield page, str(cursor if next_offset is None else next_offset)
+            else:
+                rate_controller.record_empty()
+            
+            if next_offset is None:
+                return
+            cursor = next_offset
+    finally:
+        for task in in_flight.values():
+            task.cancel()
+        await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+async def _iter_pages_sequential(aweme_id: str, cookie: Union[str, CookiePool], count: str,
+                                 rate_controller: RateController, max_retries: int, max_empty_pages: int,
+                                 seen: SeenIndex, start_cursor: str = "0", stop_when_known: bool = False):
+    """逐页顺序获取评论，参数与返回值与 _iter_pages_pipelined 相同"""
+    cursor = str(start_cursor)
+    has_more = 1
+    retry_count = 0
+    last_cursor = None
+    empty_page_count = 0
+    no_progress_count = 0
+    max_no_progress = 3
+    
+    while has_more and retry_count < max_retries and empty_page_count < max_empty_pages:
+        try:
+            if cursor == last_cursor:
+                logger.warning(f"检测到重复的cursor值: {cursor}，尝试跳过")
+                # 使用评论数来计算下一个cursor
+                next_cursor_val = int(cursor) + int(count)
+                if next_cursor_val <= len(seen):
+                    cursor = str(next_cursor_val)
+                else:
+                    # 如果计算的cursor超过了已有评论数，尝试更小的增量
+                    cursor = str(int(cursor) + int(int(count) / 2))
+                    logger.warning(f"使用更小的增量调整cursor: {cursor}")
+            
+            await rate_controller.wait()
+            comments, has_more, next_cursor, _ = await fetch_comments(aweme_id, cookie, cursor, count)
+            
+            if not comments and has_more:
+                empty_page_count += 1
+                retry_count += 1
+                rate_controller.record_empty()  # 空页面时降低请求速率
+                logger.warning(f"未获取到评论但has_more为真，第{retry_count}次重试，连续空页面次数：{empty_page_count}")
+                if empty_page_count >= max_empty_pages:
+                    logger.warning("连续多次未获取到评论，可能已到达末尾")
+                    break
+                continue
+            
+            unique_comments = []
+            if comments:
+                empty_page_count = 0
+                
+                # 检查新评论是否与已有评论重复
+                unique_comments = _valid_comments(comments, seen)
+                
+                if unique_comments:
+                    retry_count = 0  # 获取到新评论时重置重试计数
+                    no_progress_count = 0
+                    rate_controller.record_success()
+                elif stop_when_known:
+                    logger.info("本页评论均为已知评论，增量采集结束")
+                    return
+                else:
+                    logger.warning("本页评论全部重复，可能存在分页问题")
+                    rate_controller.record_empty()
+                    no_progress_count += 1
+                    if no_progress_count >= max_no_progress:
+                        logger.warning(f"连续 {max_no_progress} 次未获取到新评论，尝试调整cursor")
+                        # 尝试更小的跳转步长
+                        cursor = str(int(cursor) + int(int(count) / 2))
+                        no_progress_count = 0
+                        continue
+            
+            # 更新cursor
+            last_cursor = cursor
+            if next_cursor == "0" or int(next_cursor) < int(cursor):
+                # cursor异常，使用更保守的递增策略
+                cursor = str(int(cursor) + int(int(count) / 2))
+                logger.warning(f"cursor异常，使用保守递增: {cursor}")
+            else:
+                cursor = next_cursor
+            
+            if unique_comments:
+                yield unique_comments, cursor
         
-        cursor = "0"
-        all_comments = []
-        has_more = 1
-        retry_count = 0
+        except ValueError as e:
+            if "Cookie已失效" in str(e) or "视频不存在" in str(e):
+                raise  # 这些错误直接抛出
+            retry_count += 1
+            rate_controller.record_error(e)  # 限流时成倍降低速率
+            logger.warning(f"获取评论出错: {str(e)}，第{retry_count}次重试")
+        except Exception as e:
+            retry_count += 1
+            rate_controller.record_error(e)
+            logger.error(f"获取评论时发生错误: {str(e)}，第{retry_count}次重试")
+    
+    if not seen:
+        if retry_count >= max_retries:
+            raise ValueError("达到最大重试次数，未能获取到评论")
+        elif empty_page_count >= max_empty_pages:
+            raise ValueError("连续多次未获取到评论，请检查视频是否有评论")
+        else:
+            raise ValueError("未获取到任何评论，请检查视频ID是否正确")
+    
+    if has_more and retry_count >= max_retries and empty_page_count < max_empty_pages:
+        raise CrawlIncompleteError(f"达到最大重试次数，采集未完成，停止于cursor {cursor}")
+
+async def iter_comment_pages(aweme_id: str, cookie: Union[str, CookiePool], use_batch_mode: bool = None,
+                             rate_controller: Optional[RateController] = None, prefetch: Optional[int] = None,
+                             seen: Optional[SeenIndex] = None, checkpoint: Optional[CrawlCheckpoint] = None,
+                             resume: bool = False, watermark: Optional[VideoWatermark] = None, delta: bool = False):
+    """
+    逐页获取评论，每获取到一页就返回该页中格式正确且未重复的评论
+    
+    调用方可以边采集边处理，不需要在内存中保留全部原始评论数据。
+    
+    Args:
+        aweme_id: 视频ID
+        cookie: Cookie字符串或Cookie池
+        use_batch_mode: 是否使用批量模式，None时根据评论总数自动判断
+        rate_controller: 速率控制器，默认使用进程内共享的控制器
+        prefetch: 同时在途的预取页面数，大于1时使用流水线模式，默认读取 DOUYIN_PREFETCH_PAGES 环境变量
+        seen: 去重索引，默认新建索引
+        checkpoint: 采集断点，调用方处理完每一页后记录进度
+        resume: 是否从断点保存的cursor继续采集，否则清除已有断点从头开始；
+            断点不保存评论ID，继续采集时由调用方在 seen 中放入已写入的评论ID
+        watermark: 视频水位线，调用方处理完每一页后记录其中的评论
+        delta: 增量采集，跳过水位线中的已知评论，遇到整页都是已知评论时停止
+    
+    Yields:
+        list: 每一页中新获取的评论
+    
+    Raises:
+        CrawlIncompleteError: 达到最大重试次数但还有更多评论
+        ValueError: Cookie失效、视频不存在或未获取到任何评论
+    """
+    rate_controller = rate_controller or get_rate_controller()
+    prefetch = PREFETCH_PAGES if prefetch is None else prefetch
+    if delta:
+        if watermark is None:
+            raise ValueError("增量采集需要提供水位线")
+        if use_batch_mode is None:
+            use_batch_mode = False  # 增量采集通常只需要几页，不再检查评论总数
+    
+    seen = seen if seen is not None else SeenIndex()  # 只保留cid用于去重
+    if delta:
+        seen.ids.update(watermark.known_ids)
+        logger.info(f"增量采集，已知评论 {len(watermark.known_ids)} 条")
+    start_cursor = "0"
+    if checkpoint is not None:
+        if resume and checkpoint.load():
+            start_cursor = checkpoint.cursor
+            logger.info(f"从断点继续采集，cursor: {start_cursor}")
+        else:
+            checkpoint.clear()
+    
+    # 如果未指定模式，用正常大小的第一页检查评论总数，这一页同时作为采集的第一页
+    probe = None
+    if use_batch_mode is None:
+        try:
+            await rate_controller.wait()
+            probe = await fetch_comments(aweme_id, cookie, start_cursor, PROBE_COUNT)
+            rate_controller.record_success()
+            comments, _, _, total_comments = probe
+            if total_comments == 0 and comments:
+                # 如果返回的total为0但实际有评论，使用评论列表长度
+                total_comments = len(comments)
+            use_batch_mode = total_comments > 1000  # 超过1000条评论使用批量模式
+            logger.info(f"检测到总评论数: {total_comments}，{'使用' if use_batch_mode else '不使用'}批量模式")
+        except ValueError as e:
+            if "Cookie已失效" in str(e) or "视频不存在" in str(e):
+                raise  # 这些错误直接抛出
+            rate_controller.record_error(e)
+            logger.warning(f"检查评论数量失败: {str(e)}，将使用默认模式")
+            use_batch_mode = False
+        except Exception as e:
+            rate_controller.record_error(e)
+            logger.warning(f"检查评论数量失败: {str(e)}，将使用默认模式")
+            use_batch_mode = False
+    
+    # 批量模式参数调整，请求间隔由速率控制器根据上游响应自适应调整
+    if use_batch_mode:
+        count = "30"  # 减小每页评论数，提高稳定性
+        max_retries = 8  # 增加重试次数
+        max_empty_pages = 8  # 增加空页面容忍度
+    else:
+        count = "20"
         max_retries = 5
-        last_cursor = None
-        empty_page_count = 0
         max_empty_pages = 5
-        last_comment_count = 0
-        no_progress_count = 0
-        max_no_progress = 3
-        
-        # 批量模式参数调整
-        if use_batch_mode:
-            count = "30"  # 减小每页评论数，提高稳定性
-            min_delay = 1.5  # 增加延迟，避免请求过快
-            max_delay = 2.5
-            max_retries = 8  # 增加重试次数
-            max_empty_pages = 8  # 增加空页面容忍度
+    
+    def record(page, next_cursor):
+        # 调用方处理完本页后才记录进度，保证断点中的页面都已写入
+        if checkpoint is not None:
+            checkpoint.advance(next_cursor, len(page))
+        if watermark is not None:
+            watermark.update(page)
+    
+    pages = None
+    try:
+        if probe is not None:
+            comments, has_more, next_cursor, _ = probe
+            page = _valid_comments(comments, seen)
+            if page:
+                yield page
+                record(page, next_cursor)
+            if has_more and next_cursor != "0" and int(next_cursor) > int(start_cursor):
+                start_cursor = next_cursor
         else:
-            count = "20"
-            min_delay = 2
-            max_delay = 3
-            max_retries = 5
-            max_empty_pages = 5
+            has_more = True
+        
+        if has_more:
+            if prefetch > 1:
+                pages = _iter_pages_pipelined(
+                    aweme_id, cookie, count, prefetch, rate_controller, max_retries, max_empty_pages, seen, start_cursor, delta
+                )
+            else:
+                pages = _iter_pages_sequential(
+                    aweme_id, cookie, count, rate_controller, max_retries, max_empty_pages, seen, start_cursor, delta
+                )
+            async for page, next_cursor in pages:
+                yield page
+                record(page, next_cursor)
+    finally:
+        if pages is not None:
+            await pages.aclose()
+        if checkpoint is not None:
+            checkpoint.flush()
+    
+    if not seen and not delta:
+        raise ValueError("未获取到任何评论，请检查视频ID是否正确")
+
+async def fetch_all_comments(aweme_id: str, cookie: Union[str, CookiePool], use_batch_mode: bool = None,
+                             rate_controller: Optional[RateController] = None, prefetch: Optional[int] = None,
+                             seen: Optional[SeenIndex] = None, checkpoint: Optional[CrawlCheckpoint] = None,
+                             resume: bool = False, watermark: Optional[VideoWatermark] = None, delta: bool = False):
+    """
+    获取所有评论
+    
+    Args:
+        aweme_id: 视频ID
+        cookie: Cookie字符串或Cookie池
+        use_batch_mode: 是否使用批量模式，None时根据评论总数自动判断
+        rate_controller: 速率控制器，默认使用进程内共享的控制器
+        prefetch: 同时在途的预取页面数，大于1时使用流水线模式，默认读取 DOUYIN_PREFETCH_PAGES 环境变量
+        seen: 去重索引，默认新建内存索引
+        checkpoint: 采集断点
+        resume: 是否从断点继续采集，续采时只返回本次新获取的评论
+        watermark: 视频水位线，采集到的评论会记录到其中，由调用方在保存结果后调用 save()
+        delta: 增量采集，只返回水位线之后的新评论
+    """
+    try:
+        all_comments = []
         
         # 记录起始时间和上次进度更新时间
         start_time = time.time()
         last_progress_time = start_time
         progress_interval = 30  # 每30秒显示一次进度
         
-        while has_more and retry_count < max_retries and empty_page_count < max_empty_pages:
-            try:
+        try:
+            async for page in iter_comment_pages(
+                aweme_id, cookie, use_batch_mode, rate_controller, prefetch, seen, checkpoint, resume, watermark, delta
+            ):
+                all_comments.extend(page)
+                logger.info(f"已获取 {len(all_comments)} 条评论")
+                
                 # 定期显示采集进度
                 current_time = time.time()
                 if current_time - last_progress_time >= progress_interval:
@@ -170,102 +489,16 @@ async def fetch_all_comments(aweme_id: str, cookie: str, use_batch_mode: bool =
                     rate = len(all_comments) / elapsed_time if elapsed_time > 0 else 0
                     logger.info(f"采集进度 - 已获取: {len(all_comments)} 条评论, 速率: {rate:.2f} 条/秒")
                     last_progress_time = current_time
-                
-                if cursor == last_cursor:
-                    logger.warning(f"检测到重复的cursor值: {cursor}，尝试跳过")
-                    # 使用评论数来计算下一个cursor
-                    next_cursor_val = int(cursor) + int(count)
-                    if next_cursor_val <= len(all_comments):
-                        cursor = str(next_cursor_val)
-                    else:
-                        # 如果计算的cursor超过了已有评论数，尝试更小的增量
-                        cursor = str(int(cursor) + int(int(count) / 2))
-                        logger.warning(f"使用更小的增量调整cursor: {cursor}")
-                
-                comments, has_more, next_cursor, _ = await fetch_comments(aweme_id, cookie, cursor, count)
-                
-                if not comments and has_more:
-                    empty_page_count += 1
-                    retry_count += 1
-                    logger.warning(f"未获取到评论但has_more为真，第{retry_count}次重试，连续空页面次数：{empty_page_count}")
-                    if empty_page_count >= max_empty_pages:
-                        logger.warning("连续多次未获取到评论，可能已到达末尾")
-                        break
-                    await asyncio.sleep(random.uniform(2, 3))  # 空页面时增加等待时间
-                    continue
-                
-                if comments:
-                    empty_page_count = 0
-                    
-                    # 检查新评论是否与已有评论重复
-                    new_comment_ids = set(comment["cid"] for comment in comments if isinstance(comment, dict) and "cid" in comment)
-                    existing_comment_ids = set(comment["cid"] for comment in all_comments if isinstance(comment, dict) and "cid" in comment)
-                    unique_comments = [c for c in comments if isinstance(c, dict) and "cid" in c and c["cid"] not in existing_comment_ids]
-                    
-                    if unique_comments:
-                        all_comments.extend(unique_comments)
-                        logger.info(f"已获取 {len(all_comments)} 条评论")
-                        retry_count = 0  # 获取到新评论时重置重试计数
-                        no_progress_count = 0
-                    else:
-                        logger.warning("本页评论全部重复，可能存在分页问题")
-                        no_progress_count += 1
-                        if no_progress_count >= max_no_progress:
-                            logger.warning(f"连续 {max_no_progress} 次未获取到新评论，尝试调整cursor")
-                            # 尝试更小的跳转步长
-                            cursor = str(int(cursor) + int(int(count) / 2))
-                            no_progress_count = 0
-                            continue
-                
-                # 检查是否有实际进展
-                if len(all_comments) == last_comment_count:
-                    no_progress_count += 1
-                else:
-                    no_progress_count = 0
-                    last_comment_count = len(all_comments)
-                
-                # 更新cursor
-                last_cursor = cursor
-                if next_cursor == "0" or int(next_cursor) < int(cursor):
-                    # cursor异常，使用更保守的递增策略
-                    cursor = str(int(cursor) + int(int(count) / 2))
-                    logger.warning(f"cursor异常，使用保守递增: {cursor}")
-                else:
-                    cursor = next_cursor
-                
-                # 根据当前进展调整延迟
-                if no_progress_count > 0:
-                    # 如果没有新评论，增加延迟
-                    await asyncio.sleep(random.uniform(max_delay, max_delay + 1))
-                else:
-                    # 正常延迟
-                    await asyncio.sleep(random.uniform(min_delay, max_delay))
-                
-            except ValueError as e:
-                if "Cookie已失效" in str(e) or "视频不存在" in str(e):
-                    raise  # 这些错误直接抛出
-                retry_count += 1
-                logger.warning(f"获取评论出错: {str(e)}，第{retry_count}次重试")
-                await asyncio.sleep(random.uniform(2, 3))
-            except Exception as e:
-                retry_count += 1
-                logger.error(f"获取评论时发生错误: {str(e)}，第{retry_count}次重试")
-                await asyncio.sleep(random.uniform(2, 3))
-        
-        if not all_comments:
-            if retry_count >= max_retries:
-                raise ValueError("达到最大重试次数，未能获取到评论")
-            elif empty_page_count >= max_empty_pages:
-                raise ValueError("连续多次未获取到评论，请检查视频是否有评论")
-            else:
-                raise ValueError("未获取到任何评论，请检查视频ID是否正确")
+        except CrawlIncompleteError as e:
+            # 与之前一样返回已获取的评论，进度保留在断点中
+            logger.warning(f"{str(e)}，返回已获取的 {len(all_comments)} 条评论")
         
         # 显示最终统计信息
         total_time = time.time() - start_time
         rate = len(all_comments) / total_time if total_time > 0 else 0
         logger.info(f"评论采集完成，共获取 {len(all_comments)} 条评论，用时 {total_time:.2f} 秒，平均速率 {rate:.2f} 条/秒")
         return all_comments
-        
+    
     except Exception as e:
         logger.error(f"获取所有评论时发生错误: {str(e)}")
         raise
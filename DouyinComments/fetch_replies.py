@@ -1,70 +1,200 @@
 import asyncio
-import httpx
+import os
 from loguru import logger
-from common import common
+from common import common_async
+from http_client import get_client
+from rate_limit import RateController, get_rate_controller
+from cookie_pool import CookiePool
+from records import CommentRecord, decode_comment_page
+from collections import deque
+from typing import List, Optional, Union
 
 # 配置常量
 url = "https://www.douyin.com/aweme/v1/web/comment/list/reply/"
+# 同时采集回复的评论数
+REPLY_CONCURRENCY = int(os.getenv('DOUYIN_REPLY_CONCURRENCY', '4'))
 
-async def fetch_replies(aweme_id: str, comment_id: str, cookie: str, cursor: str = "0", count: str = "50"):
-    """获取评论回复数据"""
-    try:
-        if not cookie:
-            raise ValueError("Cookie不能为空")
-            
-        params = {
-            "item_id": aweme_id,
-            "comment_id": comment_id,
-            "cursor": cursor,
-            "count": count,
-            "item_type": 0
-        }
-        headers = {"cookie": cookie}
+class ReplyIncompleteError(ValueError):
+    """达到最大重试次数时评论的回复仍未采集完"""
+    pass
+
+async def fetch_reply_page(aweme_id: str, comment_id: str, cookie: Union[str, CookiePool], cursor: str = "0", count: str = "50"):
+    """
+    获取一页回复数据及分页信息，出错时抛出异常
+    
+    Args:
+        aweme_id: 视频ID
+        comment_id: 评论ID
+        cookie: Cookie字符串或Cookie池
+        cursor: 分页游标
+        count: 每页回复数
         
-        # 使用common模块处理参数
-        params, headers = common(url, params, headers)
+    Returns:
+        tuple: (回复记录列表, 是否还有更多, 下一页游标)
+    """
+    if isinstance(cookie, CookiePool):
+        return await cookie.call(lambda c: _request_replies(aweme_id, comment_id, c, cursor, count))
+    return await _request_replies(aweme_id, comment_id, cookie, cursor, count)
+
+async def _request_replies(aweme_id: str, comment_id: str, cookie: str, cursor: str, count: str):
+    """使用指定Cookie获取一页回复数据，出错时抛出异常"""
+    if not cookie:
+        raise ValueError("Cookie不能为空")
         
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("status_code") != 0:
-                raise ValueError(f"请求失败: {data.get('status_msg', '未知错误')}")
-                
-            return data.get("comments", [])
-            
-    except httpx.HTTPError as e:
-        logger.error(f"获取回复时发生网络错误: {str(e)}")
-        return []
-    except Exception as e:
-        logger.error(f"获取回复时发生错误: {str(e)}")
-        return []
+    params = {
+        "item_id": aweme_id,
+        "comment_id": comment_id,
+        "cursor": cursor,
+        "count": count,
+        "item_type": 0
+    }
+    headers = {"cookie": cookie}
+    
+    # 使用common模块处理参数
+    params, headers = await common_async(url, params, headers)
+    
+    # 复用共享客户端，避免每页重新握手
+    client = get_client()
+    response = await client.get(url, params=params, headers=headers, timeout=30)
+    if response.status_code == 403:
+        raise ValueError("访问被拒绝，请检查Cookie是否有效")
+    response.raise_for_status()
+    # 按声明的结构一次完成解码、校验和字段投影，不在内存中保留完整的原始数据
+    data = decode_comment_page(response.content)
+    
+    if data.status_code != 0:
+        error_msg = data.status_msg or '未知错误'
+        if "登录" in error_msg:
+            raise ValueError("Cookie已失效，请更新Cookie")
+        elif "禁止访问" in error_msg:
+            raise ValueError("IP被限制，请稍后再试")
+        raise ValueError(f"请求失败: {error_msg}")
+    
+    replies = data.comments
+    # 旧接口没有返回分页信息时，按返回数量判断是否还有更多
+    has_more = len(replies) >= int(count) if data.has_more is None else data.has_more
+    next_cursor = int(cursor) + len(replies) if data.cursor is None else data.cursor
+    return replies, bool(has_more), str(next_cursor)
 
-async def fetch_all_replies(aweme_id: str, comment_id: str, cookie: str):
-    """获取评论的所有回复"""
-    try:
-        cursor = "0"
-        all_replies = []
-        has_more = True
+async def iter_thread_replies(aweme_id: str, comment_id: str, cookie: Union[str, CookiePool],
+                              rate_controller: Optional[RateController] = None, count: str = "50",
+                              max_retries: int = 3):
+    """
+    逐页获取一条评论下的全部回复
+    
+    Args:
+        aweme_id: 视频ID
+        comment_id: 评论ID
+        cookie: Cookie字符串或Cookie池
+        rate_controller: 速率控制器，默认使用进程内共享的控制器
+        count: 每页回复数
+        max_retries: 单页最大重试次数
+        
+    Yields:
+        list: 每一页的回复列表
+        
+    Raises:
+        ReplyIncompleteError: 达到最大重试次数，已返回的页面之后还有未采集的回复
+        ValueError: Cookie失效时直接抛出
+    """
+    rate_controller = rate_controller or get_rate_controller()
+    cursor = "0"
+    retry_count = 0
+    
+    while True:
+        await rate_controller.wait()
+        try:
+            replies, has_more, next_cursor = await fetch_reply_page(aweme_id, comment_id, cookie, cursor, count)
+        except Exception as e:
+            if "Cookie已失效" in str(e):
+                raise
+            retry_count += 1
+            rate_controller.record_error(e)
+            logger.warning(f"获取评论 {comment_id} 的回复出错: {str(e)}，第{retry_count}次重试")
+            if retry_count >= max_retries:
+                raise ReplyIncompleteError(f"评论 {comment_id} 的回复达到最大重试次数，停止于cursor {cursor}")
+            continue
         
-        while has_more:
-            replies = await fetch_replies(aweme_id, comment_id, cookie, cursor)
-            if not replies:
-                break
-                
-            all_replies.extend(replies)
-            logger.info(f"已获取评论 {comment_id} 的 {len(all_replies)} 条回复")
-            
-            # 检查是否还有更多回复
-            has_more = len(replies) == 50  # 如果返回的回复数量等于请求的数量，说明可能还有更多
-            cursor = str(len(all_replies))  # 更新cursor
-            
-            # 添加延时避免请求过快
-            await asyncio.sleep(1)
-            
-        return all_replies
+        retry_count = 0
+        if not replies:
+            rate_controller.record_empty()
+            return
         
-    except Exception as e:
-        logger.error(f"获取所有回复时发生错误: {str(e)}")
-        return []
+        rate_controller.record_success()
+        yield replies
+        
+        if not has_more or int(next_cursor) <= int(cursor):
+            return
+        cursor = next_cursor
+
+async def iter_all_replies(comments: List[CommentRecord], cookie: Union[str, CookiePool], concurrency: Optional[int] = None,
+                           rate_controller: Optional[RateController] = None):
+    """
+    并发获取多条评论下的全部回复，按页流式返回
+    
+    回复数最多的评论优先采集，同时最多 concurrency 条评论在采集中，
+    每条评论都会翻页到最后一页。实际请求速率仍由速率控制器决定。
+    单条评论达到最大重试次数时跳过该评论继续采集，结束时汇总未采集完整的评论数。
+    
+    Args:
+        comments: 评论记录列表，使用其中的 aweme_id、cid 和 reply_comment_total
+        cookie: Cookie字符串或Cookie池
+        concurrency: 同时采集的评论数，默认读取 DOUYIN_REPLY_CONCURRENCY 环境变量
+        rate_controller: 速率控制器，默认使用进程内共享的控制器
+        
+    Yields:
+        tuple: (评论ID, 该页回复列表)
+        
+    Raises:
+        ValueError: Cookie失效时停止全部采集并抛出
+    """
+    rate_controller = rate_controller or get_rate_controller()
+    concurrency = concurrency or REPLY_CONCURRENCY
+    threads = sorted(
+        (c for c in comments if c.cid and c.reply_comment_total > 0),
+        key=lambda c: c.reply_comment_total,
+        reverse=True,
+    )
+    if not threads:
+        return
+    
+    pending = deque(threads)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    finished = object()
+    incomplete = []
+    
+    async def worker():
+        try:
+            while pending:
+                comment = pending.popleft()
+                comment_id = comment.cid
+                try:
+                    async for replies in iter_thread_replies(comment.aweme_id, comment_id, cookie, rate_controller):
+                        await results.put((comment_id, replies))
+                except ReplyIncompleteError as e:
+                    logger.warning(str(e))
+                    incomplete.append(comment_id)
+        except asyncio.CancelledError:
+            # 消费方已停止读取，队列可能已满，不能再写入
+            raise
+        except Exception as e:
+            await results.put(e)
+        await results.put(finished)
+    
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(threads)))]
+    running = len(workers)
+    try:
+        while running:
+            item = await results.get()
+            if item is finished:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+        if incomplete:
+            logger.warning(f"{len(incomplete)} 条评论的回复未采集完整")
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -16,7 +16,8 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QRect
 from PyQt6.QtGui import QColor, QFont, QPainter, QPen
-from main import fetch_all_comments_async, fetch_all_replies_async, process_comments, process_replies, load_cookie
+from main import collect_comments_async, fetch_all_replies_async, process_replies, load_cookie
+from http_client import close_client
 from deepseek_api import DeepSeekAPI
 from loguru import logger
 from login_window import LoginWindow
@@ -63,8 +64,13 @@ class CommentWorker(QThread):
             
             self.log.emit(f"开始获取视频 {self.aweme_id} 的评论...")
             try:
-                comments = loop.run_until_complete(fetch_all_comments_async(self.aweme_id))
-                if not comments:
+                # 逐页处理评论，不保留原始评论数据
+                comments_df, threads = loop.run_until_complete(collect_comments_async(
+                    self.aweme_id,
+                    resume=True,  # 存在未完成的采集时自动继续
+                    on_page=lambda count, total: self.log.emit(f"已获取 {total} 条评论")
+                ))
+                if comments_df.empty:
                     raise Exception("未获取到评论数据")
             except ValueError as e:
                 error_msg = str(e)
@@ -77,14 +83,12 @@ class CommentWorker(QThread):
                 else:
                     raise Exception(f"获取评论失败: {error_msg}")
                 
-            self.log.emit("处理评论数据...")
-            comments_df = process_comments(comments)
-            self.log.emit(f"成功获取 {len(comments)} 条评论")
+            self.log.emit(f"成功获取 {len(comments_df)} 条评论")
             
             if self.get_replies:
                 self.log.emit("开始获取评论回复...")
                 try:
-                    replies = loop.run_until_complete(fetch_all_replies_async(comments))
+                    replies = loop.run_until_complete(fetch_all_replies_async(threads))
                     self.log.emit(f"成功获取 {len(replies)} 条回复")
                     replies_df = process_replies(replies, comments_df)
                     result = pd.concat([comments_df, replies_df], ignore_index=True)
@@ -103,6 +107,8 @@ class CommentWorker(QThread):
             self.error.emit(error_msg)
         finally:
             try:
+                # 关闭本次采集复用的HTTP客户端
+                loop.run_until_complete(close_client())
                 loop.close()
                 self.log.emit("事件循环已关闭")
             except Exception as e:
@@ -0,0 +1,118 @@
+"""
+共享HTTP客户端管理
+
+评论和回复采集在整个采集会话内复用同一个 httpx.AsyncClient，
+开启HTTP/2和长连接，避免每一页都重新进行TCP+TLS握手。
+httpx.AsyncClient 与创建它的事件循环绑定，因此按事件循环分别维护客户端，
+GUI工作线程和API请求各自的事件循环互不影响。
+"""
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+# 连接配置，可通过环境变量调整
+HTTP2_ENABLED = os.getenv('DOUYIN_HTTP2', 'true').lower() != 'false'
+MAX_CONNECTIONS = int(os.getenv('DOUYIN_HTTP_MAX_CONNECTIONS', '20'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('DOUYIN_HTTP_MAX_KEEPALIVE', '10'))
+KEEPALIVE_EXPIRY = float(os.getenv('DOUYIN_HTTP_KEEPALIVE_EXPIRY', '30'))
+DEFAULT_TIMEOUT = float(os.getenv('DOUYIN_HTTP_TIMEOUT', '60'))
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def create_client(
+    timeout: float = DEFAULT_TIMEOUT,
+    http2: bool = HTTP2_ENABLED,
+    max_connections: int = MAX_CONNECTIONS,
+    max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+) -> httpx.AsyncClient:
+    """
+    创建配置好连接池的客户端
+
+    Args:
+        timeout: 默认超时时间（秒），单次请求可以覆盖
+        http2: 是否启用HTTP/2
+        max_connections: 最大连接数
+        max_keepalive_connections: 最大保持连接数
+
+    Returns:
+        httpx.AsyncClient: 新建的客户端
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(timeout=timeout, http2=http2, limits=limits)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环的共享客户端，不存在或已关闭时自动创建
+
+    Returns:
+        httpx.AsyncClient: 共享客户端
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = create_client()
+        _clients[loop] = client
+        logger.debug(f"已创建共享HTTP客户端，HTTP/2: {HTTP2_ENABLED}")
+    return client
+
+
+async def open_client(**kwargs) -> httpx.AsyncClient:
+    """
+    显式打开当前事件循环的共享客户端
+
+    Args:
+        **kwargs: 传递给 create_client 的连接配置
+
+    Returns:
+        httpx.AsyncClient: 共享客户端
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is not None and not client.is_closed:
+        if kwargs:
+            logger.warning("共享HTTP客户端已打开，忽略新的连接配置")
+        return client
+    client = create_client(**kwargs)
+    _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """关闭当前事件循环的共享客户端"""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+        logger.debug("共享HTTP客户端已关闭")
+
+
+@asynccontextmanager
+async def client_session(**kwargs):
+    """
+    采集会话上下文，会话内的所有请求复用同一个客户端
+
+    嵌套使用时只有最外层会话负责关闭客户端。
+
+    Args:
+        **kwargs: 传递给 create_client 的连接配置
+    """
+    loop = asyncio.get_running_loop()
+    existing: Optional[httpx.AsyncClient] = _clients.get(loop)
+    owner = existing is None or existing.is_closed
+    client = await open_client(**kwargs)
+    try:
+        yield client
+    finally:
+        if owner:
+            await close_client()
@@ -1,11 +1,19 @@
 import os
+import time
 import asyncio
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from fetch_comments import fetch_all_comments, check_comments_count
-from fetch_replies import fetch_replies
+from fetch_comments import iter_comment_pages
+from fetch_replies import iter_all_replies
+from http_client import client_session
+from cookie_pool import get_cookie_pool
+from dedup import SeenIndex
+from checkpoint import CrawlCheckpoint
+from watermark import VideoWatermark
+from records import CommentRecord, as_record
+from sink import DEFAULT_FORMAT, open_sink
+from dataset import EXPORT_DATASET, export_result
 from loguru import logger
-import random
 
 def load_cookie():
     """从环境变量或文件加载cookie"""
@@ -26,230 +34,345 @@ def load_cookie():
     logger.info("从文件加载cookie成功")
     return cookie
 
-async def fetch_all_comments_async(aweme_id):
-    """异步获取所有评论"""
-    max_retries = 3
-    retry_count = 0
-    last_error = None
+def get_cookie_source():
+    """获取采集使用的Cookie，Cookie池中有可用Cookie时优先使用Cookie池"""
+    pool = get_cookie_pool()
+    available = len(pool)
+    if available > 0:
+        logger.info(f"使用Cookie池，可用Cookie数: {available}")
+        return pool
+    return load_cookie()
+
+def _thread_refs(aweme_id, comment_ids, reply_counts):
+    """只保留采集回复所需的字段"""
+    return [
+        CommentRecord(str(cid), "", aweme_id=aweme_id, reply_comment_total=int(count))
+        for cid, count in zip(comment_ids, reply_counts) if count > 0
+    ]
+
+async def stream_comments_async(aweme_id, sink, on_page=None, on_frame=None, resume=False, max_retries=3,
+                                watermark=None, delta=False):
+    """
+    逐页采集评论并即时转换为表格写入结果写入器，不在内存中保留评论数据
+    
+    每页处理后先写入结果写入器的临时文件，再记录采集断点。采集中断时会从断点自动重试，
+    进程退出后也可以使用 resume=True 从上次的进度继续，已写入临时文件的评论不会重复写入。
+    
+    Args:
+        aweme_id: 视频ID
+        sink: 结果写入器
+        on_page: 可选回调，每处理完一页时以 (本页评论数, 累计评论数) 调用
+        on_frame: 可选回调，以每页的评论表格调用，继续采集时先以断点前写入的表格调用
+        resume: 存在断点时是否继续上次的采集
+        max_retries: 采集中断后从断点重试的最大次数
+        watermark: 视频水位线，采集到的评论会记录到其中
+        delta: 增量采集，只获取水位线之后的新评论
+    
+    Returns:
+        tuple: (评论数, 有回复的评论列表)，后者只保留采集回复所需的字段
+    """
+    cookie = get_cookie_source()
+    # 保存断点前先把已处理的页面写入磁盘，断点中的页面都能在临时文件中找到
+    checkpoint = CrawlCheckpoint(aweme_id, on_save=sink.flush)
+    seen = SeenIndex()
+    threads = []
+    total = 0
     
-    while retry_count < max_retries:
+    if resume and checkpoint.exists() and sink.has_partial():
+        partial_df = sink.read_partial().drop_duplicates("评论ID")
+        # 临时文件中可能有断点之后写入的页面，继续采集时跳过这些评论
+        seen.ids.update(partial_df["评论ID"].astype(str))
+        if watermark is not None:
+            watermark.known_ids.update(seen.ids)
+        threads.extend(_thread_refs(aweme_id, partial_df["评论ID"], partial_df["回复总数"]))
+        total = len(partial_df)
+        logger.info(f"已加载断点前写入的 {total} 条评论")
+        if on_frame:
+            on_frame(partial_df)
+    else:
+        resume = False
+        sink.discard()
+    
+    retry_count = 0
+    while True:
         try:
-            cookie = load_cookie()
-            
-            # 检查评论总数
-            try:
-                total_comments = await check_comments_count(aweme_id, cookie)
-                if total_comments == 0:
-                    logger.warning("未检测到评论数量，将使用默认模式")
-                else:
-                    logger.info(f"检测到总评论数: {total_comments}")
-                
-                # 根据评论数量选择模式
-                use_batch_mode = None  # 让函数自动判断
-                if total_comments > 0:
-                    use_batch_mode = total_comments > 1000
-            except ValueError as e:
-                if "Cookie已失效" in str(e) or "视频不存在" in str(e):
-                    raise
-                logger.warning(f"检查评论数量失败: {str(e)}，将使用默认模式")
-                use_batch_mode = None
-            
-            comments = await fetch_all_comments(aweme_id, cookie, use_batch_mode)
-            
-            if not comments:
-                retry_count += 1
-                logger.warning(f"未获取到评论数据，第{retry_count}次重试")
-                await asyncio.sleep(2)
-                continue
-                
-            if not isinstance(comments, list):
-                logger.error(f"评论数据格式错误: {type(comments)}")
-                retry_count += 1
-                continue
-                
-            valid_comments = [c for c in comments if isinstance(c, dict) and "cid" in c and "text" in c]
-            if not valid_comments:
-                logger.error("没有有效的评论数据")
-                retry_count += 1
-                continue
-                
-            logger.info(f"成功获取 {len(valid_comments)} 条有效评论")
-            return valid_comments
-            
+            async for page in iter_comment_pages(
+                aweme_id, cookie, seen=seen, checkpoint=checkpoint, resume=resume, watermark=watermark, delta=delta
+            ):
+                page_df = process_comments(page)
+                # 先写入临时文件，iter_comment_pages 随后记录断点
+                sink.write(page_df)
+                if on_frame:
+                    on_frame(page_df)
+                threads.extend(_thread_refs(aweme_id, (c.cid for c in page), (c.reply_comment_total for c in page)))
+                total += len(page)
+                logger.info(f"已获取 {total} 条评论")
+                if on_page:
+                    on_page(len(page), total)
+            break
         except ValueError as e:
             error_msg = str(e)
-            if any(msg in error_msg for msg in ["Cookie已失效", "视频不存在", "已被删除"]):
-                raise  # 这些错误直接抛出，不需要重试
+            if retry_count >= max_retries or any(msg in error_msg for msg in ["Cookie已失效", "视频不存在", "已被删除"]):
+                raise
             retry_count += 1
-            last_error = error_msg
-            logger.warning(f"获取评论出错: {error_msg}，第{retry_count}次重试")
-            await asyncio.sleep(2)
-        except Exception as e:
-            retry_count += 1
-            last_error = str(e)
-            logger.error(f"获取评论时发生错误: {str(e)}，第{retry_count}次重试")
+            resume = True
+            logger.warning(f"采集中断: {error_msg}，第{retry_count}次从断点继续")
             await asyncio.sleep(2)
     
-    error_msg = f"达到最大重试次数，采集失败。最后一次错误: {last_error}" if last_error else "达到最大重试次数，采集失败"
-    raise ValueError(error_msg)  # 改为抛出异常而不是返回None
+    sink.flush()
+    # 采集完成，清理断点
+    checkpoint.clear()
+    return total, threads
 
-async def fetch_all_replies_async(comments):
-    """异步获取所有回复"""
+async def collect_comments_async(aweme_id, on_page=None, resume=False, max_retries=3, watermark=None, delta=False):
+    """
+    逐页采集评论并即时转换为表格，不在内存中保留原始评论数据
+    
+    每页处理后先追加到临时CSV文件，再记录采集断点。采集中断时会从断点自动重试，
+    进程退出后也可以使用 resume=True 从上次的进度继续。
+    
+    Args:
+        aweme_id: 视频ID
+        on_page: 可选回调，每处理完一页时以 (本页评论数, 累计评论数) 调用
+        resume: 存在断点时是否继续上次的采集
+        max_retries: 采集中断后从断点重试的最大次数
+        watermark: 视频水位线，采集到的评论会记录到其中
+        delta: 增量采集，只获取水位线之后的新评论
+    
+    Returns:
+        tuple: (评论DataFrame, 有回复的评论列表)，后者只保留采集回复所需的字段
+    """
+    sink = open_sink(get_save_path(aweme_id, "csv"), "csv")
+    frames = []
+    _, threads = await stream_comments_async(
+        aweme_id, sink, on_page=on_page, on_frame=frames.append, resume=resume,
+        max_retries=max_retries, watermark=watermark, delta=delta
+    )
+    comments_df = categorize_columns(pd.concat(frames, ignore_index=True).drop_duplicates("评论ID")) if frames else pd.DataFrame()
+    # 结果由调用方保存，清理临时文件
+    sink.discard()
+    return comments_df, threads
+
+async def stream_replies_async(comments, on_replies):
+    """
+    逐页采集回复并交给回调处理，只保留回复ID用于去重，不在内存中保留回复数据
+    
+    Args:
+        comments: 评论记录列表
+        on_replies: 每获取一页回复时以 (评论ID, 新回复列表) 调用
+        
+    Returns:
+        int: 回复数
+    """
     try:
         if not comments or not isinstance(comments, list):
             logger.error("评论数据无效")
-            return []
+            return 0
             
-        cookie = load_cookie()
-        all_replies = []
-        total_replies = sum(comment.get("reply_comment_total", 0) for comment in comments if isinstance(comment, dict))
-        processed_count = 0
-        error_count = 0
-        max_errors = 3
+        cookie = get_cookie_source()
+        reply_count = 0
+        seen_replies = SeenIndex()
+        threads = {comment.cid for comment in comments if comment.reply_comment_total > 0}
+        total_replies = sum(comment.reply_comment_total for comment in comments)
+        processed_threads = set()
+        logger.info(f"开始采集回复，共 {len(threads)} 条评论有回复，预计 {total_replies} 条回复")
         
-        for comment in comments:
-            if not isinstance(comment, dict):
+        async for comment_id, replies in iter_all_replies(comments, cookie):
+            # 检查重复回复
+            unique_replies = seen_replies.filter_new(replies)
+            if not unique_replies:
                 continue
-                
-            reply_count = comment.get("reply_comment_total", 0)
-            if reply_count > 0:
-                try:
-                    replies = await fetch_replies(
-                        comment.get("aweme_id", ""),
-                        comment.get("cid", ""),
-                        cookie
-                    )
-                    
-                    if replies and isinstance(replies, list):
-                        # 检查重复回复
-                        existing_reply_ids = set(reply["cid"] for reply in all_replies if isinstance(reply, dict) and "cid" in reply)
-                        unique_replies = [r for r in replies if isinstance(r, dict) and "cid" in r and r["cid"] not in existing_reply_ids]
-                        
-                        if unique_replies:
-                            all_replies.extend(unique_replies)
-                            processed_count += 1
-                            logger.info(f"已处理 {processed_count}/{total_replies} 个评论的回复")
-                            error_count = 0  # 重置错误计数
-                        else:
-                            logger.warning(f"评论 {comment.get('cid', '')} 未获取到有效回复")
-                    
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"获取评论 {comment.get('cid', '')} 的回复时出错: {str(e)}")
-                    if error_count >= max_errors:
-                        logger.error("连续错误次数过多，跳过剩余回复获取")
-                        break
-                    continue
-                
-                # 添加随机延时
-                await asyncio.sleep(random.uniform(1, 2))
+            reply_count += len(unique_replies)
+            processed_threads.add(comment_id)
+            logger.info(f"已获取 {reply_count}/{total_replies} 条回复，已处理 {len(processed_threads)}/{len(threads)} 个评论")
+            on_replies(comment_id, unique_replies)
         
-        return all_replies
+        return reply_count
     except Exception as e:
         logger.error(f"获取回复时发生错误: {str(e)}")
         raise
 
-def process_comments(comments):
-    """处理评论数据"""
-    if not comments or not isinstance(comments, list):
-        logger.warning("没有有效的评论数据可以处理")
-        return pd.DataFrame()
+async def fetch_all_replies_async(comments):
+    """
+    异步获取所有回复
+    
+    Args:
+        comments: 评论记录列表
         
-    data = []
+    Returns:
+        list: 回复记录列表
+    """
+    all_replies = []
+    await stream_replies_async(comments, lambda comment_id, replies: all_replies.extend(replies))
+    return all_replies
+
+# 评论表格的列，评论和回复使用相同的列
+COMMENT_COLUMNS = ["评论ID", "评论内容", "点赞数", "评论时间", "用户昵称", "用户抖音号", "ip归属", "回复总数"]
+# 取值较少的列使用分类类型，减少内存占用
+CATEGORY_COLUMNS = ["ip归属"]
+
+def _collect_records(items, kind):
+    """把评论记录或原始评论统一转换为记录，跳过格式不正确的数据"""
+    records = []
     error_count = 0
-    
-    for comment in comments:
-        try:
-            # 添加更多错误检查
-            if not isinstance(comment, dict):
-                error_count += 1
-                continue
-                
-            user = comment.get("user", {})
-            if not isinstance(user, dict):
-                error_count += 1
-                continue
-                
-            create_time = comment.get("create_time", 0)
-            if not isinstance(create_time, (int, float)):
-                create_time = 0
-            
-            cid = comment.get("cid", "")
-            if not cid:
-                error_count += 1
-                continue
-                
-            data.append({
-                "评论ID": cid,
-                "评论内容": comment.get("text", ""),
-                "点赞数": int(comment.get("digg_count", 0)),
-                "评论时间": datetime.fromtimestamp(create_time).strftime("%Y-%m-%d %H:%M:%S"),
-                "用户昵称": user.get("nickname", "未知"),
-                "用户抖音号": user.get("unique_id", "未设置"),
-                "ip归属": comment.get("ip_label", "未知"),
-                "回复总数": int(comment.get("reply_comment_total", 0))
-            })
-        except Exception as e:
+    for item in items:
+        record = as_record(item)
+        if record is None:
             error_count += 1
-            logger.error(f"处理评论数据时出错: {str(e)}, 评论数据: {comment}")
             continue
-            
+        records.append(record)
     if error_count > 0:
-        logger.warning(f"处理评论数据时有 {error_count} 条记录出错")
+        logger.warning(f"处理{kind}数据时有 {error_count} 条记录出错")
+    return records
+
+def _local_datetimes(timestamps):
+    """把秒级时间戳一次性转换为本地时间，结果与 datetime.fromtimestamp 一致"""
+    # 时区偏移只在整15分钟切换，同一个15分钟内的时间戳只需查询一次本地偏移
+    buckets, inverse = np.unique(timestamps // 900, return_inverse=True)
+    offsets = np.fromiter((time.localtime(int(b) * 900).tm_gmtoff for b in buckets), dtype=np.int64, count=len(buckets))
+    return pd.to_datetime(timestamps + offsets[inverse], unit="s")
+
+def _records_frame(records, with_reply_total=True):
+    """
+    按列构建评论表格
+    
+    每一列直接收集为数组，评论时间一次性向量化转换，不再逐行构建字典和格式化时间。
+    
+    Args:
+        records: 评论记录列表
+        with_reply_total: 是否填写回复总数，二级评论没有回复，回复总数为0
+    """
+    count = len(records)
+    create_times = np.fromiter((r.create_time for r in records), dtype=np.int64, count=count)
+    created_at = _local_datetimes(create_times)
+    if with_reply_total:
+        reply_totals = np.fromiter((r.reply_comment_total for r in records), dtype=np.int64, count=count)
+    else:
+        reply_totals = np.zeros(count, dtype=np.int64)
+    
+    return pd.DataFrame({
+        "评论ID": [r.cid for r in records],
+        "评论内容": [r.text for r in records],
+        "点赞数": np.fromiter((r.digg_count for r in records), dtype=np.int64, count=count),
+        "评论时间": created_at,
+        "用户昵称": ["未知" if r.nickname is None else r.nickname for r in records],
+        "用户抖音号": ["未设置" if r.unique_id is None else r.unique_id for r in records],
+        "ip归属": pd.Categorical(["未知" if r.ip_label is None else r.ip_label for r in records]),
+        "回复总数": reply_totals,
+    }, columns=COMMENT_COLUMNS)
+
+def categorize_columns(df):
+    """合并多页表格后，重新把取值较少的列转换为分类类型"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+def process_comments(comments):
+    """处理评论数据，comments 为评论记录列表，也兼容接口返回的原始评论"""
+    if not comments or not isinstance(comments, list):
+        logger.warning("没有有效的评论数据可以处理")
+        return pd.DataFrame()
         
-    if not data:
+    records = _collect_records(comments, "评论")
+    if not records:
         logger.warning("没有有效的评论数据可以处理")
         return pd.DataFrame()
         
-    return pd.DataFrame(data)
+    return _records_frame(records)
 
 def process_replies(replies, comments_df):
-    """处理回复数据"""
+    """处理回复数据，replies 为回复记录列表，也兼容接口返回的原始回复"""
     if not replies or not isinstance(replies, list):
         return pd.DataFrame()
         
-    data = []
-    error_count = 0
+    records = _collect_records(replies, "回复")
+    if not records:
+        return pd.DataFrame()
+        
+    return _records_frame(records, with_reply_total=False)  # 二级评论没有回复
+
+def get_save_path(aweme_id, output_format=None):
+    """视频采集结果的保存路径"""
+    return f"data/v1/{aweme_id}/comments.{(output_format or DEFAULT_FORMAT).lower()}"
+
+def open_video_sink(aweme_id, output_format=None):
+    """创建视频采集结果的写入器，结果保存到 data/v1/{aweme_id}/ 下"""
+    return open_sink(get_save_path(aweme_id, output_format), output_format)
+
+def finish_results(sink, replies_df=None, watermark=None, delta=False):
+    """
+    写入回复，增量采集时合并已有结果，然后原子替换结果文件并更新水位线
     
-    for reply in replies:
-        try:
-            if not isinstance(reply, dict):
-                error_count += 1
-                continue
-                
-            user = reply.get("user", {})
-            if not isinstance(user, dict):
-                error_count += 1
-                continue
-                
-            create_time = reply.get("create_time", 0)
-            if not isinstance(create_time, (int, float)):
-                create_time = 0
-                
-            cid = reply.get("cid", "")
-            if not cid:
-                error_count += 1
-                continue
-                
-            data.append({
-                "评论ID": cid,
-                "评论内容": reply.get("text", ""),
-                "点赞数": int(reply.get("digg_count", 0)),
-                "评论时间": datetime.fromtimestamp(create_time).strftime("%Y-%m-%d %H:%M:%S"),
-                "用户昵称": user.get("nickname", "未知"),
-                "用户抖音号": user.get("unique_id", "未设置"),
-                "ip归属": reply.get("ip_label", "未知"),
-                "回复总数": 0  # 二级评论没有回复
-            })
-        except Exception as e:
-            error_count += 1
-            logger.error(f"处理回复数据时出错: {str(e)}, 回复数据: {reply}")
-            continue
-            
-    if error_count > 0:
-        logger.warning(f"处理回复数据时有 {error_count} 条记录出错")
+    Args:
+        sink: 已写入评论的结果写入器
+        replies_df: 回复表格
+        watermark: 视频水位线，结果保存后更新
+        delta: 增量采集时把已有结果中的记录追加到新增记录之后
         
-    return pd.DataFrame(data)
+    Returns:
+        int: 保存的记录数
+    """
+    new_rows = sink.rows_written
+    if replies_df is not None:
+        sink.write(replies_df)
+    
+    # 增量采集时只把新增的行合并到已有结果中
+    if delta:
+        sink.copy_existing()
+        logger.info(f"新增 {new_rows} 条评论，合并后共 {sink.rows_written} 条记录")
+    
+    sink.close()
+    # 结果保存后再更新水位线，避免中断时漏掉评论
+    if watermark is not None:
+        watermark.save()
+    return sink.rows_written
+
+async def crawl_video(aweme_id, get_replies=False, resume=True, delta=False, output_format=None, export_dataset=None):
+    """
+    非交互方式采集单个视频并保存结果，供批量采集使用
+    
+    评论逐页写入结果文件旁边的临时文件，采集完成后原子替换为结果文件。
+    
+    Args:
+        aweme_id: 视频ID
+        get_replies: 是否采集回复
+        resume: 存在断点时是否继续上次的采集
+        delta: 已有采集结果时是否只采集新增评论
+        output_format: csv 或 parquet，默认读取 DOUYIN_OUTPUT_FORMAT 环境变量
+        export_dataset: 是否把结果追加到分区 Parquet 数据集，默认读取 DOUYIN_EXPORT_DATASET 环境变量
+        
+    Returns:
+        dict: 评论数、回复数、保存路径和数据集文件路径
+    """
+    sink = open_video_sink(aweme_id, output_format)
+    watermark = VideoWatermark(aweme_id)
+    delta = delta and os.path.exists(sink.path) and watermark.exists()
+    if delta:
+        watermark.load()
+    
+    total, threads = await stream_comments_async(aweme_id, sink, resume=resume, watermark=watermark, delta=delta)
+    if total == 0:
+        sink.discard()
+        return {"comments": 0, "replies": 0, "path": None, "dataset_path": None}
+    
+    reply_count = 0
+    if get_replies and threads:
+        # 回复同样逐页写入
+        reply_count = await stream_replies_async(
+            threads, lambda comment_id, replies: sink.write(process_replies(replies, None))
+        )
+    
+    finish_results(sink, watermark=watermark, delta=delta)
+    dataset_path = None
+    if EXPORT_DATASET if export_dataset is None else export_dataset:
+        dataset_path = export_result(aweme_id, sink.path)
+    return {
+        "comments": total,
+        "replies": reply_count,
+        "path": sink.path,
+        "dataset_path": dataset_path,
+    }
 
 async def main_async():
     """异步主函数"""
@@ -259,30 +382,48 @@ async def main_async():
         logger.error("视频ID不能为空")
         return
         
-    # 获取评论
-    comments = await fetch_all_comments_async(aweme_id)
-    if not comments:
-        logger.error("未获取到评论数据")
-        return
+    # 整个采集过程复用同一个HTTP客户端
+    async with client_session():
+        # 评论和回复逐页写入结果文件旁边的临时文件
+        sink = open_video_sink(aweme_id)
         
-    comments_df = process_comments(comments)
-    logger.info(f"成功获取 {len(comments)} 条评论")
-    
-    # 询问是否获取回复
-    get_replies = input("是否获取评论的回复？(y/n): ").strip().lower() == 'y'
-    if get_replies:
-        replies = await fetch_all_replies_async(comments)
-        logger.info(f"成功获取 {len(replies)} 条回复")
-        replies_df = process_replies(replies, comments_df)
-        result = pd.concat([comments_df, replies_df], ignore_index=True)
-    else:
-        result = comments_df
-    
-    # 保存数据
-    save_dir = f"data/v1/{aweme_id}"
-    os.makedirs(save_dir, exist_ok=True)
-    result.to_csv(f"{save_dir}/comments.csv", index=False, encoding="utf-8-sig")
-    logger.info(f"数据已保存到 {save_dir}/comments.csv")
+        # 存在未完成的采集时询问是否继续
+        resume = False
+        if CrawlCheckpoint(aweme_id).exists():
+            resume = input("检测到未完成的采集进度，是否继续？(y/n): ").strip().lower() == 'y'
+        
+        # 已有采集结果时可以只采集新增评论
+        watermark = VideoWatermark(aweme_id)
+        delta = False
+        if os.path.exists(sink.path) and watermark.exists():
+            delta = input("检测到已有采集结果，是否只采集新增评论？(y/n): ").strip().lower() == 'y'
+            if delta:
+                watermark.load()
+        
+        # 获取评论，逐页转换为表格并写入
+        total, threads = await stream_comments_async(aweme_id, sink, resume=resume, watermark=watermark, delta=delta)
+        if total == 0:
+            sink.discard()
+            if delta:
+                logger.info("没有新增评论")
+            else:
+                logger.error("未获取到评论数据")
+            return
+            
+        logger.info(f"成功获取 {total} 条评论")
+        
+        # 询问是否获取回复
+        get_replies = input("是否获取评论的回复？(y/n): ").strip().lower() == 'y'
+        if get_replies:
+            reply_count = await stream_replies_async(
+                threads, lambda comment_id, page: sink.write(process_replies(page, None))
+            )
+            logger.info(f"成功获取 {reply_count} 条回复")
+        
+        finish_results(sink, watermark=watermark, delta=delta)
+        # 结果文件每次都会被覆盖，需要保留历史时追加到分区数据集
+        if EXPORT_DATASET:
+            export_result(aweme_id, sink.path)
 
 if __name__ == "__main__":
     try:
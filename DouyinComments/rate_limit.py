@@ -0,0 +1,193 @@
+"""
+自适应请求速率控制
+
+采集器在每次请求前调用 wait() 获取令牌，并在请求结束后反馈结果。
+AIMDRateController 在响应正常时逐步提高速率（加性增），遇到限流、
+空页面或403时成倍降低速率（乘性减），取代固定的随机延时。
+内部状态使用线程锁保护，可以在多个事件循环之间共享。
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+# 判定为上游限流的错误关键字
+THROTTLE_KEYWORDS = ("IP被限制", "访问被拒绝", "403")
+
+
+def is_throttle_error(error) -> bool:
+    """判断错误是否由上游限流引起"""
+    message = str(error)
+    return any(keyword in message for keyword in THROTTLE_KEYWORDS)
+
+
+class RateController:
+    """速率控制器基类，定义采集器使用的接口"""
+
+    async def wait(self):
+        """在发送请求前调用，必要时等待"""
+        raise NotImplementedError
+
+    def record_success(self):
+        """请求成功且获取到数据"""
+        pass
+
+    def record_empty(self):
+        """请求成功但返回空页面或没有新数据"""
+        pass
+
+    def record_throttled(self):
+        """上游限流，如IP被限制或HTTP 403"""
+        pass
+
+    def record_error(self, error: Exception):
+        """请求出错，根据错误类型反馈"""
+        if is_throttle_error(error):
+            self.record_throttled()
+        else:
+            self.record_empty()
+
+
+class FixedDelayController(RateController):
+    """
+    固定随机延时，与原有的 random.uniform 行为一致
+
+    Args:
+        min_delay: 最小延时（秒）
+        max_delay: 最大延时（秒）
+    """
+
+    def __init__(self, min_delay: float = 1.5, max_delay: float = 3.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._first = True
+
+    async def wait(self):
+        if self._first:
+            self._first = False
+            return
+        await asyncio.sleep(random.uniform(self.min_delay, self.max_delay))
+
+
+class AIMDRateController(RateController):
+    """
+    基于令牌桶的AIMD速率控制器
+
+    Args:
+        initial_rate: 初始速率（请求/秒）
+        min_rate: 最低速率
+        max_rate: 最高速率
+        increase: 每次成功后增加的速率
+        decrease_factor: 限流时速率的缩减比例
+        empty_factor: 空页面时速率的缩减比例
+        burst: 令牌桶容量，允许的突发请求数
+        cooldown: 限流后暂停请求的时间（秒）
+        jitter: 等待时间的随机抖动比例
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 0.5,
+        min_rate: float = 0.1,
+        max_rate: float = 5.0,
+        increase: float = 0.05,
+        decrease_factor: float = 0.5,
+        empty_factor: float = 0.8,
+        burst: int = 1,
+        cooldown: float = 10.0,
+        jitter: float = 0.2,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.empty_factor = empty_factor
+        self.burst = burst
+        self.cooldown = cooldown
+        self.jitter = jitter
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """
+        预定一个令牌
+
+        Returns:
+            float: 需要等待的时间（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            delay = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(delay, self._blocked_until - now)
+
+    async def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            delay *= 1 + random.uniform(0, self.jitter)
+            await asyncio.sleep(delay)
+
+    def _set_rate(self, rate: float):
+        self._refill(time.monotonic())
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def record_success(self):
+        with self._lock:
+            self._set_rate(self.rate + self.increase)
+
+    def record_empty(self):
+        with self._lock:
+            self._set_rate(self.rate * self.empty_factor)
+
+    def record_throttled(self):
+        with self._lock:
+            self._set_rate(self.rate * self.decrease_factor)
+            self._blocked_until = time.monotonic() + self.cooldown
+            rate = self.rate
+        logger.warning(f"检测到限流，速率降低至 {rate:.2f} 次/秒，暂停 {self.cooldown:.0f} 秒")
+
+    @property
+    def current_rate(self) -> float:
+        return self.rate
+
+
+_default_controller: Optional[RateController] = None
+_default_lock = threading.Lock()
+
+
+def get_rate_controller() -> RateController:
+    """
+    获取进程内共享的默认速率控制器
+
+    速率参数可以通过 DOUYIN_RATE_INITIAL、DOUYIN_RATE_MIN、DOUYIN_RATE_MAX 环境变量调整。
+    """
+    global _default_controller
+    with _default_lock:
+        if _default_controller is None:
+            _default_controller = AIMDRateController(
+                initial_rate=float(os.getenv('DOUYIN_RATE_INITIAL', '0.5')),
+                min_rate=float(os.getenv('DOUYIN_RATE_MIN', '0.1')),
+                max_rate=float(os.getenv('DOUYIN_RATE_MAX', '5')),
+            )
+        return _default_controller
+
+
+def set_rate_controller(controller: RateController):
+    """替换进程内共享的默认速率控制器"""
+    global _default_controller
+    with _default_lock:
+        _default_controller = controller
@@ -0,0 +1,193 @@
+"""
+评论记录和接口响应解码
+
+接口返回的每条评论都带有完整的用户信息、头像地址列表等大量嵌套数据，而采集结果只用到其中少数字段。
+评论列表和回复列表的响应按声明的结构用 msgspec 完成解码、校验和字段投影，
+每条评论单独解码，格式不正确的评论只跳过这一条，未声明的字段在解码时直接跳过，整个采集流程（采集器、表格转换、数据库保存）都使用 CommentRecord，
+每条评论占用的内存从几KB降到一百多字节。需要原始数据时可以通过
+DOUYIN_KEEP_RAW 环境变量或 keep_raw 参数保留。
+"""
+import os
+from typing import Any, Iterable, List, Optional, Union
+
+import msgspec
+from loguru import logger
+
+# 是否在记录中保留接口返回的原始数据
+KEEP_RAW = os.getenv('DOUYIN_KEEP_RAW', 'false').lower() == 'true'
+
+
+class CommentUser(msgspec.Struct, gc=False):
+    """评论用户，只保留需要的字段"""
+
+    uid: Union[str, int] = ''
+    nickname: Optional[str] = None
+    unique_id: Optional[str] = None
+
+
+class CommentRecord(msgspec.Struct, gc=False):
+    """
+    一条评论或回复
+
+    字段名与接口返回的字段一致，除属性访问外也支持 record["cid"]、record.get("cid") 的读取方式。
+    缺失的用户昵称、抖音号和IP归属为 None，由使用方决定默认值。
+
+    Args:
+        cid: 评论ID
+        text: 评论内容
+        aweme_id: 视频ID
+        create_time: 评论时间戳
+        digg_count: 点赞数
+        reply_comment_total: 回复总数
+        ip_label: IP归属
+        user: 评论用户
+        raw: 接口返回的原始数据，默认不保留
+    """
+
+    cid: str
+    text: str
+    aweme_id: str = ''
+    create_time: int = 0
+    digg_count: int = 0
+    reply_comment_total: int = 0
+    ip_label: Optional[str] = None
+    user: Optional[CommentUser] = None
+    # 接口中没有这个字段，使用不会出现的字段名避免解码时被填充
+    raw: Optional[dict] = msgspec.field(default=None, name='__raw__')
+
+    @property
+    def uid(self) -> str:
+        return str(self.user.uid) if self.user else ''
+
+    @property
+    def nickname(self) -> Optional[str]:
+        return self.user.nickname if self.user else None
+
+    @property
+    def unique_id(self) -> Optional[str]:
+        return self.user.unique_id if self.user else None
+
+    @classmethod
+    def from_api(cls, data: Any, keep_raw: Optional[bool] = None) -> Optional['CommentRecord']:
+        """
+        从接口返回的一条评论创建记录
+
+        Args:
+            data: 接口返回的评论数据
+            keep_raw: 是否保留原始数据，默认读取 DOUYIN_KEEP_RAW 环境变量
+
+        Returns:
+            Optional[CommentRecord]: 缺少评论ID或评论内容等格式不正确时返回 None
+        """
+        try:
+            record = msgspec.convert(data, cls, strict=False)
+        except msgspec.ValidationError:
+            return None
+        record.raw = data if _keep_raw(keep_raw) else None
+        return record
+
+    @classmethod
+    def from_api_list(cls, items: Iterable[Any], keep_raw: Optional[bool] = None) -> List['CommentRecord']:
+        """转换接口返回的评论列表，跳过格式不正确的评论"""
+        records = (cls.from_api(item, keep_raw) for item in items)
+        return [record for record in records if record is not None]
+
+    def __getitem__(self, key: str):
+        if key not in _RECORD_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key) if key in _RECORD_KEYS else None
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return key in _RECORD_KEYS and getattr(self, key) is not None
+
+    def to_dict(self) -> dict:
+        """转换为字典，用户字段展开到顶层，不包含原始数据"""
+        return {key: getattr(self, key) for key in _RECORD_KEYS}
+
+
+_RECORD_KEYS = ('cid', 'text', 'aweme_id', 'create_time', 'digg_count', 'reply_comment_total',
+                'ip_label', 'uid', 'nickname', 'unique_id')
+
+
+class CommentPage(msgspec.Struct, gc=False):
+    """
+    评论列表或回复列表接口的响应
+
+    has_more 和 cursor 为 None 表示响应中没有这个字段，由调用方决定默认值。
+    """
+
+    status_code: Optional[int] = None
+    status_msg: Optional[str] = None
+    comments: List[CommentRecord] = msgspec.field(default_factory=list)
+    has_more: Optional[Union[bool, int]] = None
+    cursor: Optional[int] = None
+    total: Optional[int] = None
+
+
+class _RawCommentPage(msgspec.Struct, gc=False):
+    """解码时使用的响应结构，评论保留为原始JSON，逐条解码"""
+
+    status_code: Optional[int] = None
+    status_msg: Optional[str] = None
+    comments: Optional[List[msgspec.Raw]] = None
+    has_more: Optional[Union[bool, int]] = None
+    cursor: Optional[int] = None
+    total: Optional[int] = None
+
+
+_page_decoder = msgspec.json.Decoder(_RawCommentPage, strict=False)
+_record_decoder = msgspec.json.Decoder(CommentRecord, strict=False)
+
+
+def decode_comment_page(content: bytes, keep_raw: Optional[bool] = None) -> CommentPage:
+    """
+    解码评论列表或回复列表接口的响应
+
+    Args:
+        content: 响应内容
+        keep_raw: 是否在记录中保留原始数据，默认读取 DOUYIN_KEEP_RAW 环境变量
+
+    Returns:
+        CommentPage: 解码后的响应，格式不正确的评论已跳过，comments 为空时是空列表
+
+    Raises:
+        ValueError: 响应不是JSON或响应本身不符合声明的结构
+    """
+    try:
+        page = _page_decoder.decode(content)
+    except msgspec.MsgspecError as e:
+        raise ValueError(f"返回数据格式错误: {str(e)}")
+    keep_raw = _keep_raw(keep_raw)
+    records = []
+    for item in page.comments or ():
+        try:
+            record = _record_decoder.decode(item)
+        except msgspec.ValidationError:
+            continue
+        if keep_raw:
+            record.raw = msgspec.json.decode(item)
+        records.append(record)
+    skipped = len(page.comments or ()) - len(records)
+    if skipped:
+        logger.warning(f"本页有 {skipped} 条评论格式不正确，已跳过")
+    return CommentPage(
+        status_code=page.status_code,
+        status_msg=page.status_msg,
+        comments=records,
+        has_more=page.has_more,
+        cursor=page.cursor,
+        total=page.total,
+    )
+
+
+def _keep_raw(keep_raw: Optional[bool]) -> bool:
+    return KEEP_RAW if keep_raw is None else keep_raw
+
+
+def as_record(item: Any) -> Optional[CommentRecord]:
+    """把评论记录或接口返回的评论字典统一转换为 CommentRecord"""
+    return item if isinstance(item, CommentRecord) else CommentRecord.from_api(item)
@@ -0,0 +1,254 @@
+"""
+常驻Node.js签名进程池
+
+每个工作进程只加载一次 douyin.js，之后通过管道按行接收JSON格式的签名任务，
+避免 execjs 每次调用都重新启动Node进程。主要用于 douyin.js 更新后、
+douyin_sign.py 尚未同步移植期间的备用签名方式。
+"""
+import itertools
+import json
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'douyin.js')
+
+# 签名函数名称，对应 douyin.js 中的导出函数
+SIGN_FUNCTIONS = {
+    'detail': 'sign_datail',
+    'reply': 'sign_reply',
+}
+
+# 工作进程脚本：加载签名脚本后逐行处理任务
+WORKER_SCRIPT = r"""
+const fs = require('fs');
+const vm = require('vm');
+const readline = require('readline');
+let code = fs.readFileSync(process.argv[1], 'utf8').replace(/^\ufeff/, '');
+vm.runInThisContext(code);
+const rl = readline.createInterface({input: process.stdin});
+rl.on('line', (line) => {
+    let request;
+    try {
+        request = JSON.parse(line);
+        const results = request.jobs.map(([fn, query, ua]) => globalThis[fn](query, ua));
+        process.stdout.write(JSON.stringify({id: request.id, results: results}) + '\n');
+    } catch (e) {
+        process.stdout.write(JSON.stringify({id: request ? request.id : null, error: String(e)}) + '\n');
+    }
+});
+"""
+
+
+def find_node() -> str:
+    """查找Node.js可执行文件路径"""
+    node_path = os.getenv('DOUYIN_NODE_PATH') or shutil.which('node')
+    if node_path:
+        return node_path
+    if platform.system() == 'Windows':
+        return r'C:\Program Files\nodejs\node.exe'  # Windows默认Node.js路径
+    return '/usr/local/bin/node'  # Mac默认Node.js路径
+
+
+class SignWorkerError(Exception):
+    """签名工作进程异常"""
+    pass
+
+
+class SignTimeoutError(SignWorkerError):
+    """签名任务超时"""
+    pass
+
+
+class SignWorker:
+    """单个常驻Node签名进程"""
+
+    def __init__(self, node_path: str, script_path: str = SCRIPT_PATH):
+        self.node_path = node_path
+        self.script_path = script_path
+        self._ids = itertools.count(1)
+        self._responses = queue.Queue()
+        self.process = None
+        self.start()
+
+    def start(self):
+        """启动Node进程并开始读取输出"""
+        self.process = subprocess.Popen(
+            [self.node_path, '-e', WORKER_SCRIPT, self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        self._responses = queue.Queue()
+        reader = threading.Thread(
+            target=self._read_output,
+            args=(self.process, self._responses),
+            daemon=True,
+        )
+        reader.start()
+
+    @staticmethod
+    def _read_output(process, responses):
+        for line in process.stdout:
+            responses.put(line)
+        # 进程退出时通知等待中的任务
+        responses.put(None)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def sign(self, jobs: Sequence[Tuple[str, str, str]], timeout: float) -> List[str]:
+        """
+        在当前进程中执行一批签名任务
+
+        Args:
+            jobs: (函数名, 查询字符串, User-Agent) 列表
+            timeout: 整批任务的超时时间（秒）
+
+        Returns:
+            List[str]: 与任务一一对应的签名结果
+
+        Raises:
+            SignWorkerError: 进程崩溃、超时或签名脚本报错
+        """
+        process, responses = self.process, self._responses
+        if process is None or process.poll() is not None:
+            raise SignWorkerError("签名进程未运行")
+
+        request_id = next(self._ids)
+        try:
+            process.stdin.write(json.dumps({'id': request_id, 'jobs': jobs}, ensure_ascii=False) + '\n')
+            process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise SignWorkerError(f"写入签名任务失败: {str(e)}")
+
+        while True:
+            try:
+                line = responses.get(timeout=timeout)
+            except queue.Empty:
+                raise SignTimeoutError(f"签名任务超时（{timeout}秒）")
+            if line is None:
+                raise SignWorkerError("签名进程意外退出")
+
+            response = json.loads(line)
+            if response.get('id') != request_id:
+                # 丢弃已超时任务的迟到结果
+                continue
+            if 'error' in response:
+                raise SignWorkerError(f"签名脚本运行错误: {response['error']}")
+            return response['results']
+
+    def close(self):
+        """结束Node进程"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+
+class SignPool:
+    """
+    Node签名进程池
+
+    Args:
+        size: 常驻进程数量，默认读取 DOUYIN_SIGN_WORKERS 环境变量
+        timeout: 单个任务的超时时间（秒），默认读取 DOUYIN_SIGN_TIMEOUT 环境变量
+        node_path: Node.js 路径，默认自动查找
+        script_path: 签名脚本路径
+    """
+
+    def __init__(self, size: Optional[int] = None, timeout: Optional[float] = None, node_path: Optional[str] = None,
+                 script_path: str = SCRIPT_PATH):
+        self.size = size or int(os.getenv('DOUYIN_SIGN_WORKERS', '2'))
+        self.timeout = timeout or float(os.getenv('DOUYIN_SIGN_TIMEOUT', '5'))
+        self.node_path = node_path or find_node()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # 保留所有进程的引用，关闭时不依赖进程是否空闲
+        self._workers = [SignWorker(self.node_path, script_path) for _ in range(self.size)]
+        for worker in self._workers:
+            self._idle.put(worker)
+        logger.success(f"签名进程池已启动，进程数: {self.size}")
+
+    def _restart(self, worker: SignWorker) -> SignWorker:
+        """重启崩溃或超时的进程，进程池已关闭时不再重启"""
+        with self._lock:
+            if self._closed:
+                raise SignWorkerError("签名进程池已关闭")
+            logger.warning("签名进程异常，正在重启")
+            worker.close()
+            worker.start()
+        return worker
+
+    def sign_many(self, queries: Sequence[str], user_agent: str, kind: str = 'detail') -> List[str]:
+        """
+        批量签名，一次往返完成多个查询字符串的签名
+
+        Args:
+            queries: 查询字符串列表
+            user_agent: 请求使用的User-Agent
+            kind: 签名类型，detail 或 reply
+
+        Returns:
+            List[str]: 与 queries 一一对应的签名结果
+        """
+        if self._closed:
+            raise SignWorkerError("签名进程池已关闭")
+        if not queries:
+            return []
+
+        call_name = SIGN_FUNCTIONS[kind]
+        jobs = [(call_name, query, user_agent) for query in queries]
+        # 超时按任务数量放大，保证批量任务有足够的时间
+        timeout = self.timeout * len(jobs)
+
+        worker = self._idle.get()
+        try:
+            if not worker.is_alive():
+                worker = self._restart(worker)
+            try:
+                return worker.sign(jobs, timeout)
+            except SignWorkerError as e:
+                logger.error(f"签名任务失败: {str(e)}")
+                if not worker.is_alive() or isinstance(e, SignTimeoutError):
+                    worker = self._restart(worker)
+                raise
+        finally:
+            self._idle.put(worker)
+
+    def sign(self, query: str, user_agent: str, kind: str = 'detail') -> str:
+        """对单个查询字符串签名"""
+        return self.sign_many([query], user_agent, kind)[0]
+
+    def close(self):
+        """
+        关闭所有进程
+
+        不等待被取出的进程归还，直接结束所有进程；执行中的任务最多等待进程退出的超时时间，
+        之后的任务会收到 SignWorkerError。
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                worker.close()
+        logger.info("签名进程池已关闭")
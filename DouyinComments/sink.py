@@ -0,0 +1,274 @@
+"""
+采集结果写入器
+
+采集过程中每获取一页就追加写入结果文件旁边的临时文件（comments.partial.csv 或
+comments.partial.parquet 目录），全部写完后再原子替换为最终的结果文件。
+内存中不再保留全部评论，下游任务在采集结束前就可以读取临时文件；
+进程中断时临时文件中已写入的数据仍然完整可用，也可以配合采集断点继续写入。
+
+CSV 每页写入后立即刷新到文件。Parquet 按行组攒批，每攒够一个行组写成临时目录中的一个
+独立文件，每个文件都是完整的 Parquet 文件；完成时按行组大小合并为最终文件。
+"""
+import os
+import shutil
+from typing import Iterable, Optional, Set
+
+import pandas as pd
+from loguru import logger
+
+# 默认输出格式，csv 或 parquet
+DEFAULT_FORMAT = os.getenv('DOUYIN_OUTPUT_FORMAT', 'csv').lower()
+# Parquet 每个行组的行数
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('DOUYIN_PARQUET_ROW_GROUP_SIZE', '10000'))
+# 读取CSV时需要保持为字符串的列和需要解析为时间的列
+CSV_DTYPES = {"评论ID": str, "用户抖音号": str}
+DATE_COLUMNS = ["评论时间"]
+# 判断记录是否重复的列
+KEY_COLUMN = "评论ID"
+# 合并已有结果时每次读取的行数
+READ_CHUNK_SIZE = 10000
+
+
+class CommentSink:
+    """
+    逐页写入评论表格，完成后原子替换结果文件
+
+    Args:
+        path: 最终结果文件路径
+    """
+
+    extension = ''
+
+    def __init__(self, path: str):
+        self.path = path
+        root, _ = os.path.splitext(path)
+        self.temp_path = f"{root}.partial{self.extension}"
+        self.rows_written = 0
+        self.ids: Set[str] = set()
+
+    def has_partial(self) -> bool:
+        """是否存在上次未完成的临时文件"""
+        return os.path.exists(self.temp_path)
+
+    def read_partial(self) -> pd.DataFrame:
+        """读取临时文件中已写入的数据，并继续在其后追加"""
+        raise NotImplementedError
+
+    def write(self, df: pd.DataFrame):
+        """追加一页数据"""
+        if df is None or df.empty:
+            return
+        self._write(df)
+        self.rows_written += len(df)
+        if KEY_COLUMN in df.columns:
+            self.ids.update(df[KEY_COLUMN].astype(str))
+
+    def _write(self, df: pd.DataFrame):
+        raise NotImplementedError
+
+    def flush(self):
+        """把已写入的数据保存到临时文件，采集断点保存前调用"""
+
+    def copy_existing(self):
+        """把已有结果文件中本次没有写入的记录追加到本次结果之后，用于增量采集"""
+        if not os.path.exists(self.path):
+            return
+        copied = 0
+        for chunk in self._read_existing():
+            chunk = chunk[~chunk[KEY_COLUMN].astype(str).isin(self.ids)]
+            self.write(chunk)
+            copied += len(chunk)
+        logger.info(f"已合并原有的 {copied} 条记录")
+
+    def _read_existing(self) -> Iterable[pd.DataFrame]:
+        raise NotImplementedError
+
+    def close(self) -> str:
+        """
+        完成写入，把临时文件原子替换为最终结果文件
+
+        Returns:
+            str: 结果文件路径
+        """
+        raise NotImplementedError
+
+    def discard(self):
+        """删除临时文件"""
+        raise NotImplementedError
+
+
+class CsvSink(CommentSink):
+    """逐页追加写入CSV，每页写入后立即刷新"""
+
+    extension = '.csv'
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = None
+
+    def read_partial(self) -> pd.DataFrame:
+        df = pd.read_csv(self.temp_path, dtype=CSV_DTYPES, parse_dates=DATE_COLUMNS)
+        self.rows_written = len(df)
+        self.ids.update(df[KEY_COLUMN].astype(str))
+        return df
+
+    def _write(self, df: pd.DataFrame):
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.temp_path)), exist_ok=True)
+            # 只在新文件开头写入BOM和表头，继续写入时直接追加
+            is_new = not os.path.exists(self.temp_path) or os.path.getsize(self.temp_path) == 0
+            self._file = open(self.temp_path, 'a', encoding='utf-8-sig' if is_new else 'utf-8', newline='')
+            self._header = is_new
+        df.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+        self._file.flush()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _read_existing(self) -> Iterable[pd.DataFrame]:
+        return pd.read_csv(self.path, dtype=CSV_DTYPES, parse_dates=DATE_COLUMNS, chunksize=READ_CHUNK_SIZE)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> str:
+        self._close_file()
+        if not os.path.exists(self.temp_path):
+            raise ValueError("没有可以保存的数据")
+        os.replace(self.temp_path, self.path)
+        logger.info(f"数据已保存到 {self.path}")
+        return self.path
+
+    def discard(self):
+        self._close_file()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class ParquetSink(CommentSink):
+    """
+    按行组攒批写入Parquet
+
+    Args:
+        path: 最终结果文件路径
+        row_group_size: 每个行组的行数
+    """
+
+    extension = '.parquet'
+
+    def __init__(self, path: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        super().__init__(path)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("保存为Parquet格式需要安装 pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.row_group_size = max(1, row_group_size)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _parts(self):
+        if not os.path.isdir(self.temp_path):
+            return []
+        return sorted(
+            os.path.join(self.temp_path, name) for name in os.listdir(self.temp_path) if name.endswith('.parquet')
+        )
+
+    def has_partial(self) -> bool:
+        return bool(self._parts())
+
+    def read_partial(self) -> pd.DataFrame:
+        frames = [pd.read_parquet(part) for part in self._parts()]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.rows_written = len(df)
+        if not df.empty:
+            self.ids.update(df[KEY_COLUMN].astype(str))
+        return df
+
+    def _write(self, df: pd.DataFrame):
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """把攒批的数据写成临时目录中的一个完整Parquet文件"""
+        if not self._buffer:
+            return
+        os.makedirs(self.temp_path, exist_ok=True)
+        table = self._pa.Table.from_pandas(pd.concat(self._buffer, ignore_index=True), preserve_index=False)
+        part_path = os.path.join(self.temp_path, f"part-{len(self._parts()):05d}.parquet")
+        self._pq.write_table(table, f"{part_path}.tmp")
+        os.replace(f"{part_path}.tmp", part_path)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def _read_existing(self) -> Iterable[pd.DataFrame]:
+        for batch in self._pq.ParquetFile(self.path).iter_batches(batch_size=READ_CHUNK_SIZE):
+            yield batch.to_pandas()
+
+    def close(self) -> str:
+        self.flush()
+        parts = self._parts()
+        if not parts:
+            raise ValueError("没有可以保存的数据")
+        temp_file = f"{self.path}.tmp"
+        writer = None
+        pending = []
+        pending_rows = 0
+        try:
+            # 逐个读取临时文件，按行组大小重新攒批写入最终文件
+            for part in parts:
+                table = self._pq.read_table(part)
+                if writer is None:
+                    writer = self._pq.ParquetWriter(temp_file, table.schema)
+                pending.append(table.cast(writer.schema))
+                pending_rows += table.num_rows
+                if pending_rows >= self.row_group_size:
+                    # 只写入完整的行组，剩余的行留到下一批
+                    merged = self._pa.concat_tables(pending)
+                    full_rows = pending_rows - pending_rows % self.row_group_size
+                    writer.write_table(merged.slice(0, full_rows), row_group_size=self.row_group_size)
+                    pending = [merged.slice(full_rows)]
+                    pending_rows -= full_rows
+            if pending_rows:
+                writer.write_table(self._pa.concat_tables(pending), row_group_size=self.row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(temp_file, self.path)
+        shutil.rmtree(self.temp_path)
+        logger.info(f"数据已保存到 {self.path}")
+        return self.path
+
+    def discard(self):
+        self._buffer = []
+        self._buffered_rows = 0
+        if os.path.isdir(self.temp_path):
+            shutil.rmtree(self.temp_path)
+
+
+def open_sink(path: str, output_format: Optional[str] = None) -> CommentSink:
+    """
+    创建结果写入器
+
+    Args:
+        path: 结果文件路径
+        output_format: csv 或 parquet，默认读取 DOUYIN_OUTPUT_FORMAT 环境变量
+
+    Raises:
+        ValueError: 不支持的格式
+    """
+    output_format = (output_format or DEFAULT_FORMAT).lower()
+    if output_format == 'csv':
+        return CsvSink(path)
+    if output_format == 'parquet':
+        return ParquetSink(path)
+    raise ValueError(f"不支持的输出格式: {output_format}")
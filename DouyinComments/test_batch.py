@@ -0,0 +1,66 @@
+"""
+批量采集调度测试
+
+使用桩函数代替 crawl_video，不发送网络请求。
+"""
+import asyncio
+
+import batch
+
+
+def run(monkeypatch, entries, concurrency, per_cookie=10):
+    crawled = []
+    running = 0
+    peak = 0
+
+    async def crawl_video(aweme_id, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        crawled.append(aweme_id)
+        await asyncio.sleep(0.02)
+        running -= 1
+        if aweme_id == "500":
+            raise ValueError("视频不存在或已被删除")
+        if aweme_id == "600":
+            return {"comments": 0, "replies": 0, "path": None, "dataset_path": None}
+        return {"comments": 10, "replies": 2, "path": f"data/v1/{aweme_id}/comments.csv", "dataset_path": None}
+
+    monkeypatch.setattr(batch, "crawl_video", crawl_video)
+    monkeypatch.setattr(batch, "get_cookie_source", lambda: "cookie")
+    summary = asyncio.run(batch.run_batch(entries, concurrency=concurrency, per_cookie=per_cookie))
+    return summary, crawled, peak
+
+
+def test_run_batch_summary_and_duplicates(monkeypatch):
+    entries = [
+        "100",
+        "https://www.douyin.com/video/100?previous_page=app_code_link",
+        "200",
+        "无法识别的文本",
+        "500",
+        "https://www.douyin.com/jingxuan?modal_id=200",
+        "600",
+    ]
+    summary, crawled, _ = run(monkeypatch, entries, concurrency=3)
+
+    # 同一个视频只采集一次
+    assert sorted(crawled) == ["100", "200", "500", "600"]
+    statuses = [video["status"] for video in summary["videos"]]
+    assert statuses == ["ok", "duplicate", "ok", "failed", "failed", "duplicate", "empty"]
+    assert [video["input"] for video in summary["videos"]] == entries
+    assert summary["videos"][1]["error"] == "与第 1 项是同一个视频"
+    assert summary["videos"][4]["error"] == "视频不存在或已被删除"
+    assert (summary["total"], summary["succeeded"], summary["empty"], summary["failed"], summary["duplicate"]) == (7, 2, 1, 2, 2)
+    assert summary["comments"] == 20
+    assert summary["replies"] == 4
+
+
+def test_single_cookie_limits_concurrency(monkeypatch):
+    entries = [str(1000 + i) for i in range(8)]
+    _, crawled, peak = run(monkeypatch, entries, concurrency=6, per_cookie=2)
+    assert sorted(crawled) == entries
+    assert peak == 2
+
+    _, _, peak = run(monkeypatch, entries, concurrency=4)
+    assert peak == 4
@@ -0,0 +1,41 @@
+"""
+采集断点测试
+"""
+import os
+
+from checkpoint import CrawlCheckpoint
+
+
+def test_advance_saves_every_interval(tmp_path):
+    checkpoint = CrawlCheckpoint("123", directory=str(tmp_path), interval=2)
+    checkpoint.advance("20", 2)
+    assert not checkpoint.exists()
+    checkpoint.advance("40", 1)
+    assert checkpoint.exists()
+
+    loaded = CrawlCheckpoint("123", directory=str(tmp_path))
+    assert loaded.load()
+    assert loaded.cursor == "40"
+    assert loaded.comments_written == 3
+    assert loaded.pages_written == 2
+
+
+def test_flush_and_clear(tmp_path):
+    checkpoint = CrawlCheckpoint("123", directory=str(tmp_path), interval=10)
+    checkpoint.advance("20", 1)
+    checkpoint.flush()
+    assert CrawlCheckpoint("123", directory=str(tmp_path)).load()
+
+    checkpoint.clear()
+    assert not checkpoint.exists()
+    assert not CrawlCheckpoint("123", directory=str(tmp_path)).load()
+
+
+def test_file_size_does_not_grow_with_comments(tmp_path):
+    checkpoint = CrawlCheckpoint("123", directory=str(tmp_path), interval=1)
+    checkpoint.advance("20", 20)
+    size = os.path.getsize(checkpoint.path)
+    for page in range(2, 200):
+        checkpoint.advance(str(page * 20), 20)
+    # 只保存cursor和计数，不再保存全部评论ID
+    assert os.path.getsize(checkpoint.path) <= size + 8
@@ -0,0 +1,79 @@
+"""
+Cookie池测试
+"""
+import asyncio
+import time
+
+import pytest
+
+from cookie_pool import BASE_COOLDOWN, CookiePool, NoCookieAvailable
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return CookiePool(str(tmp_path / "cookie_pool.db"))
+
+
+def test_call_fails_over_to_next_cookie(pool):
+    first = pool.add("cookie-a", "a")
+    second = pool.add("cookie-b", "b")
+    used = []
+
+    async def request(cookie):
+        used.append(cookie)
+        if cookie == "cookie-a":
+            raise ValueError("Cookie已失效，请重新登录")
+        return "ok"
+
+    # 健康分相同时先使用最久未使用的账号
+    assert asyncio.run(pool.call(request)) == "ok"
+    assert used == ["cookie-a", "cookie-b"]
+
+    accounts = {account.id: account for account in pool.accounts()}
+    assert accounts[first].disabled == 1
+    assert accounts[first].health == 0
+    assert accounts[second].disabled == 0
+    assert len(pool) == 1
+
+
+def test_throttled_cookie_cools_down(pool):
+    account_id = pool.add("cookie-a", "a")
+
+    async def throttled(cookie):
+        raise ValueError("IP被限制，请稍后再试")
+
+    with pytest.raises(ValueError, match="IP被限制"):
+        asyncio.run(pool.call(throttled))
+
+    account = pool.accounts()[0]
+    assert account.failures == 1
+    assert account.health == 0.5
+    assert account.cooldown_until >= time.time() + BASE_COOLDOWN - 1
+    assert pool.try_acquire() is None
+    assert pool.next_available_in() > BASE_COOLDOWN - 1
+    with pytest.raises(NoCookieAvailable):
+        asyncio.run(pool.acquire(max_wait=1))
+
+    pool.reset(account_id)
+    assert pool.try_acquire().id == account_id
+
+
+def test_budget_and_non_cookie_errors(pool):
+    pool.add("cookie-a", "a", rate_per_minute=2)
+    assert pool.try_acquire() is not None
+    assert pool.try_acquire() is not None
+    # 预算用尽后需要等到下一个统计窗口
+    assert pool.try_acquire() is None
+
+    pool.add("cookie-b", "b")
+
+    async def broken(cookie):
+        raise ValueError("返回数据格式错误")
+
+    # 与Cookie无关的错误不切换Cookie，只降低健康分
+    with pytest.raises(ValueError, match="返回数据格式错误"):
+        asyncio.run(pool.call(broken))
+    account = {account.name: account for account in pool.accounts()}["b"]
+    assert account.disabled == 0
+    assert account.health == pytest.approx(0.9)
+    assert "返回数据格式错误" in account.last_error
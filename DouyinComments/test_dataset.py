@@ -0,0 +1,60 @@
+"""
+Parquet 数据集测试
+"""
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from dataset import compact, export_result, load_dataset
+
+DAY = 24 * 3600
+CRAWLED_AT = 1700000000
+
+
+def write_result(path, ids, likes):
+    pd.DataFrame({
+        "评论ID": ids,
+        "评论内容": ["好看"] * len(ids),
+        "点赞数": [likes] * len(ids),
+        "评论时间": pd.to_datetime([CRAWLED_AT] * len(ids), unit="s"),
+        "用户昵称": ["123"] * len(ids),
+        "用户抖音号": ["未设置"] * len(ids),
+        "ip归属": ["北京"] * len(ids),
+        "回复总数": [0] * len(ids),
+    }).to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+
+def test_export_partitions_by_video_and_date(tmp_path):
+    directory = str(tmp_path / "dataset")
+    source = write_result(str(tmp_path / "comments.csv"), ["1", "2"], 1)
+    first = export_result("7300000000000000001", source, directory, crawled_at=CRAWLED_AT)
+    second = export_result("7300000000000000001", source, directory, crawled_at=CRAWLED_AT + DAY)
+    assert os.path.dirname(first) != os.path.dirname(second)
+
+    df = load_dataset(directory, "7300000000000000001")
+    assert len(df) == 4
+    assert set(df["aweme_id"]) == {"7300000000000000001"}
+    assert df["crawl_date"].nunique() == 2
+    assert df["用户昵称"].iloc[0] == "123"
+
+
+def test_compact_keeps_latest_crawl(tmp_path):
+    directory = str(tmp_path / "dataset")
+    export_result("42", write_result(str(tmp_path / "a.csv"), ["1", "2"], 1), directory, crawled_at=CRAWLED_AT)
+    export_result("42", write_result(str(tmp_path / "b.csv"), ["2", "3"], 5), directory, crawled_at=CRAWLED_AT + 60)
+    export_result("42", write_result(str(tmp_path / "c.csv"), ["3", "4"], 9), directory, crawled_at=CRAWLED_AT + DAY)
+
+    assert compact("42", directory) == 4
+    df = load_dataset(directory, "42").sort_values("评论ID")
+    assert list(df["评论ID"]) == ["1", "2", "3", "4"]
+    assert list(df["点赞数"]) == [1, 5, 9, 9]
+    files = [name for _, _, names in os.walk(directory) for name in names]
+    assert len(files) == 2
+
+    # 再次合并结果不变
+    assert compact("42", directory) == 4
+    assert len(load_dataset(directory, "42")) == 4
@@ -0,0 +1,12 @@
+"""
+去重索引测试
+"""
+from dedup import SeenIndex
+
+
+def test_filter_new_skips_seen_and_in_batch_duplicates():
+    seen = SeenIndex(["1"])
+    page = [{"cid": "1"}, {"cid": "2"}, {"cid": "2"}, {"text": "缺少cid"}, "无效数据"]
+    assert [c["cid"] for c in seen.filter_new(page)] == ["2"]
+    assert len(seen) == 2
+    assert seen.filter_new([{"cid": "2"}, {"cid": "3"}]) == [{"cid": "3"}]
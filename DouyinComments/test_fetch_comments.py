@@ -0,0 +1,79 @@
+"""
+评论分页采集测试
+
+使用按偏移量返回评论的假接口代替 fetch_comments，不发送网络请求。
+"""
+import asyncio
+
+import pytest
+
+import fetch_comments
+from dedup import SeenIndex
+from rate_limit import FixedDelayController
+from watermark import VideoWatermark
+
+TOTAL = 100
+NEWEST = 1700000000
+
+
+def fake_api(page_size, requested, total=TOTAL):
+    """每页实际返回 page_size 条评论，与请求的 count 无关，记录请求过的偏移量"""
+    async def fetch(aweme_id, cookie, cursor="0", count="100"):
+        offset = int(cursor)
+        requested.append(offset)
+        await asyncio.sleep(0.01)
+        end = min(offset + page_size, total)
+        comments = [{"cid": str(i), "text": f"评论{i}", "create_time": NEWEST - i} for i in range(offset, end)]
+        return comments, int(end < total), str(end), total
+    return fetch
+
+
+def collect(monkeypatch, page_size, prefetch, watermark=None, total=TOTAL):
+    requested = []
+    monkeypatch.setattr(fetch_comments, "fetch_comments", fake_api(page_size, requested, total))
+
+    async def run():
+        pages = []
+        async for page in fetch_comments.iter_comment_pages(
+            "1", "cookie", use_batch_mode=False, rate_controller=FixedDelayController(0, 0),
+            prefetch=prefetch, seen=SeenIndex(), watermark=watermark, delta=watermark is not None,
+        ):
+            pages.append([c["cid"] for c in page])
+        return pages
+
+    return asyncio.run(run()), requested
+
+
+def test_pipelined_reconciles_when_cursor_differs_from_prediction(monkeypatch):
+    # 请求每页20条，接口每页只返回15条，预测的偏移量 20、40 与实际的 15、30 不一致
+    pages, requested = collect(monkeypatch, page_size=15, prefetch=3)
+    cids = [cid for page in pages for cid in page]
+    assert sorted(cids, key=int) == [str(i) for i in range(TOTAL)]
+    assert len(cids) == len(set(cids))
+    # 重新规划后按实际步长预取
+    assert {0, 15, 30, 45, 60, 75, 90} <= set(requested)
+
+
+def test_pipelined_matches_sequential(monkeypatch):
+    sequential, _ = collect(monkeypatch, page_size=20, prefetch=0)
+    pipelined, _ = collect(monkeypatch, page_size=20, prefetch=4)
+    assert pipelined == sequential
+    assert [cid for page in pipelined for cid in page] == [str(i) for i in range(TOTAL)]
+
+
+@pytest.mark.parametrize("prefetch", [0, 3])
+def test_delta_stops_at_first_all_known_page(monkeypatch, prefetch):
+    # 上次采集时第20条以后的评论都已获取，只漏掉了第25条
+    known = [str(i) for i in range(20, 200) if i != 25]
+    watermark = VideoWatermark("1", directory=None, known_ids=known, max_create_time=NEWEST - 20)
+    pages, requested = collect(monkeypatch, page_size=20, prefetch=prefetch, watermark=watermark, total=200)
+    # 第二页还有一条新评论，继续翻页；第三页（偏移量40）全部是已知评论，停止
+    assert pages == [[str(i) for i in range(20)], ["25"]]
+    if prefetch > 1:
+        # 停止页之后最多只有预取窗口内的页面发出了请求
+        assert sorted(requested)[:3] == [0, 20, 40]
+        assert max(requested) <= 40 + (prefetch - 1) * 20
+    else:
+        assert requested == [0, 20, 40]
+    assert watermark.max_create_time == NEWEST
+    assert watermark.new_count == 21
@@ -0,0 +1,101 @@
+"""
+回复并发采集测试
+
+使用假接口代替 fetch_reply_page，不发送网络请求。
+"""
+import asyncio
+
+import pytest
+
+import fetch_replies
+from rate_limit import FixedDelayController
+from records import CommentRecord
+
+
+def thread(cid, total):
+    return CommentRecord(cid=cid, text="评论", aweme_id="1", reply_comment_total=total)
+
+
+def collect(comments, concurrency, read_delay=0.0):
+    async def run():
+        pages = []
+        async for comment_id, replies in fetch_replies.iter_all_replies(
+            comments, "cookie", concurrency=concurrency, rate_controller=FixedDelayController(0, 0),
+        ):
+            pages.append((comment_id, [r.cid for r in replies]))
+            await asyncio.sleep(read_delay)
+        return pages
+
+    # 消费方出错后必须能及时结束，不能卡在已满的结果队列上
+    return asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_cookie_error_with_full_queue_does_not_deadlock(monkeypatch):
+    async def fetch(aweme_id, comment_id, cookie, cursor="0", count="50"):
+        await asyncio.sleep(0)
+        if comment_id == "bad":
+            await asyncio.sleep(0.05)
+            raise ValueError("Cookie已失效，请更新Cookie")
+        offset = int(cursor)
+        return [thread(f"{comment_id}-{offset}", 0)], True, str(offset + 1)
+
+    monkeypatch.setattr(fetch_replies, "fetch_reply_page", fetch)
+    # 正常评论的回复无限翻页，结果队列很快被填满
+    comments = [thread("good-1", 100), thread("good-2", 90), thread("bad", 1)]
+    with pytest.raises(ValueError, match="Cookie已失效"):
+        collect(comments, concurrency=3, read_delay=0.01)
+
+
+def test_failed_thread_is_skipped_and_others_complete(monkeypatch):
+    calls = {}
+
+    async def fetch(aweme_id, comment_id, cookie, cursor="0", count="50"):
+        calls[comment_id] = calls.get(comment_id, 0) + 1
+        if comment_id == "flaky":
+            raise ValueError("请求失败: 系统繁忙")
+        offset = int(cursor)
+        return [thread(f"{comment_id}-{offset}", 0)], offset < 2, str(offset + 1)
+
+    monkeypatch.setattr(fetch_replies, "fetch_reply_page", fetch)
+    pages = collect([thread("flaky", 10), thread("ok", 5)], concurrency=2)
+    assert pages == [("ok", ["ok-0"]), ("ok", ["ok-1"]), ("ok", ["ok-2"])]
+    assert calls["flaky"] == 3
+
+
+def test_iter_thread_replies_raises_after_retries(monkeypatch):
+    async def fetch(aweme_id, comment_id, cookie, cursor="0", count="50"):
+        if cursor == "1":
+            raise ValueError("请求失败: 系统繁忙")
+        return [thread("r0", 0)], True, "1"
+
+    monkeypatch.setattr(fetch_replies, "fetch_reply_page", fetch)
+
+    async def run():
+        pages = []
+        with pytest.raises(fetch_replies.ReplyIncompleteError, match="cursor 1"):
+            async for replies in fetch_replies.iter_thread_replies(
+                "1", "c", "cookie", FixedDelayController(0, 0), max_retries=2,
+            ):
+                pages.append(replies)
+        return pages
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_stream_replies_writes_each_page_once_and_counts(monkeypatch):
+    import main
+
+    async def iter_all_replies(comments, cookie):
+        yield "1", [thread("r1", 0), thread("r2", 0)]
+        yield "1", [thread("r2", 0)]
+        yield "2", [thread("r3", 0)]
+
+    monkeypatch.setattr(main, "iter_all_replies", iter_all_replies)
+    monkeypatch.setattr(main, "get_cookie_source", lambda: "cookie")
+    pages = []
+    count = asyncio.run(main.stream_replies_async(
+        [thread("1", 2), thread("2", 1)], lambda comment_id, replies: pages.append((comment_id, [r.cid for r in replies]))
+    ))
+    # 重复的回复只交给回调一次
+    assert count == 3
+    assert pages == [("1", ["r1", "r2"]), ("2", ["r3"])]
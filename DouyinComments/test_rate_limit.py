@@ -0,0 +1,61 @@
+"""
+速率控制器测试
+"""
+import asyncio
+
+from rate_limit import AIMDRateController, is_throttle_error
+
+
+def test_success_increases_rate_up_to_max():
+    controller = AIMDRateController(initial_rate=1.0, max_rate=1.2, increase=0.1)
+    controller.record_success()
+    assert abs(controller.current_rate - 1.1) < 1e-9
+    for _ in range(10):
+        controller.record_success()
+    assert controller.current_rate == 1.2
+
+
+def test_throttle_halves_rate_and_blocks():
+    controller = AIMDRateController(initial_rate=2.0, min_rate=0.1, cooldown=5.0, jitter=0)
+    controller.record_throttled()
+    assert controller.current_rate == 1.0
+    # 冷却期内即使有令牌也需要等待
+    assert controller.reserve() > 4.0
+
+
+def test_empty_page_slows_down_but_respects_min_rate():
+    controller = AIMDRateController(initial_rate=0.2, min_rate=0.15, empty_factor=0.5)
+    controller.record_empty()
+    assert controller.current_rate == 0.15
+
+
+def test_error_classification():
+    assert is_throttle_error(ValueError("IP被限制，请稍后再试"))
+    assert is_throttle_error(ValueError("访问被拒绝，请检查Cookie是否有效"))
+    assert not is_throttle_error(ValueError("返回数据格式错误"))
+
+    controller = AIMDRateController(initial_rate=1.0, cooldown=0)
+    controller.record_error(ValueError("IP被限制，请稍后再试"))
+    assert controller.current_rate == 0.5
+
+
+def test_token_bucket_paces_requests():
+    controller = AIMDRateController(initial_rate=5.0, burst=1, jitter=0)
+    assert controller.reserve() == 0.0
+    # 第二个令牌需要等待约 1/rate 秒
+    delay = controller.reserve()
+    assert 0.15 < delay <= 0.2
+
+
+def test_wait_sleeps_for_reserved_delay():
+    controller = AIMDRateController(initial_rate=20.0, burst=1, jitter=0)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await controller.wait()
+        return loop.time() - started
+
+    elapsed = asyncio.run(run())
+    assert 0.08 < elapsed < 0.5
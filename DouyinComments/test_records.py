@@ -0,0 +1,77 @@
+"""
+评论记录测试
+"""
+import json
+
+import pytest
+
+from dedup import SeenIndex
+from main import process_comments
+from records import CommentRecord, decode_comment_page
+
+
+RAW_COMMENT = {
+    "cid": "7001",
+    "aweme_id": "42",
+    "text": "好看",
+    "create_time": 1700000000,
+    "digg_count": 3,
+    "reply_comment_total": 2,
+    "ip_label": "北京",
+    "user": {"uid": "99", "nickname": "小明", "avatar_thumb": {"url_list": ["https://example.com/a.jpg"]}},
+}
+
+
+def test_from_api_projects_needed_fields():
+    record = CommentRecord.from_api(RAW_COMMENT)
+    assert record.cid == "7001"
+    assert record.uid == "99"
+    assert record.nickname == "小明"
+    assert record.unique_id is None
+    assert record.raw is None
+    assert record["reply_comment_total"] == 2
+    assert record.get("unique_id", "未设置") == "未设置"
+    assert CommentRecord.from_api(RAW_COMMENT, keep_raw=True).raw is RAW_COMMENT
+
+
+def test_from_api_list_skips_invalid_comments():
+    records = CommentRecord.from_api_list([RAW_COMMENT, {"cid": "1"}, {"text": "缺少cid"}, "无效数据"])
+    assert [r.cid for r in records] == ["7001"]
+    assert SeenIndex().filter_new(records + records) == records
+
+
+def test_decode_comment_page_validates_and_projects():
+    content = json.dumps({"status_code": 0, "comments": [RAW_COMMENT], "has_more": 1, "cursor": 20, "total": 35})
+    page = decode_comment_page(content.encode("utf-8"))
+    assert page.comments == [CommentRecord.from_api(RAW_COMMENT)]
+    assert (page.has_more, page.cursor, page.total) == (1, 20, 35)
+    assert decode_comment_page(b'{"status_code": 0, "comments": null}').comments == []
+    assert decode_comment_page(content.encode("utf-8"), keep_raw=True).comments[0].raw == RAW_COMMENT
+    with pytest.raises(ValueError):
+        decode_comment_page(b'{"status_code": 0, "comments": {"cid": "1"}}')
+    with pytest.raises(ValueError):
+        decode_comment_page(b'<html>')
+
+
+def test_decode_comment_page_skips_only_invalid_rows():
+    bad_rows = [
+        {"cid": "1"},
+        {"cid": "2", "text": None},
+        {"cid": 3, "text": "整数cid"},
+        {"cid": "4", "text": "点赞数为空", "digg_count": None},
+        "无效数据",
+    ]
+    second = dict(RAW_COMMENT, cid="7002")
+    content = json.dumps({"status_code": 0, "comments": [RAW_COMMENT, *bad_rows, second], "has_more": 1, "cursor": 7})
+    page = decode_comment_page(content.encode("utf-8"), keep_raw=True)
+    assert [r.cid for r in page.comments] == ["7001", "7002"]
+    assert page.comments[1].raw == second
+    assert (page.has_more, page.cursor) == (1, 7)
+
+
+def test_process_comments_accepts_records():
+    df = process_comments([CommentRecord.from_api(RAW_COMMENT)])
+    row = df.iloc[0]
+    assert row["评论ID"] == "7001"
+    assert row["用户抖音号"] == "未设置"
+    assert row["回复总数"] == 2
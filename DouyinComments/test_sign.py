@@ -0,0 +1,140 @@
+"""
+a_bogus 签名算法测试
+
+黄金向量由 douyin.js 在固定 Math.random / Date.now 的情况下生成，
+用于保证 douyin_sign 的输出与JS实现逐字节一致。
+"""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import douyin_sign
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+
+DETAIL_QUERY = (
+    "aid=6383&aweme_id=7431759837333130523&browser_language=zh-CN&browser_name=Chrome"
+    "&browser_online=true&browser_platform=Win32&browser_version=126.0.0.0&channel=channel_pc_web"
+    "&cookie_enabled=true&count=20&cpu_core_num=24&cursor=0&device_memory=8&device_platform=webapp"
+    "&downlink=10&effective_type=4g&engine_name=Blink&engine_version=126.0.0.0&item_type=0"
+    "&os_name=Windows&os_version=10&pc_client_type=1&platform=PC&round_trip_time=50"
+    "&screen_height=1440&screen_width=2560&update_version_code=170400&version_code=190500"
+    "&version_name=19.5.0&webid=7362810250930783783"
+)
+REPLY_QUERY = (
+    DETAIL_QUERY
+    .replace("aweme_id=", "comment_id=7431800000000000001&item_id=")
+    .replace("count=20", "count=50")
+)
+
+# (签名函数, 查询字符串, Math.random 序列, Date.now 序列, JS输出)
+GOLDEN_VECTORS = [
+    (
+        "sign_datail", DETAIL_QUERY, (0.1234, 0.5678, 0.9012), (1737119211000, 1737119211003),
+        "E7mhBdugDifihdWk5ldLfY3q6WN3YDRu0trEMD2frV3G5y39HMPb9exobjvvYHEjxs/gIeYjy4hbT3ohrQ2y8qwf9W0L"
+        "/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/94m=",
+    ),
+    (
+        "sign_reply", REPLY_QUERY, (0.0, 0.5, 0.999999), (1737119211000, 1737119211000),
+        "DfmhQmLDDigBkVWh5ldLfY3q6533Y0Eu0trEMD2f5V3/5y39HMPb9exEbjvvYHujxs/gIeYjy4hbT3ohrQ2y8qwf9W0L"
+        "/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9-R=",
+    ),
+    (
+        "sign_datail", "", (0.42, 0.42, 0.42), (1800000000000, 1800000000007),
+        "Q6mh/dwDDkDTfD6f54nLfY3q6fe3YDRF0trEMD2fvx3GTL39HMYD9exoNjUv-YfjFG/rIeYjy4hbT3ohrQ2y8qwf9W0L"
+        "/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9UY=",
+    ),
+]
+
+# 在Node中加载 douyin.js，并替换 Math.random / Date.now 以得到确定的输出
+NODE_HARNESS = """
+const fs = require('fs');
+const vm = require('vm');
+const code = fs.readFileSync(process.argv[1], 'utf8');
+const cases = JSON.parse(fs.readFileSync(0, 'utf8'));
+console.log(JSON.stringify(cases.map(c => {
+    const randoms = c.random.slice();
+    const times = c.times.slice();
+    const ctx = {console, String, Array, encodeURIComponent, Math: Object.create(Math), Date: {now: () => times.shift()}};
+    ctx.Math.random = () => randoms.shift();
+    vm.createContext(ctx);
+    vm.runInContext(code, ctx);
+    return ctx[c.fn](c.query, c.ua);
+})));
+"""
+
+
+def test_sm3_standard_vector():
+    """SM3实现与国标测试向量一致"""
+    digest = douyin_sign.sm3_sum("abc")
+    assert bytes(digest).hex() == "66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0"
+
+
+def test_suffix_digest_matches_js_comment():
+    """后缀 cus 两次SM3的结果与 douyin.js 注释中记录的值一致"""
+    assert douyin_sign.sm3_sum(douyin_sign.sm3_sum("cus")) == [
+        136, 101, 114, 147, 58, 77, 207, 201,
+        215, 162, 154, 93, 248, 13, 142, 160,
+        105, 73, 215, 241, 83, 58, 51, 43,
+        255, 38, 168, 141, 216, 194, 35, 236,
+    ]
+
+
+@pytest.mark.parametrize("func_name, query, random_values, times, expected", GOLDEN_VECTORS)
+def test_sign_golden_vectors(func_name, query, random_values, times, expected):
+    """固定随机数和时间后，签名结果与JS实现逐字节一致"""
+    sign_func = getattr(douyin_sign, func_name)
+    result = sign_func(
+        query,
+        USER_AGENT,
+        random_values=random_values,
+        start_time=times[0],
+        end_time=times[1],
+    )
+    assert result == expected
+
+
+def test_sign_is_randomized_by_default():
+    """未指定随机数时，每次签名的前缀不同"""
+    results = {douyin_sign.sign_datail(DETAIL_QUERY, USER_AGENT) for _ in range(5)}
+    assert len(results) > 1
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="未安装Node.js")
+def test_sign_matches_node_runtime():
+    """与当前 douyin.js 在Node中的运行结果逐一比对"""
+    cases = []
+    for index in range(20):
+        query = f"{DETAIL_QUERY}&cursor_index={index}&text=%E4%B8%AD{'x' * index}"
+        user_agent = USER_AGENT[:len(USER_AGENT) - index * 3]
+        cases.append({
+            "fn": "sign_reply" if index % 2 else "sign_datail",
+            "query": query,
+            "ua": user_agent,
+            "random": [index / 20, (index * 7 % 20) / 20, 0.999],
+            "times": [1737119211000 + index * 1000003, 1737119211000 + index * 1000003 + index],
+        })
+
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "douyin.js")
+    completed = subprocess.run(
+        ["node", "-e", NODE_HARNESS, script_path],
+        input=json.dumps(cases),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    expected = json.loads(completed.stdout)
+
+    for case, js_result in zip(cases, expected):
+        sign_func = getattr(douyin_sign, case["fn"])
+        result = sign_func(
+            case["query"],
+            case["ua"],
+            random_values=case["random"],
+            start_time=case["times"][0],
+            end_time=case["times"][1],
+        )
+        assert result == js_result
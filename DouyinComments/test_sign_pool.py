@@ -0,0 +1,97 @@
+"""
+Node签名进程池测试
+
+使用桩签名脚本代替 douyin.js：sign_datail 返回带前缀的查询字符串，
+查询字符串为 "slow" 时阻塞一段时间，用于触发超时。
+"""
+import shutil
+import threading
+import time
+
+import pytest
+
+from sign_pool import SignPool, SignTimeoutError, SignWorker, SignWorkerError, find_node
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="未安装Node.js")
+
+STUB_SCRIPT = """
+function sign_datail(query, ua) {
+    if (query === 'slow') {
+        const end = Date.now() + 1500;
+        while (Date.now() < end) {}
+    }
+    return 'detail:' + query + ':' + ua;
+}
+function sign_reply(query, ua) {
+    return 'reply:' + query;
+}
+"""
+
+
+@pytest.fixture
+def script_path(tmp_path):
+    path = tmp_path / "stub.js"
+    path.write_text(STUB_SCRIPT, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def pool(script_path):
+    pool = SignPool(size=2, timeout=0.3, node_path=find_node(), script_path=script_path)
+    yield pool
+    pool.close()
+
+
+def test_sign_many_keeps_query_order(pool):
+    queries = [f"q{i}" for i in range(10)]
+    assert pool.sign_many(queries, "ua") == [f"detail:q{i}:ua" for i in range(10)]
+    assert pool.sign_many(["a", "b"], "ua", kind="reply") == ["reply:a", "reply:b"]
+    assert pool.sign_many([], "ua") == []
+
+
+def test_restarts_crashed_worker(pool):
+    for worker in pool._workers:
+        worker.process.kill()
+        worker.process.wait()
+    assert pool.sign("a", "ua") == "detail:a:ua"
+    assert pool.sign("b", "ua") == "detail:b:ua"
+
+
+def test_timeout_restarts_worker(pool):
+    with pytest.raises(SignTimeoutError):
+        pool.sign("slow", "ua")
+    # 超时的进程被重启，之后的任务不受影响
+    assert pool.sign_many(["a", "b"], "ua") == ["detail:a:ua", "detail:b:ua"]
+
+
+def test_worker_discards_stale_responses(script_path):
+    worker = SignWorker(find_node(), script_path)
+    try:
+        with pytest.raises(SignTimeoutError):
+            worker.sign([("sign_datail", "slow", "ua")], timeout=0.2)
+        # 超时任务的结果迟到，下一个任务只接收自己的结果
+        assert worker.sign([("sign_datail", "fast", "ua")], timeout=5) == ["detail:fast:ua"]
+    finally:
+        worker.close()
+
+
+def test_close_does_not_wait_for_checked_out_worker(script_path):
+    pool = SignPool(size=1, timeout=5, node_path=find_node(), script_path=script_path)
+
+    def sign_slow():
+        try:
+            pool.sign("slow", "ua")
+        except SignWorkerError:
+            pass
+
+    thread = threading.Thread(target=sign_slow)
+    thread.start()
+    time.sleep(0.3)
+    started = time.monotonic()
+    pool.close()
+    thread.join(timeout=5)
+    assert time.monotonic() - started < 5
+    assert not thread.is_alive()
+    assert all(not worker.is_alive() for worker in pool._workers)
+    with pytest.raises(SignWorkerError):
+        pool.sign("a", "ua")
@@ -0,0 +1,64 @@
+"""
+结果写入器测试
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from checkpoint import CrawlCheckpoint
+from sink import CsvSink, ParquetSink
+
+
+def make_page(start, count):
+    return pd.DataFrame({
+        "评论ID": [str(i) for i in range(start, start + count)],
+        "评论内容": ["好看"] * count,
+        "评论时间": pd.to_datetime([1700000000 + i for i in range(start, start + count)], unit="s"),
+        "回复总数": [0] * count,
+    })
+
+
+def test_csv_sink_appends_pages_and_replaces_atomically(tmp_path):
+    path = str(tmp_path / "comments.csv")
+    sink = CsvSink(path)
+    sink.write(make_page(0, 3))
+    sink.write(make_page(3, 2))
+    # 完成前临时文件已经可以读取，结果文件还不存在
+    assert len(pd.read_csv(sink.temp_path)) == 5
+    assert not os.path.exists(path)
+
+    resumed = CsvSink(path)
+    assert resumed.has_partial()
+    assert len(resumed.read_partial()) == 5
+    resumed.write(make_page(5, 1))
+    assert resumed.close() == path
+    df = pd.read_csv(path, dtype={"评论ID": str})
+    assert list(df["评论ID"]) == [str(i) for i in range(6)]
+    assert not os.path.exists(resumed.temp_path)
+
+
+def test_csv_sink_copy_existing_skips_written_ids(tmp_path):
+    path = str(tmp_path / "comments.csv")
+    make_page(0, 4).to_csv(path, index=False, encoding="utf-8-sig")
+    sink = CsvSink(path)
+    sink.write(make_page(3, 3))
+    sink.copy_existing()
+    sink.close()
+    df = pd.read_csv(path, dtype={"评论ID": str})
+    assert list(df["评论ID"]) == ["3", "4", "5", "0", "1", "2"]
+
+
+def test_parquet_sink_rebatches_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "comments.parquet")
+    sink = ParquetSink(path, row_group_size=4)
+    checkpoint = CrawlCheckpoint("1", str(tmp_path), interval=1, on_save=sink.flush)
+    for start in range(0, 10, 3):
+        sink.write(make_page(start, 3))
+        checkpoint.advance(str(start + 3), 3)
+    # 每次保存断点前都已写入临时目录
+    assert len(ParquetSink(path).read_partial()) == 12
+    sink.close()
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+    assert list(pd.read_parquet(path)["评论ID"]) == [str(i) for i in range(12)]
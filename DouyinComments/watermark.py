@@ -0,0 +1,91 @@
+"""
+增量采集水位线
+
+记录每个视频已采集评论的最大 create_time 和已知评论ID集合。
+增量采集时跳过已知评论，遇到整页都是已知评论时停止翻页，只合并新增的评论。
+"""
+import json
+import os
+import time
+from typing import Iterable, Optional
+
+from loguru import logger
+
+# 水位线文件默认保存目录
+DEFAULT_WATERMARK_DIR = os.getenv(
+    'DOUYIN_WATERMARK_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'watermarks'),
+)
+
+
+class VideoWatermark:
+    """
+    单个视频的采集水位线
+
+    Args:
+        aweme_id: 视频ID
+        directory: 水位线文件目录，为 None 时只保存在内存中
+        known_ids: 已知评论ID
+        max_create_time: 已知评论中最大的 create_time
+    """
+
+    def __init__(self, aweme_id: str, directory: Optional[str] = DEFAULT_WATERMARK_DIR,
+                 known_ids: Iterable[str] = (), max_create_time: int = 0):
+        self.aweme_id = aweme_id
+        self.path = os.path.join(directory, f"{aweme_id}.json") if directory else None
+        self.known_ids = set(known_ids)
+        self.max_create_time = max_create_time
+        self.new_count = 0
+
+    def exists(self) -> bool:
+        return self.path is not None and os.path.exists(self.path)
+
+    def load(self) -> 'VideoWatermark':
+        """从文件加载水位线，文件不存在时保持为空"""
+        if not self.exists():
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取水位线失败: {str(e)}，将进行全量采集")
+            return self
+
+        self.known_ids = set(data.get('known_ids', []))
+        self.max_create_time = int(data.get('max_create_time', 0))
+        logger.info(f"已加载水位线，已知评论 {len(self.known_ids)} 条，最新评论时间戳: {self.max_create_time}")
+        return self
+
+    def save(self):
+        """保存水位线，先写临时文件再替换，避免中断时损坏原文件"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            'aweme_id': self.aweme_id,
+            'max_create_time': self.max_create_time,
+            'known_ids': list(self.known_ids),
+            'updated_at': int(time.time()),
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def update(self, comments: Iterable[dict], id_key: str = "cid", time_key: str = "create_time"):
+        """
+        记录新采集到的评论
+
+        Args:
+            comments: 评论列表
+            id_key: 评论ID字段名
+            time_key: 评论时间戳字段名
+        """
+        for comment in comments:
+            comment_id = str(comment[id_key])
+            if comment_id not in self.known_ids:
+                self.known_ids.add(comment_id)
+                self.new_count += 1
+            create_time = comment.get(time_key) or 0
+            if isinstance(create_time, (int, float)) and create_time > self.max_create_time:
+                self.max_create_time = int(create_time)
@@ -1,6 +1,9 @@
 from flask import Flask
 from flask_jwt_extended import JWTManager
-from .models import db
+from sqlalchemy import inspect
+from .models import db, Comment, VideoCollection
+from .database import check_database, init_database
+from .search import init_search_index
 from .routes import api
 from config.config import Config
 
@@ -11,8 +14,8 @@ def create_app():
     # 配置 JSON 响应
     app.json.ensure_ascii = False  # 确保 JSON 响应使用中文而不是 Unicode 编码
     
-    # 初始化扩展
-    db.init_app(app)
+    # 初始化扩展，SQLite 连接参数在第一次连接前注册
+    init_database(app)
     jwt = JWTManager(app)
     
     # 注册蓝图
@@ -21,5 +24,27 @@ def create_app():
     # 创建数据库表（如果不存在）
     with app.app_context():
         db.create_all()
+        # create_all 不会给已存在的表补建索引
+        for index in Comment.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+        # 也不会给已存在的表补建列
+        _add_missing_columns(VideoCollection.__table__)
+        app.config['DATABASE_SETTINGS'] = check_database()
+        init_search_index()
     
-    return app 
\ No newline at end of file
+    return app
+
+def _add_missing_columns(table):
+    """给已存在的表补建模型中新增的列，新增的列需要有 server_default 或允许为空"""
+    existing = {column['name'] for column in inspect(db.engine).get_columns(table.name)}
+    with db.engine.begin() as connection:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+            if column.server_default is not None:
+                ddl += f' DEFAULT {column.server_default.arg.compile(dialect=db.engine.dialect)}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+            connection.exec_driver_sql(ddl) 
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+数据库连接配置
+
+SQLite 默认使用回滚日志，写事务会阻塞所有读请求，并发采集保存和查询评论时只能串行执行。
+每个新连接都会设置 WAL 日志、synchronous=NORMAL、缓存和内存映射大小以及忙等待超时：
+WAL 模式下写入不再阻塞读取，多个写入之间在超时内等待而不是直接报 database is locked。
+连接池大小等参数从 Config 读取，启动时自检并记录实际生效的配置。
+"""
+from typing import Dict
+
+from flask import Flask, current_app
+from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+from .models import db
+
+
+def _is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config) -> Dict:
+    """
+    根据配置生成 SQLAlchemy 引擎参数
+
+    内存 SQLite 使用单连接池，不设置连接池大小。
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if _is_memory_sqlite(uri):
+        return options
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', True)
+    if _is_sqlite(uri):
+        connect_args = dict(options.get('connect_args') or {})
+        # 连接可能在不同的线程中使用；驱动层面的等待与 busy_timeout 保持一致
+        connect_args.setdefault('check_same_thread', False)
+        connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+        options['connect_args'] = connect_args
+    return options
+
+
+def _sqlite_pragmas(config) -> Dict:
+    pragmas = {
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS'],
+        # 负数表示以KB为单位
+        'cache_size': -config['SQLITE_CACHE_SIZE_KB'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'temp_store': 'MEMORY',
+    }
+    if not _is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        pragmas['journal_mode'] = config['SQLITE_JOURNAL_MODE']
+    return pragmas
+
+
+def init_database(app: Flask):
+    """
+    初始化数据库扩展，SQLite 时在每个新连接上设置连接参数
+
+    需要在 db.create_all 等第一次连接数据库之前调用。
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    if not _is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    pragmas = _sqlite_pragmas(app.config)
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def check_database() -> Dict:
+    """
+    启动自检，返回实际生效的数据库配置
+
+    SQLite 文件数据库没有切换到 WAL 模式（例如位于不支持共享内存的网络文件系统）时记录警告。
+    需要在应用上下文中调用。
+    """
+    engine = db.engine
+    pool = engine.pool
+    settings = {
+        'backend': engine.dialect.name,
+        'pool': type(pool).__name__,
+        'pool_size': pool.size() if hasattr(pool, 'size') else None,
+    }
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                settings[name] = connection.execute(text(f"PRAGMA {name}")).scalar()
+        expected = str(current_app.config['SQLITE_JOURNAL_MODE']).lower()
+        if not _is_memory_sqlite(str(engine.url)) and str(settings['journal_mode']).lower() != expected:
+            logger.warning(f"SQLite 日志模式为 {settings['journal_mode']}，未能切换到 {expected}，写入会阻塞读取")
+    logger.info(f"数据库配置: {settings}")
+    return settings
@@ -25,6 +25,10 @@ class User(db.Model):
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # 按视频分页读取评论（按评论时间倒序）使用的索引
+        db.Index('ix_comments_video_created_id', 'video_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.String(20), nullable=False)
@@ -52,4 +56,23 @@ class Comment(db.Model):
             'user_nickname': self.user_nickname if self.user_nickname else '',
             'ip_location': self.ip_location if self.ip_location else '',
             'collected_at': self.collected_at.strftime('%Y-%m-%dT%H:%M:%S.%f') if self.collected_at else ''
-        } 
\ No newline at end of file
+        }
+
+class VideoCollection(db.Model):
+    """视频最近一次完整采集的时间和数量，用于判断是否可以直接从数据库返回评论"""
+    __tablename__ = 'video_collections'
+    
+    video_id = db.Column(db.String(20), primary_key=True)
+    max_comments = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0)
+    # 这次采集是否因为没有更多评论而结束，而不是达到了数量上限
+    reached_end = db.Column(db.Boolean, default=False, nullable=False, server_default=db.false())
+    collected_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CollectLock(db.Model):
+    """跨进程的采集锁，同一个采集任务同时只有一个进程访问抖音接口"""
+    __tablename__ = 'collect_locks'
+    
+    key = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(64), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -1,13 +1,15 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from .models import db, User, Comment
-from .services import CommentService
+from .services import CommentService, get_sign_stats, get_cookie_pool
+from .search import search_comments
 import asyncio
+import base64
 import os
 import traceback
 from loguru import logger
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import and_, or_, text
 import re
 
 api = Blueprint('api', __name__)
@@ -21,6 +23,8 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'database_settings': current_app.config.get('DATABASE_SETTINGS'),
+            'signer': get_sign_stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -154,6 +158,28 @@ def extract_video_id(url_or_id: str) -> str:
     # 如果无法提取，返回原始输入
     return url_or_id
 
+# 布尔参数接受的取值
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+def parse_flag(value, name: str) -> bool:
+    """
+    解析布尔参数，未提供时为 False
+    
+    Raises:
+        ValueError: 取值不是布尔值，也不是 true/1/yes 或 false/0/no
+    """
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"参数 {name} 只能是 true 或 false")
+
 @api.route('/comments/collect', methods=['POST', 'GET'])
 @jwt_required()
 async def collect_comments():
@@ -165,6 +191,8 @@ async def collect_comments():
                 data = request.get_json()
                 video_id = data.get('video_id')
                 max_comments = data.get('max_comments', 100)
+                delta = data.get('delta')
+                force_refresh = data.get('force_refresh')
                 page = data.get('page', 1)
                 per_page = data.get('per_page', 100)
             except Exception as e:
@@ -173,11 +201,20 @@ async def collect_comments():
         else:  # GET方法
             video_id = request.args.get('video_id')
             max_comments = request.args.get('max_comments', 100, type=int)
+            delta = request.args.get('delta')
+            force_refresh = request.args.get('force_refresh')
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 100, type=int)
         
         if not video_id:
             return jsonify({'error': '请提供视频ID'}), 400
+        
+        # 字符串 "false" 等取值不能按真值处理，否则会误触发增量采集或强制刷新
+        try:
+            delta = parse_flag(delta, 'delta')
+            force_refresh = parse_flag(force_refresh, 'force_refresh')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
             
         # 从URL中提取视频ID（如果是完整URL）
         video_id = extract_video_id(video_id)
@@ -187,14 +224,23 @@ async def collect_comments():
         comment_service = CommentService()
         current_app.logger.debug(f"开始采集视频评论, video_id: {video_id}, page: {page}, per_page: {per_page}")
         
-        # 采集评论
-        comments = await comment_service.collect_comments(video_id, max_comments)
+        # 采集评论并写入数据库，新鲜度窗口内采集过的视频直接从数据库返回，
+        # 同时到达的相同请求只采集一次
+        comments, cached, coalesced = await comment_service.collect_shared(
+            video_id, max_comments, delta=delta, force_refresh=force_refresh
+        )
         
         if not comments:
+            if delta:
+                return jsonify({'video_id': video_id, 'delta': True, 'cached': False, 'coalesced': coalesced,
+                            'total': 0, 'comments': []})
             return jsonify({'message': '没有找到评论'}), 404
             
         return jsonify({
             'video_id': video_id,
+            'delta': delta,
+            'cached': cached,
+            'coalesced': coalesced,
             'total': len(comments),
             'comments': comments
         })
@@ -207,14 +253,119 @@ async def collect_comments():
             'traceback': traceback.format_exc()
         }), 500
 
+def encode_cursor(comment: Comment) -> str:
+    """把一页最后一条评论的排序键编码为游标"""
+    created_at = comment.created_at.isoformat() if comment.created_at else ''
+    return base64.urlsafe_b64encode(f"{created_at}|{comment.id}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    """解析游标，返回 (评论时间, 评论主键)，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, comment_id = raw.split('|')
+        return (datetime.fromisoformat(created_at) if created_at else None), int(comment_id)
+    except Exception:
+        raise ValueError("无效的游标")
+
+def keyset_comments(video_id: str, after: str, per_page: int):
+    """
+    按评论时间倒序的游标分页
+    
+    使用 (video_id, created_at, id) 索引直接定位到上一页之后的位置，不计算总数，
+    翻页耗时与页码无关。评论时间为空的评论排在最后，按主键倒序。
+    
+    Args:
+        video_id: 视频ID
+        after: 上一页返回的游标，为空时从第一页开始
+        per_page: 每页评论数
+        
+    Returns:
+        tuple: (评论列表, 下一页游标)，没有更多评论时游标为 None
+    """
+    created_at, last_id = decode_cursor(after) if after else (None, None)
+    comments = []
+    base = Comment.query.filter(Comment.video_id == video_id)
+    # 先读取有评论时间的评论，游标已经进入评论时间为空的部分时跳过
+    if last_id is None or created_at is not None:
+        query = base.filter(Comment.created_at.isnot(None))
+        if last_id is not None:
+            query = query.filter(or_(
+                Comment.created_at < created_at,
+                and_(Comment.created_at == created_at, Comment.id < last_id),
+            ))
+        comments = query.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(per_page + 1).all()
+        last_id = None
+    if len(comments) <= per_page:
+        query = base.filter(Comment.created_at.is_(None))
+        if last_id is not None:
+            query = query.filter(Comment.id < last_id)
+        comments += query.order_by(Comment.id.desc()).limit(per_page + 1 - len(comments)).all()
+    
+    has_more = len(comments) > per_page
+    comments = comments[:per_page]
+    return comments, (encode_cursor(comments[-1]) if has_more else None)
+
+@api.route('/comments/search', methods=['GET'])
+@jwt_required()
+def search_comments_route():
+    """
+    搜索评论内容
+    
+    参数 q 为搜索词（多个词用空格分隔，需要同时包含），video_id 可选，结果按相关度排序并分页。
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        video_id = request.args.get('video_id')
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+        if not query:
+            return jsonify({'error': '请提供搜索词'}), 400
+        if video_id:
+            video_id = extract_video_id(video_id)
+        
+        try:
+            comments, has_more = search_comments(query, video_id, page, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'query': query,
+            'video_id': video_id,
+            'current_page': page,
+            'has_more': has_more,
+            'comments': [comment.to_dict() for comment in comments]
+        }), 200
+    except Exception as e:
+        logger.error(f"搜索评论失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'error': '搜索评论失败',
+            'detail': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
 @api.route('/comments/<video_id>', methods=['GET'])
 @jwt_required()
 def get_comments(video_id):
-    """获取评论接口"""
+    """
+    获取评论接口
+    
+    默认按页码分页并返回总数；带 after 参数时使用游标分页（after 为空表示第一页），
+    不计算总数，返回下一页的游标 next_cursor。
+    """
     try:
-        page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
+        if 'after' in request.args:
+            try:
+                comments, next_cursor = keyset_comments(video_id, request.args['after'], max(1, min(per_page, 500)))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'comments': [comment.to_dict() for comment in comments]
+            }), 200
         
+        page = request.args.get('page', 1, type=int)
         comments = Comment.query.filter_by(video_id=video_id)\
             .order_by(Comment.created_at.desc())\
             .paginate(page=page, per_page=per_page)
@@ -284,4 +435,45 @@ async def update_cookie():
         return jsonify({
             'error': '更新cookie失败',
             'detail': str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@api.route('/cookie/pool', methods=['GET'])
+@jwt_required()
+def list_cookie_pool():
+    """查看 Cookie 池状态"""
+    try:
+        accounts = get_cookie_pool().accounts()
+        return jsonify({
+            'total': len(accounts),
+            'available': sum(1 for account in accounts if not account.disabled),
+            'accounts': [account.to_dict() for account in accounts]
+        })
+    except Exception as e:
+        logger.error(f"获取Cookie池状态时出错: {str(e)}")
+        return jsonify({
+            'error': '获取Cookie池状态失败',
+            'detail': str(e)
+        }), 500
+
+@api.route('/cookie/pool', methods=['POST'])
+@jwt_required()
+def add_cookie_to_pool():
+    """向 Cookie 池添加 cookie"""
+    try:
+        data = request.get_json()
+        cookie = data.get('cookie')
+        if not cookie or not isinstance(cookie, str):
+            return jsonify({'error': '请提供字符串格式的cookie'}), 400
+            
+        account_id = get_cookie_pool().add(
+            cookie,
+            name=data.get('name'),
+            rate_per_minute=int(data.get('rate_per_minute', 30))
+        )
+        return jsonify({'success': True, 'id': account_id}), 201
+    except Exception as e:
+        logger.error(f"添加Cookie到Cookie池时出错: {str(e)}")
+        return jsonify({
+            'error': '添加Cookie失败',
+            'detail': str(e)
+        }), 500
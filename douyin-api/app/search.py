@@ -0,0 +1,187 @@
+"""
+评论全文搜索
+
+SQLite 使用 FTS5 倒排索引。FTS5 自带的分词器不能切分中文，评论内容在写入索引前先切分为
+字符二元组（"很好看" -> "很好 好看 看"，每段中文最后一个字单独保留，用于单字搜索），
+英文和数字按单词保留；搜索词按同样的方式切分后以短语查询，相当于子串匹配，按 bm25 排序。
+索引表的 rowid 与 comments.id 一致，由保存评论的代码在写入新评论时同步。
+
+其他数据库没有 FTS5 时退化为 LIKE 查询，按评论时间倒序。
+"""
+import re
+from typing import Iterable, List, Tuple
+
+from flask import current_app
+from loguru import logger
+from sqlalchemy import text
+
+from .models import db, Comment
+
+FTS_TABLE = 'comments_fts'
+# 每次回填索引的评论数
+REBUILD_BATCH_SIZE = 5000
+
+_CJK = r'㐀-䶿一-鿿豈-﫿'
+_TOKEN_PATTERN = re.compile(rf'[{_CJK}]+|[^\W{_CJK}_]+')
+_CJK_PATTERN = re.compile(rf'[{_CJK}]')
+
+
+def tokenize(content: str) -> List[str]:
+    """把文本切分为中文二元组和英文单词"""
+    tokens = []
+    for run in _TOKEN_PATTERN.findall((content or '').lower()):
+        if _CJK_PATTERN.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_match_query(query: str) -> str:
+    """
+    把搜索词转换为 FTS5 查询表达式，多个词之间为并且关系
+
+    连续的中文转换为二元组短语，单个汉字和英文单词使用前缀匹配。
+    """
+    terms = []
+    for run in _TOKEN_PATTERN.findall((query or '').lower()):
+        if _CJK_PATTERN.match(run) and len(run) > 1:
+            terms.append('"' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        else:
+            terms.append(f'"{run}"*')
+    return ' '.join(terms)
+
+
+def fts_enabled() -> bool:
+    """当前数据库是否启用了 FTS5 索引，需要在应用上下文中调用"""
+    return bool(current_app.config.get('COMMENT_SEARCH_FTS'))
+
+
+def init_search_index() -> bool:
+    """
+    创建 FTS5 索引表，并为索引之后新增的评论补建索引
+
+    需要在应用上下文中调用，返回是否启用了 FTS5。
+    """
+    enabled = False
+    if db.engine.dialect.name == 'sqlite':
+        try:
+            db.session.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(tokens, video_id, tokenize='unicode61', prefix='1')"
+            ))
+            db.session.commit()
+            enabled = True
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"SQLite 不支持 FTS5，评论搜索使用 LIKE 查询: {str(e)}")
+    current_app.config['COMMENT_SEARCH_FTS'] = enabled
+    if enabled:
+        rebuild_search_index()
+    return enabled
+
+
+def rebuild_search_index(full: bool = False) -> int:
+    """
+    回填索引
+
+    Args:
+        full: 清空后重建全部索引，默认只为 id 大于索引中最大 rowid 的评论建索引
+
+    Returns:
+        int: 建立索引的评论数
+    """
+    if full:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    last_id = db.session.execute(text(f"SELECT COALESCE(MAX(rowid), 0) FROM {FTS_TABLE}")).scalar()
+    total = 0
+    while True:
+        rows = db.session.query(Comment.id, Comment.video_id, Comment.content)\
+            .filter(Comment.id > last_id).order_by(Comment.id).limit(REBUILD_BATCH_SIZE).all()
+        if not rows:
+            break
+        _write_index(rows)
+        total += len(rows)
+        last_id = rows[-1][0]
+    db.session.commit()
+    if total:
+        logger.info(f"已为 {total} 条评论建立搜索索引")
+    return total
+
+
+def index_comments(comment_ids: Iterable[str]):
+    """
+    为新保存的评论建立索引，在保存评论的同一个事务中调用
+
+    Args:
+        comment_ids: 评论ID（comment_id）
+    """
+    if not fts_enabled():
+        return
+    comment_ids = list(comment_ids)
+    for start in range(0, len(comment_ids), 500):
+        rows = db.session.query(Comment.id, Comment.video_id, Comment.content)\
+            .filter(Comment.comment_id.in_(comment_ids[start:start + 500])).all()
+        _write_index(rows)
+
+
+def _write_index(rows: Iterable[Tuple[int, str, str]]):
+    params = [
+        {'rowid': comment_id, 'tokens': ' '.join(tokenize(content)), 'video_id': video_id}
+        for comment_id, video_id, content in rows
+    ]
+    if params:
+        db.session.execute(
+            text(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, tokens, video_id) VALUES (:rowid, :tokens, :video_id)"),
+            params,
+        )
+
+
+def _like_pattern(term: str) -> str:
+    """把搜索词转换为子串匹配的 LIKE 模式，搜索词中的 %、_ 和 \\ 按普通字符匹配"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def search_comments(query: str, video_id: str = None, page: int = 1, per_page: int = 20) -> Tuple[List[Comment], bool]:
+    """
+    搜索评论内容
+
+    Args:
+        query: 搜索词，多个词用空格分隔
+        video_id: 只搜索指定视频
+        page: 页码
+        per_page: 每页评论数
+
+    Returns:
+        tuple: (按相关度排序的评论列表, 是否还有下一页)
+
+    Raises:
+        ValueError: 搜索词中没有可以搜索的文字
+    """
+    match = build_match_query(query)
+    if not match:
+        raise ValueError("搜索词不能为空")
+    offset = (page - 1) * per_page
+
+    if fts_enabled():
+        if video_id:
+            quoted = video_id.replace('"', '""')
+            match = f'tokens : ({match}) AND video_id : "{quoted}"'
+        else:
+            match = f'tokens : ({match})'
+        rowids = [row[0] for row in db.session.execute(
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"),
+            {'match': match, 'limit': per_page + 1, 'offset': offset},
+        )]
+        comments = {c.id: c for c in Comment.query.filter(Comment.id.in_(rowids[:per_page]))}
+        return [comments[rowid] for rowid in rowids[:per_page] if rowid in comments], len(rowids) > per_page
+
+    filtered = Comment.query
+    for term in query.split():
+        filtered = filtered.filter(Comment.content.ilike(_like_pattern(term), escape='\\'))
+    if video_id:
+        filtered = filtered.filter(Comment.video_id == video_id)
+    comments = filtered.order_by(Comment.created_at.desc(), Comment.id.desc()).offset(offset).limit(per_page + 1).all()
+    return comments[:per_page], len(comments) > per_page
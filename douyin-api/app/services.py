@@ -1,13 +1,17 @@
-import httpx
 import asyncio
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from loguru import logger
-from .models import db, Comment
+from .models import db, Comment, VideoCollection
+from .search import index_comments
+from .singleflight import collect_flight, collect_lock
 import sys
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # 添加 DouyinComments 目录到 Python 路径
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,12 +19,29 @@ douyin_comments_dir = os.path.join(project_root, 'DouyinComments')
 sys.path.append(douyin_comments_dir)
 
 # 导入 common 模块
-from common import common
+from common import common_async, get_sign_stats
+from http_client import get_client, client_session
+from rate_limit import get_rate_controller
+from cookie_pool import get_cookie_pool
+from dedup import SeenIndex
+from watermark import VideoWatermark
+from records import CommentRecord, as_record, decode_comment_page
+
+# 批量保存评论时每批的行数
+SAVE_BATCH_SIZE = int(os.getenv('DOUYIN_SAVE_BATCH_SIZE', '500'))
 
 class CommentService:
     def __init__(self):
         self.base_url = "https://www.douyin.com/aweme/v1/web/comment/list/"
-        self.cookie = self._get_cookie()
+        self.cookie_pool = get_cookie_pool()
+        self._pool_enabled: Optional[bool] = None
+        self._cookie_error: Optional[Exception] = None
+        try:
+            self.cookie = self._get_cookie()
+        except Exception as e:
+            # Cookie池中有可用Cookie时，允许不配置单个Cookie，采集开始时再检查
+            self._cookie_error = e
+            self.cookie = ''
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
 
     def _get_cookie(self) -> str:
@@ -44,8 +65,35 @@ class CommentService:
         logger.info("从文件加载cookie成功")
         return cookie
         
+    async def _check_cookie_source(self) -> bool:
+        """
+        检查Cookie池中是否有可用Cookie，每次采集开始时调用一次，不在每页请求时查询数据库
+        
+        Returns:
+            bool: 是否使用Cookie池
+        
+        Raises:
+            Exception: Cookie池为空且未配置单个Cookie
+        """
+        # Cookie池的SQLite查询在线程中执行，不阻塞事件循环
+        self._pool_enabled = await asyncio.to_thread(len, self.cookie_pool) > 0
+        if not self._pool_enabled and self._cookie_error is not None:
+            raise self._cookie_error
+        return self._pool_enabled
+
     async def fetch_comments(self, video_id: str, cursor: str = "0", count: str = "20"):
-        """获取评论数据"""
+        """获取评论数据，Cookie池中有可用Cookie时自动选择并在失效或限流时切换"""
+        use_pool = self._pool_enabled
+        if use_pool is None:
+            use_pool = await self._check_cookie_source()
+        if use_pool:
+            return await self.cookie_pool.call(
+                lambda cookie: self._fetch_comments_page(video_id, cursor, count, cookie)
+            )
+        return await self._fetch_comments_page(video_id, cursor, count, self.cookie)
+
+    async def _fetch_comments_page(self, video_id: str, cursor: str, count: str, cookie: str):
+        """使用指定Cookie获取一页评论数据"""
         try:
             params = {
                 "aweme_id": video_id,
@@ -55,7 +103,7 @@ class CommentService:
             }
             
             headers = {
-                "Cookie": self.cookie,
+                "Cookie": cookie,
                 "User-Agent": self.user_agent,
                 "Referer": f"https://www.douyin.com/video/{video_id}",
                 "Accept": "application/json, text/plain, */*",
@@ -63,86 +111,253 @@ class CommentService:
             }
             
             # 使用 common 函数处理参数和生成签名
-            params, headers = common(self.base_url, params, headers)
+            params, headers = await common_async(self.base_url, params, headers)
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(self.base_url, params=params, headers=headers)
-                response.raise_for_status()
+            # 复用共享客户端，避免每页重新握手
+            client = get_client()
+            response = await client.get(self.base_url, params=params, headers=headers, timeout=60.0)
+            response.raise_for_status()
+            
+            # 按声明的结构一次完成解码、校验和字段投影
+            data = decode_comment_page(response.content)
+            if data.status_code != 0:
+                error_msg = data.status_msg or '未知错误'
+                if "登录" in error_msg:
+                    raise ValueError("Cookie已失效，请更新Cookie")
+                elif "禁止访问" in error_msg:
+                    raise ValueError("IP被限制，请稍后再试")
+                raise ValueError(f"API返回错误: {error_msg}")
                 
-                data = response.json()
-                if data.get("status_code") != 0:
-                    raise ValueError(f"API返回错误: {data.get('status_msg', '未知错误')}")
-                    
-                return data.get("comments", []), data.get("has_more", False)
+            next_cursor = str(int(cursor) + len(data.comments) if data.cursor is None else data.cursor)
+            return data.comments, bool(data.has_more), next_cursor
                 
         except Exception as e:
             logger.error(f"获取评论失败: {str(e)}")
             raise
 
-    async def collect_comments(self, video_id: str, max_comments: int = 100):
-        """采集指定数量的评论"""
-        collected_comments = []
+    async def iter_comment_pages(self, video_id: str, max_comments: int = 100,
+                                 watermark: Optional[VideoWatermark] = None, progress: Optional[Dict] = None):
+        """
+        逐页采集评论，每获取到一页就返回本页的评论记录
+        
+        Args:
+            video_id: 视频ID
+            max_comments: 最多采集的评论数
+            watermark: 视频水位线，提供时跳过已知评论，遇到整页都是已知评论时停止
+            progress: 可选，采集结束时写入 complete：是否因为没有更多评论或达到数量上限而结束，
+                空页面、增量采集提前停止或出错时为 False；reached_end：是否因为没有更多评论而结束
+        
+        Yields:
+            List[CommentRecord]: 本页的评论记录，已按评论ID去重
+        """
         cursor = "0"
         retries = 3
         batch_size = min(20, max_comments)  # 控制每批次的大小
+        rate_controller = get_rate_controller()  # 与采集器共享的速率控制器
+        seen = SeenIndex(watermark.known_ids if watermark else ())
+        collected = 0
+        if progress is not None:
+            progress['complete'] = False
+            progress['reached_end'] = False
+        await self._check_cookie_source()
         
-        try:
-            while len(collected_comments) < max_comments and retries > 0:
+        # 整个采集过程复用同一个HTTP客户端
+        async with client_session():
+            while collected < max_comments and retries > 0:
                 try:
-                    comments, has_more = await self.fetch_comments(video_id, cursor, str(batch_size))
+                    await rate_controller.wait()
+                    comments, has_more, next_cursor = await self.fetch_comments(video_id, cursor, str(batch_size))
                     
                     if not comments:
+                        rate_controller.record_empty()
+                        break
+                    
+                    rate_controller.record_success()
+                    page = seen.filter_new(comments[:max_comments - collected])
+                    collected += len(page)
+                    logger.info(f"已采集 {collected}/{max_comments} 条评论")
+                    
+                    if page:
+                        yield page
+                    elif watermark is not None:
+                        logger.info("本页评论均为已知评论，增量采集结束")
                         break
-                        
-                    collected_comments.extend(comments)
-                    logger.info(f"已采集 {len(collected_comments)}/{max_comments} 条评论")
                     
                     if not has_more:
+                        if progress is not None:
+                            progress['complete'] = True
+                            progress['reached_end'] = True
                         break
-                        
-                    cursor = str(len(collected_comments))
-                    await asyncio.sleep(1)  # 避免请求过快
                     
+                    if int(next_cursor) > int(cursor):
+                        cursor = next_cursor
+                    else:
+                        # cursor 没有前进时重复请求只会拿到同一页，按重试处理
+                        retries -= 1
+                        logger.warning(f"cursor 没有前进（{cursor} -> {next_cursor}），剩余重试次数: {retries}")
+                
                 except Exception as e:
                     retries -= 1
+                    rate_controller.record_error(e)
                     if retries == 0:
                         raise
                     logger.warning(f"获取评论失败，剩余重试次数: {retries}")
-                    await asyncio.sleep(2)
             
-            # 处理评论数据
-            processed_comments = []
-            for comment in collected_comments[:max_comments]:
-                processed_comment = self._process_comment(comment)
-                if processed_comment:
-                    processed_comments.append(processed_comment)
-                    
-            return processed_comments
-                
+            if collected >= max_comments and progress is not None:
+                progress['complete'] = True
+
+    async def collect_comments(self, video_id: str, max_comments: int = 100, delta: bool = False):
+        """
+        采集指定数量的评论，并批量写入数据库
+        
+        Args:
+            video_id: 视频ID
+            max_comments: 最多采集的评论数
+            delta: 增量采集，以数据库中已保存的评论为水位线，只采集并保存新增评论
+        
+        Returns:
+            List[Dict]: _process_comment 处理后的评论
+        """
+        try:
+            watermark = self.load_watermark(video_id) if delta else None
+            records = []
+            progress = {}
+            async for page in self.iter_comment_pages(video_id, max_comments, watermark, progress):
+                records.extend(page)
+            
+            if records:
+                self.save_comments(video_id, records)
+            # 增量采集只获取了部分评论，提前结束的采集结果不完整，都不作为缓存依据
+            if not delta and records and progress['complete']:
+                self.mark_collected(video_id, max_comments, len(records), progress['reached_end'])
+            elif not delta:
+                logger.info(f"视频 {video_id} 的采集未完整结束，不记录为缓存")
+            processed = (self._process_comment(record) for record in records)
+            return [comment for comment in processed if comment]
+        
         except Exception as e:
             logger.error(f"采集评论失败: {str(e)}")
             raise
+    
+    async def get_or_collect(self, video_id: str, max_comments: int = 100, delta: bool = False,
+                             force_refresh: bool = False, fresh_since: Optional[datetime] = None):
+        """
+        获取视频评论，新鲜度窗口内采集过的视频直接从数据库返回
+        
+        新鲜度窗口由 COLLECT_CACHE_TTL 配置（秒，0 表示不使用缓存）。上次采集的数量不少于本次请求的数量，
+        或者上次已经采集到了全部评论时才使用缓存；增量采集总是访问抖音接口。
+        
+        Args:
+            video_id: 视频ID
+            max_comments: 最多采集的评论数
+            delta: 增量采集
+            force_refresh: 忽略缓存，重新采集
+            fresh_since: 在此时间（UTC）之后采集过的视频不受新鲜度窗口限制，直接从数据库返回
+        
+        Returns:
+            tuple: (评论列表, 是否来自缓存)
+        """
+        if not delta and not force_refresh and self.is_fresh(video_id, max_comments, fresh_since):
+            comments = Comment.query.filter_by(video_id=video_id).order_by(Comment.id).limit(max_comments).all()
+            logger.info(f"视频 {video_id} 在新鲜度窗口内已采集，从数据库返回 {len(comments)} 条评论")
+            return [self._comment_to_dict(comment) for comment in comments], True
+        return await self.collect_comments(video_id, max_comments, delta=delta), False
+    
+    async def collect_shared(self, video_id: str, max_comments: int = 100, delta: bool = False,
+                             force_refresh: bool = False):
+        """
+        合并并发的相同采集请求后获取视频评论
+        
+        进程内按 (video_id, max_comments, delta, force_refresh) 合并：同时到达的相同请求只采集一次，其余请求共享结果，
+        强制刷新的请求不会拿到普通请求从缓存读取的结果。
+        启用 COLLECT_LOCK_ENABLED 时还会通过数据库锁表与其他服务进程协调，
+        等待其他进程采集完成后直接从数据库读取它刚保存的评论。
+        
+        Returns:
+            tuple: (评论列表, 是否来自缓存, 是否共享了其他请求的结果)
+        """
+        async def run():
+            async with collect_lock(f"collect:{video_id}:{max_comments}:{int(delta)}") as waited_since:
+                return await self.get_or_collect(
+                    video_id, max_comments, delta=delta,
+                    force_refresh=force_refresh and waited_since is None,
+                    fresh_since=waited_since
+                )
+        
+        (comments, cached), coalesced = await collect_flight.do(
+            (video_id, max_comments, delta, force_refresh), run
+        )
+        if coalesced:
+            logger.info(f"视频 {video_id} 的采集请求与正在进行的采集合并")
+        return comments, cached, coalesced
+    
+    def is_fresh(self, video_id: str, max_comments: int, since: Optional[datetime] = None) -> bool:
+        """视频是否在新鲜度窗口内（或 since 之后）采集过，且采集的数量满足本次请求"""
+        ttl = current_app.config.get('COLLECT_CACHE_TTL', 0)
+        if ttl <= 0 and since is None:
+            return False
+        collection = db.session.get(VideoCollection, video_id)
+        if collection is None or collection.collected_at is None:
+            return False
+        recent = since is not None and collection.collected_at >= since
+        in_window = ttl > 0 and datetime.utcnow() - collection.collected_at <= timedelta(seconds=ttl)
+        if not (recent or in_window):
+            return False
+        # 上次采集因为没有更多评论而结束时，请求更多评论也不会有新的结果
+        return collection.max_comments >= max_comments or collection.reached_end
+    
+    def mark_collected(self, video_id: str, max_comments: int, comment_count: int, reached_end: bool = False):
+        """
+        记录视频最近一次完整采集的时间、数量和是否采集到了末尾，作为缓存依据
+        
+        只记录这一次采集的结果，不与之前的记录合并：之前采集到末尾的结论不会因为之后数量较小的采集而续期。
+        """
+        try:
+            collection = db.session.get(VideoCollection, video_id)
+            if collection is None:
+                collection = VideoCollection(video_id=video_id)
+                db.session.add(collection)
+            collection.max_comments = max_comments
+            collection.comment_count = comment_count
+            collection.reached_end = reached_end
+            collection.collected_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"记录采集时间失败: {str(e)}")
+
+    def load_watermark(self, video_id: str) -> VideoWatermark:
+        """根据数据库中已保存的评论构建视频水位线"""
+        rows = db.session.query(Comment.comment_id, Comment.created_at).filter_by(video_id=video_id).all()
+        max_create_time = max((int(created_at.timestamp()) for _, created_at in rows if created_at), default=0)
+        logger.info(f"视频 {video_id} 已保存 {len(rows)} 条评论，最新评论时间戳: {max_create_time}")
+        return VideoWatermark(
+            video_id,
+            directory=None,
+            known_ids=(comment_id for comment_id, _ in rows),
+            max_create_time=max_create_time,
+        )
 
-    def save_comment(self, comment_data, video_id):
+    def save_comment(self, record: CommentRecord, video_id):
         """保存评论数据"""
         try:
             # 将时间戳转换为 datetime 对象
-            created_at = datetime.fromtimestamp(
-                int(comment_data.get('create_time', 0))
-            ) if comment_data.get('create_time') else None
+            created_at = datetime.fromtimestamp(record.create_time) if record.create_time else None
             
             comment = Comment(
                 video_id=video_id,
-                comment_id=comment_data.get('cid', ''),
-                content=comment_data.get('text', ''),
+                comment_id=record.cid,
+                content=record.text,
                 created_at=created_at,
-                likes=comment_data.get('digg_count', 0),
-                reply_count=comment_data.get('reply_comment_total', 0),
-                user_id=comment_data.get('user', {}).get('uid', ''),
-                user_nickname=comment_data.get('user', {}).get('nickname', ''),
-                ip_location=comment_data.get('ip_label', '')
+                likes=record.digg_count,
+                reply_count=record.reply_comment_total,
+                user_id=record.uid,
+                user_nickname=record.nickname or '',
+                ip_location=record.ip_label or ''
             )
             db.session.add(comment)
+            db.session.flush()
+            index_comments([comment.comment_id])
             db.session.commit()
             return comment
         except Exception as e:
@@ -150,69 +365,154 @@ class CommentService:
             db.session.rollback()
             raise
             
-    def save_comments(self, video_id: str, comments: list):
-        """保存评论到数据库"""
+    def save_comments(self, video_id: str, comments: list) -> Dict[str, int]:
+        """
+        批量保存评论到数据库，comments 为评论记录列表，也兼容接口返回的原始评论
+        
+        先按批次一次查询已存在的评论，再用 INSERT ... ON CONFLICT(comment_id) DO UPDATE 批量写入：
+        新评论直接插入，已存在的评论只更新点赞数和回复数，两者都没有变化的评论跳过。
+        整个操作在一个事务中完成。
+        
+        Returns:
+            Dict[str, int]: 新增(saved)、更新(updated)、跳过(skipped)和出错(errors)的评论数
+        """
         operation_id = f"save_{video_id}_{int(time.time())}"
         logger.info(f"[Operation:{operation_id}] Starting to save {len(comments)} comments for video {video_id}")
+        started = time.time()
+        stats = {'saved': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+        
+        # 同一批数据中重复的评论只保留最后一条
+        rows = {}
+        for comment_data in comments:
+            record = as_record(comment_data)
+            if record is None:
+                logger.error(f"[Operation:{operation_id}] Missing comment ID in data: {comment_data}")
+                stats['errors'] += 1
+                continue
+            if record.cid in rows:
+                stats['skipped'] += 1
+            rows[record.cid] = self._comment_row(record, video_id)
         
         try:
-            saved_count = 0
-            skipped_count = 0
-            error_count = 0
-            
-            for index, comment_data in enumerate(comments, 1):
-                try:
-                    # 检查评论是否已存在
-                    comment_id = comment_data.get("cid")
-                    if not comment_id:
-                        logger.error(f"[Operation:{operation_id}] Missing comment ID in data: {comment_data}")
-                        error_count += 1
-                        continue
-                        
-                    existing = Comment.query.filter_by(comment_id=comment_id).first()
-                    if existing:
-                        logger.debug(f"[Operation:{operation_id}] Comment {comment_id} already exists")
-                        skipped_count += 1
+            rows = list(rows.values())
+            for start in range(0, len(rows), SAVE_BATCH_SIZE):
+                batch = rows[start:start + SAVE_BATCH_SIZE]
+                existing = {
+                    comment_id: (likes, reply_count)
+                    for comment_id, likes, reply_count in db.session.query(
+                        Comment.comment_id, Comment.likes, Comment.reply_count
+                    ).filter(Comment.comment_id.in_([row['comment_id'] for row in batch]))
+                }
+                changed = []
+                new_ids = []
+                for row in batch:
+                    previous = existing.get(row['comment_id'])
+                    if previous is None:
+                        stats['saved'] += 1
+                        new_ids.append(row['comment_id'])
+                    elif previous != (row['likes'], row['reply_count']):
+                        stats['updated'] += 1
+                    else:
+                        stats['skipped'] += 1
                         continue
-                        
-                    # 创建新评论
-                    comment = self.save_comment(comment_data, video_id)
-                    saved_count += 1
-                    
-                    if index % 10 == 0:  # 每10条评论记录一次进度
-                        logger.info(f"[Operation:{operation_id}] Progress: {index}/{len(comments)} comments processed")
-                        db.session.commit()  # 定期提交，避免事务过大
-                        
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"[Operation:{operation_id}] Error creating comment: {str(e)}")
-                    logger.debug(f"[Operation:{operation_id}] Problematic comment data: {comment_data}")
-                    continue
-                
+                    changed.append(row)
+                self._upsert_rows(changed)
+                # 已存在的评论内容不会变化，只需要为新评论建立搜索索引
+                index_comments(new_ids)
+            
             db.session.commit()
-            logger.info(f"[Operation:{operation_id}] Operation completed - Saved: {saved_count}, Skipped: {skipped_count}, Errors: {error_count}")
-            return True
+            logger.info(
+                f"[Operation:{operation_id}] Operation completed in {time.time() - started:.3f}s - "
+                f"Saved: {stats['saved']}, Updated: {stats['updated']}, Skipped: {stats['skipped']}, Errors: {stats['errors']}"
+            )
+            return stats
             
         except Exception as e:
             db.session.rollback()
             logger.error(f"[Operation:{operation_id}] Database operation failed: {str(e)}")
             logger.exception(e)
             raise
+    
+    def _comment_row(self, record: CommentRecord, video_id: str) -> dict:
+        """把评论记录转换为 comments 表的一行"""
+        return {
+            'video_id': video_id,
+            'comment_id': record.cid,
+            'content': record.text,
+            'created_at': datetime.fromtimestamp(record.create_time) if record.create_time else None,
+            'likes': record.digg_count,
+            'reply_count': record.reply_comment_total,
+            'user_id': record.uid,
+            'user_nickname': record.nickname or '',
+            'ip_location': record.ip_label or '',
+            'collected_at': datetime.utcnow(),
+        }
+    
+    def _upsert_rows(self, rows: List[Dict]):
+        """
+        批量插入评论，comment_id 已存在时更新点赞数和回复数
+        
+        SQLite 和 PostgreSQL 使用 INSERT ... ON CONFLICT，其他数据库分别批量插入和批量更新。
+        """
+        if not rows:
+            return
+        table = Comment.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.comment_id],
+                set_={'likes': stmt.excluded.likes, 'reply_count': stmt.excluded.reply_count},
+            )
+            db.session.execute(stmt, rows)
+            return
+        
+        existing = {
+            row[0] for row in db.session.query(Comment.comment_id).filter(
+                Comment.comment_id.in_([row['comment_id'] for row in rows])
+            )
+        }
+        new_rows = [row for row in rows if row['comment_id'] not in existing]
+        if new_rows:
+            db.session.execute(table.insert(), new_rows)
+        updates = [
+            {'b_comment_id': row['comment_id'], 'b_likes': row['likes'], 'b_reply_count': row['reply_count']}
+            for row in rows if row['comment_id'] in existing
+        ]
+        if updates:
+            db.session.execute(
+                table.update()
+                .where(table.c.comment_id == bindparam('b_comment_id'))
+                .values(likes=bindparam('b_likes'), reply_count=bindparam('b_reply_count')),
+                updates,
+            )
             
-    def _process_comment(self, comment_data: dict) -> dict:
-        """处理评论数据，提取需要的字段并进行格式化"""
+    def _comment_to_dict(self, comment: Comment) -> dict:
+        """把数据库中的评论转换为与 _process_comment 相同的格式"""
+        return {
+            'comment_id': comment.comment_id,
+            'content': comment.content,
+            'created_at': comment.created_at.strftime('%Y-%m-%dT%H:%M:%S') if comment.created_at else '',
+            'likes': comment.likes,
+            'user_id': comment.user_id,
+            'user_nickname': comment.user_nickname or '',
+            'ip_location': comment.ip_location or '',
+            'reply_count': comment.reply_count
+        }
+    
+    def _process_comment(self, record: CommentRecord) -> dict:
+        """处理评论记录，转换为接口返回的格式"""
         try:
             return {
-                'comment_id': str(comment_data.get('cid', '')),
-                'content': comment_data.get('text', ''),
-                'created_at': datetime.fromtimestamp(
-                    int(comment_data.get('create_time', 0))
-                ).strftime('%Y-%m-%dT%H:%M:%S'),
-                'likes': int(comment_data.get('digg_count', 0)),
-                'user_id': str(comment_data.get('user', {}).get('uid', '')),
-                'user_nickname': comment_data.get('user', {}).get('nickname', ''),
-                'ip_location': comment_data.get('ip_label', ''),
-                'reply_count': int(comment_data.get('reply_comment_total', 0))
+                'comment_id': record.cid,
+                'content': record.text,
+                'created_at': datetime.fromtimestamp(record.create_time).strftime('%Y-%m-%dT%H:%M:%S'),
+                'likes': record.digg_count,
+                'user_id': record.uid,
+                'user_nickname': record.nickname or '',
+                'ip_location': record.ip_label or '',
+                'reply_count': record.reply_comment_total
             }
         except Exception as e:
             logger.error(f"处理评论数据时出错: {e}")
@@ -239,10 +539,10 @@ class CommentService:
             }
             
             # 使用 common 函数处理参数和生成签名
-            params, headers = common(self.base_url, params, headers)
+            params, headers = await common_async(self.base_url, params, headers)
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(self.base_url, params=params, headers=headers)
+            async with client_session() as client:
+                response = await client.get(self.base_url, params=params, headers=headers, timeout=60.0)
                 response.raise_for_status()
                 
                 data = response.json()
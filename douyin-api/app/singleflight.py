@@ -0,0 +1,156 @@
+"""
+采集请求合并
+
+多个客户端同时请求采集同一个视频时，只有第一个请求（leader）真正访问抖音接口，
+其余请求等待它完成并共享同一个结果，避免重复采集放大上游压力和限流风险。
+
+Flask 的异步视图在各自线程的事件循环中运行，进程内的合并使用线程安全的 concurrent.futures.Future，
+等待方通过 asyncio.wrap_future 在自己的事件循环中等待。
+多个服务进程之间可以选择通过数据库中的锁表协调：拿不到锁的进程等待持有锁的进程采集完成，
+然后直接从数据库读取刚保存的评论。
+"""
+import asyncio
+import concurrent.futures
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import current_app
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, CollectLock
+
+# 等待其他进程释放锁时的检查间隔（秒）
+LOCK_POLL_INTERVAL = 0.5
+
+
+class SingleFlight:
+    """
+    按键合并并发调用，同一个键同时只执行一次
+
+    完成（成功或抛出异常）后立即移除，之后的调用会重新执行。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行 func，已有相同键的调用在执行时等待它的结果
+
+        leader 被取消（或抛出其他非 Exception 的异常）时不把它转给等待方，
+        而是释放该键，由等待方重新竞争 leader 再执行一次。
+
+        Args:
+            key: 合并键
+            func: 返回协程的函数，只有 leader 会调用
+
+        Returns:
+            tuple: (结果, 是否共享了其他调用的结果)
+
+        Raises:
+            Exception: leader 抛出的异常会同样抛给所有等待方
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._calls[key] = future
+            if leader:
+                break
+            try:
+                # 等待方被取消时不能取消共享的结果
+                return await asyncio.shield(asyncio.wrap_future(future)), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                logger.debug(f"合并调用 {key} 的 leader 已取消，重新执行")
+
+        try:
+            result = await func()
+        except Exception as e:
+            self._release(key, future)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._release(key, future)
+            future.cancel()
+            raise
+        self._release(key, future)
+        future.set_result(result)
+        return result, False
+
+    def _release(self, key: Hashable, future: concurrent.futures.Future):
+        # 先移除键再通知等待方，被唤醒后重新竞争的等待方不会拿到已结束的调用
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+
+# 评论采集共用的合并器
+collect_flight = SingleFlight()
+
+
+def _try_acquire(key: str, owner: str, ttl: int) -> bool:
+    """尝试获取锁，已过期的锁会被接管"""
+    now = datetime.utcnow()
+    try:
+        db.session.add(CollectLock(key=key, owner=owner, expires_at=now + timedelta(seconds=ttl)))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+    expired = CollectLock.query.filter(CollectLock.key == key, CollectLock.expires_at < now).delete()
+    db.session.commit()
+    if expired:
+        logger.warning(f"采集锁 {key} 已过期，接管采集")
+        return _try_acquire(key, owner, ttl)
+    return False
+
+
+@asynccontextmanager
+async def collect_lock(key: str):
+    """
+    跨进程采集锁，未启用 COLLECT_LOCK_ENABLED 时不做任何操作
+
+    需要在应用上下文中使用。其他进程正在采集时等待它释放锁（或锁过期），然后不再持有锁直接进入。
+
+    Yields:
+        Optional[datetime]: 等待了其他进程时为开始等待的时间（UTC），否则为 None
+    """
+    if not current_app.config.get('COLLECT_LOCK_ENABLED'):
+        yield None
+        return
+
+    ttl = current_app.config.get('COLLECT_LOCK_TTL', 300)
+    owner = uuid.uuid4().hex
+    waited_since: Optional[datetime] = None
+    acquired = _try_acquire(key, owner, ttl)
+    while not acquired:
+        if waited_since is None:
+            waited_since = datetime.utcnow()
+            logger.info(f"其他进程正在执行采集 {key}，等待其完成")
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        if db.session.query(CollectLock.key).filter_by(key=key).first() is None:
+            break
+        # 锁过期时接管，说明持有锁的进程没有完成采集，由本进程重新采集
+        acquired = _try_acquire(key, owner, ttl)
+
+    if not acquired:
+        yield waited_since
+        return
+    try:
+        yield None
+    finally:
+        CollectLock.query.filter_by(key=key, owner=owner).delete()
+        db.session.commit()
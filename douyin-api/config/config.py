@@ -8,6 +8,24 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///douyin.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 连接池配置（SQLite 文件数据库和其他数据库生效）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+    # SQLite 连接参数，每个新连接都会设置
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    
+    # 评论采集缓存：新鲜度窗口内采集过的视频直接从数据库返回（秒，0 表示不使用缓存）
+    COLLECT_CACHE_TTL = int(os.getenv('COLLECT_CACHE_TTL', '600'))
+    # 多个服务进程共享数据库时，通过锁表保证同一视频同时只有一个进程在采集
+    COLLECT_LOCK_ENABLED = os.getenv('COLLECT_LOCK_ENABLED', 'false').lower() == 'true'
+    # 锁的有效期（秒），持有锁的进程异常退出后超过有效期的锁可以被其他进程接管
+    COLLECT_LOCK_TTL = int(os.getenv('COLLECT_LOCK_TTL', '300'))
     
     # JWT配置
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key')
@@ -0,0 +1,97 @@
+"""
+API 测试配置
+
+每个测试使用独立的临时 SQLite 数据库和 Cookie 池，不访问抖音接口。
+配置在导入时读取环境变量，需要在导入 app 之前设置。
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DOUYIN_COOKIE', 'test-cookie')
+os.environ.setdefault('JWT_SECRET_KEY', 'douyin-api-test-jwt-secret-key-32b')
+os.environ['DOUYIN_COOKIE_POOL'] = os.path.join(tempfile.mkdtemp(prefix='douyin-api-test-'), 'cookie_pool.db')
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from app.models import db
+from app.services import CommentService
+from config.config import Config
+from rate_limit import FixedDelayController, set_rate_controller
+from records import CommentRecord
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'douyin.db'}")
+    monkeypatch.setattr(Config, 'COLLECT_CACHE_TTL', 600)
+    monkeypatch.setattr(Config, 'COLLECT_LOCK_ENABLED', False)
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    return {'Authorization': f"Bearer {create_access_token(identity='tester')}"}
+
+
+class FakeUpstream:
+    """
+    代替抖音评论接口，每个视频有 totals[video_id] 条评论
+
+    Attributes:
+        calls: 请求次数
+        delay: 每次请求的耗时（秒）
+        error: 设置后每次请求都抛出该异常
+        empty_after: 设置后从该偏移量开始返回空页面，has_more 仍为真
+        stuck_at: 设置后到达该偏移量时 cursor 不再前进，一直返回同一页
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = 0
+        self.delay = 0.0
+        self.error = None
+        self.empty_after = None
+        self.stuck_at = None
+
+    async def fetch(self, video_id, cursor="0", count="20"):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        offset, total = int(cursor), self.totals.get(video_id, 0)
+        if self.empty_after is not None and offset >= self.empty_after:
+            return [], True, cursor
+        end = min(offset + int(count), total)
+        comments = [
+            CommentRecord(cid=f"{video_id}-{i}", text=f"评论{i}", aweme_id=video_id, create_time=1700000000 - i)
+            for i in range(offset, end)
+        ]
+        if self.stuck_at is not None and offset >= self.stuck_at:
+            return comments, True, cursor
+        return comments, end < total, str(end)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = FakeUpstream()
+    monkeypatch.setattr(CommentService, 'fetch_comments', fake.fetch)
+    set_rate_controller(FixedDelayController(0, 0))
+    yield fake
+    set_rate_controller(None)
@@ -0,0 +1,149 @@
+"""
+评论采集缓存测试
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from app import create_app
+from app.models import Comment, VideoCollection, db
+from app.services import CommentService
+from config.config import Config
+
+
+def collect(video_id, max_comments=100, **kwargs):
+    return asyncio.run(CommentService().get_or_collect(video_id, max_comments, **kwargs))
+
+
+def collection(video_id):
+    db.session.expire_all()
+    return db.session.get(VideoCollection, video_id)
+
+
+def test_complete_crawl_is_served_from_database(app, upstream):
+    upstream.totals["1"] = 45
+    comments, cached = collect("1")
+    assert len(comments) == 45 and not cached
+    assert (collection("1").max_comments, collection("1").comment_count) == (100, 45)
+    calls = upstream.calls
+
+    # 上次已经采集到全部评论，请求更多评论也使用缓存
+    comments, cached = collect("1", 500)
+    assert len(comments) == 45 and cached
+    assert upstream.calls == calls
+
+
+def test_limit_reached_is_cached_only_for_smaller_requests(app, upstream):
+    upstream.totals["1"] = 100
+    comments, _ = collect("1", 40)
+    assert len(comments) == 40
+    assert (collection("1").max_comments, collection("1").comment_count) == (40, 40)
+    assert collect("1", 30)[1]
+    assert not collect("1", 60)[1]
+
+
+def test_truncated_crawl_is_not_cached(app, upstream):
+    upstream.totals["1"] = 100
+    upstream.empty_after = 40
+    comments, cached = collect("1")
+    assert len(comments) == 40 and not cached
+    assert collection("1") is None
+    # 没有记录为缓存，下次请求重新采集
+    upstream.empty_after = None
+    comments, cached = collect("1")
+    assert len(comments) == 100 and not cached
+    assert collection("1").comment_count == 100
+
+
+def test_failed_crawl_is_not_cached(app, upstream):
+    upstream.totals["1"] = 10
+    upstream.error = ValueError("Cookie已失效，请更新Cookie")
+    with pytest.raises(ValueError, match="Cookie已失效"):
+        collect("1")
+    assert collection("1") is None
+
+    # 视频没有评论时也不记录
+    upstream.error = None
+    upstream.totals["1"] = 0
+    assert collect("1") == ([], False)
+    assert collection("1") is None
+
+
+def test_smaller_refresh_replaces_recorded_crawl(app, upstream):
+    upstream.totals["1"] = 600
+    collect("1", 1000)
+    assert (collection("1").max_comments, collection("1").comment_count, collection("1").reached_end) == (1000, 600, True)
+    assert collect("1", 2000)[1]
+
+    # 之后数量较小的重新采集没有采集到末尾，不能为之前“已采集全部评论”的结论续期
+    upstream.totals["1"] = 800
+    comments, cached = collect("1", 100, force_refresh=True)
+    assert len(comments) == 100 and not cached
+    assert (collection("1").max_comments, collection("1").comment_count, collection("1").reached_end) == (100, 100, False)
+    assert collect("1", 50)[1]
+    comments, cached = collect("1", 2000)
+    assert len(comments) == 800 and not cached
+    assert Comment.query.count() == 800
+
+
+def test_delta_is_not_cached(app, upstream):
+    upstream.totals["1"] = 30
+    comments, _ = collect("1", delta=True)
+    assert len(comments) == 30
+    assert collection("1") is None
+
+
+def test_missing_cookie_fails_once_at_crawl_start(app, upstream, monkeypatch):
+    monkeypatch.delenv("DOUYIN_COOKIE")
+    def missing_cookie(self):
+        raise Exception("Cookie未加载")
+
+    monkeypatch.setattr(CommentService, "_get_cookie", missing_cookie)
+    upstream.totals["1"] = 10
+    with pytest.raises(Exception, match="Cookie未加载"):
+        collect("1")
+    assert upstream.calls == 0
+
+
+def test_stuck_cursor_stops_after_retries(app, upstream):
+    upstream.totals["1"] = 100
+    upstream.stuck_at = 40
+    comments, cached = asyncio.run(asyncio.wait_for(CommentService().get_or_collect("1", 100), timeout=5))
+    assert len(comments) == 60 and not cached
+    # 偏移量40的页面返回新评论但 cursor 没有前进，连同之后的重复请求共消耗3次重试
+    assert upstream.calls == 2 + 3
+    assert collection("1") is None
+
+
+def test_existing_collection_table_gets_reached_end_column(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE video_collections (video_id VARCHAR(20) PRIMARY KEY, max_comments INTEGER, "
+                     "comment_count INTEGER, collected_at DATETIME)")
+        conn.execute("INSERT INTO video_collections VALUES ('1', 1000, 600, '2026-01-01 00:00:00')")
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{path}")
+    app = create_app()
+    with app.app_context():
+        # 旧记录不知道是否采集到了末尾，按没有采集到末尾处理
+        assert db.session.get(VideoCollection, "1").reached_end is False
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_collect_route_parses_flags_strictly(client, auth_headers, upstream):
+    upstream.totals["1"] = 10
+    response = client.post("/api/comments/collect", json={"video_id": "1"}, headers=auth_headers)
+    assert response.status_code == 200 and not response.get_json()["cached"]
+
+    # 字符串 "false" 不能被当成真值而强制刷新
+    response = client.post("/api/comments/collect", json={"video_id": "1", "force_refresh": "false"}, headers=auth_headers)
+    assert response.get_json()["cached"]
+    response = client.get("/api/comments/collect", query_string={"video_id": "1", "delta": "0"}, headers=auth_headers)
+    assert response.get_json()["cached"] and not response.get_json()["delta"]
+    response = client.post("/api/comments/collect", json={"video_id": "1", "force_refresh": "yes"}, headers=auth_headers)
+    assert not response.get_json()["cached"]
+
+    for body in ({"delta": "maybe"}, {"force_refresh": 2}, {"delta": []}):
+        response = client.post("/api/comments/collect", json={"video_id": "1", **body}, headers=auth_headers)
+        assert response.status_code == 400
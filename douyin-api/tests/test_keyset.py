@@ -0,0 +1,64 @@
+"""
+评论游标分页测试
+"""
+import base64
+from datetime import datetime
+
+from app.models import Comment, db
+from app.routes import decode_cursor, encode_cursor
+
+
+def add_comments(video_id, times):
+    for index, created_at in enumerate(times):
+        db.session.add(Comment(video_id=video_id, comment_id=f"{video_id}-{index}", content="好看",
+                               created_at=created_at))
+    db.session.commit()
+
+
+def pages(client, headers, video_id, per_page):
+    after, ids = "", []
+    while True:
+        response = client.get(f"/api/comments/{video_id}", query_string={'after': after, 'per_page': per_page},
+                              headers=headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        ids.extend(comment['id'] for comment in data['comments'])
+        if not data['has_more']:
+            assert data['next_cursor'] is None
+            return ids
+        after = data['next_cursor']
+
+
+def test_cursor_round_trip():
+    comment = Comment(id=42, created_at=datetime(2024, 1, 2, 3, 4, 5, 678000))
+    assert decode_cursor(encode_cursor(comment)) == (datetime(2024, 1, 2, 3, 4, 5, 678000), 42)
+    # 游标不包含补齐用的等号，可以直接放在URL中
+    assert "=" not in encode_cursor(comment)
+    assert decode_cursor(encode_cursor(Comment(id=7, created_at=None))) == (None, 7)
+
+
+def test_malformed_cursor_returns_400(client, auth_headers):
+    malformed = ["not-a-cursor", "!!!"] + [
+        base64.urlsafe_b64encode(raw.encode()).decode()
+        for raw in ("没有分隔符", "2024-13-01T00:00:00|1", "2024-01-01T00:00:00|abc", "a|b|c")
+    ]
+    for after in malformed:
+        response = client.get("/api/comments/1", query_string={'after': after}, headers=auth_headers)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == "无效的游标"
+
+
+def test_keyset_pages_are_stable_on_created_at_ties(client, auth_headers):
+    tie = datetime(2024, 1, 1, 12, 0, 0)
+    times = [tie] * 7 + [datetime(2024, 1, 2)] * 3 + [None] * 4 + [datetime(2023, 12, 31), tie, tie]
+    add_comments("1", times)
+    add_comments("2", [tie] * 3)
+
+    expected = [c.id for c in sorted(
+        Comment.query.filter_by(video_id="1"),
+        key=lambda c: (c.created_at is not None, c.created_at or datetime.min, c.id),
+        reverse=True,
+    )]
+    for per_page in (1, 3, 4, len(times), 50):
+        ids = pages(client, auth_headers, "1", per_page)
+        assert ids == expected
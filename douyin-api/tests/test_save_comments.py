@@ -0,0 +1,42 @@
+"""
+批量保存评论测试
+"""
+from app.models import Comment
+from app.services import CommentService
+from records import CommentRecord
+
+
+def record(cid, likes=0, replies=0, text="好看", create_time=1700000000):
+    return CommentRecord(cid=cid, text=text, aweme_id="1", create_time=create_time,
+                         digg_count=likes, reply_comment_total=replies)
+
+
+def test_save_comments_upserts_existing_rows(app):
+    service = CommentService()
+    stats = service.save_comments("1", [record("a", 1), record("b", 2), record("c", 3)])
+    assert stats == {'saved': 3, 'updated': 0, 'skipped': 0, 'errors': 0}
+
+    stats = service.save_comments("1", [
+        record("a", 10, 5, text="内容不会被覆盖"),  # 点赞数和回复数变化
+        record("b", 2),                           # 没有变化
+        record("d", 4),                           # 新评论
+        record("d", 4),                           # 同一批中重复
+        {"text": "缺少评论ID"},
+    ])
+    assert stats == {'saved': 1, 'updated': 1, 'skipped': 2, 'errors': 1}
+
+    comments = {c.comment_id: c for c in Comment.query.all()}
+    assert sorted(comments) == ["a", "b", "c", "d"]
+    assert (comments["a"].likes, comments["a"].reply_count, comments["a"].content) == (10, 5, "好看")
+    assert comments["b"].likes == 2
+    assert comments["d"].video_id == "1"
+
+
+def test_save_comments_spans_batches(app, monkeypatch):
+    monkeypatch.setattr("app.services.SAVE_BATCH_SIZE", 7)
+    service = CommentService()
+    service.save_comments("1", [record(str(i), i) for i in range(20)])
+    stats = service.save_comments("1", [record(str(i), i + (i % 2)) for i in range(25)])
+    assert stats == {'saved': 5, 'updated': 10, 'skipped': 10, 'errors': 0}
+    assert Comment.query.count() == 25
+    assert Comment.query.filter_by(comment_id="19").one().likes == 20
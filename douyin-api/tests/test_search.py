@@ -0,0 +1,69 @@
+"""
+评论全文搜索测试
+"""
+import pytest
+
+from app.search import build_match_query, fts_enabled, rebuild_search_index, search_comments, tokenize
+from app.services import CommentService
+from records import CommentRecord
+
+CONTENTS = {
+    "1": ["这个视频很好看", "好看好看", "一般般", "Great video 100%", "100 percent", "a_b 测试", "axb 测试"],
+    "2": ["真好看呀", "不好看"],
+}
+
+
+@pytest.fixture
+def comments(app):
+    service = CommentService()
+    for video_id, contents in CONTENTS.items():
+        service.save_comments(video_id, [
+            CommentRecord(cid=f"{video_id}-{i}", text=text, aweme_id=video_id, create_time=1700000000 + i)
+            for i, text in enumerate(contents)
+        ])
+
+
+def contents(results):
+    return {comment.content for comment in results}
+
+
+def test_tokenize_and_match_query():
+    assert tokenize("很好看!Great") == ["很好", "好看", "看", "great"]
+    assert build_match_query("好看 video") == '"好看" "video"*'
+    assert build_match_query("看") == '"看"*'
+    assert build_match_query("!!!") == ""
+
+
+def test_fts_search(app, comments):
+    assert fts_enabled()
+    results, has_more = search_comments("好看")
+    assert contents(results) == {"不好看", "好看好看", "这个视频很好看", "真好看呀"}
+    assert not has_more
+    # 多个词同时包含，单个汉字和英文单词前缀匹配
+    assert contents(search_comments("视频 好看")[0]) == {"这个视频很好看"}
+    assert contents(search_comments("vid")[0]) == {"Great video 100%"}
+    assert contents(search_comments("好看", video_id="2")[0]) == {"不好看", "真好看呀"}
+
+    page1, has_more = search_comments("好看", page=1, per_page=3)
+    page2, _ = search_comments("好看", page=2, per_page=3)
+    assert has_more and len(page1) == 3 and len(page2) == 1
+    assert not {c.id for c in page1} & {c.id for c in page2}
+
+    with pytest.raises(ValueError):
+        search_comments("!!!")
+
+
+def test_rebuild_search_index(app, comments):
+    assert rebuild_search_index() == 0
+    assert rebuild_search_index(full=True) == sum(len(v) for v in CONTENTS.values())
+    assert contents(search_comments("一般")[0]) == {"一般般"}
+
+
+def test_like_fallback_escapes_wildcards(app, comments):
+    app.config['COMMENT_SEARCH_FTS'] = False
+    assert contents(search_comments("好看", video_id="1")[0]) == {"好看好看", "这个视频很好看"}
+    assert contents(search_comments("GREAT")[0]) == {"Great video 100%"}
+    # % 和 _ 按普通字符匹配
+    assert contents(search_comments("100%")[0]) == {"Great video 100%"}
+    assert contents(search_comments("a_b")[0]) == {"a_b 测试"}
+    assert search_comments("0%v")[0] == []
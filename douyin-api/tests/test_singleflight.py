@@ -0,0 +1,157 @@
+"""
+采集请求合并测试
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import singleflight
+from app.models import CollectLock, db
+from app.services import CommentService
+from app.singleflight import SingleFlight, collect_lock
+
+
+def collect_concurrently(*requests):
+    """在同一个事件循环中同时发起多个采集请求，每个请求为 collect_shared 的关键字参数"""
+    async def run():
+        return await asyncio.gather(*(CommentService().collect_shared("1", **kwargs) for kwargs in requests))
+    return asyncio.run(run())
+
+
+def test_leader_result_is_shared_across_event_loops():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    async def func():
+        calls.append(1)
+        started.set()
+        await asyncio.to_thread(release.wait)
+        return "结果"
+
+    def request():
+        results.append(asyncio.run(flight.do("key", func)))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait(timeout=5)
+    waiter = threading.Thread(target=request)
+    waiter.start()
+    # 等待方进入等待后再让 leader 完成
+    time.sleep(0.1)
+    release.set()
+    leader.join(timeout=5)
+    waiter.join(timeout=5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("结果", False), ("结果", True)]
+    assert not flight.in_flight("key")
+
+
+def test_leader_exception_is_raised_to_waiters():
+    flight = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError("Cookie已失效")
+
+    async def run():
+        return await asyncio.gather(flight.do("key", func), flight.do("key", func), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not flight.in_flight("key")
+
+
+def test_cancelled_leader_hands_over_to_waiter():
+    flight = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return "结果"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # leader 的取消不会转给等待方，等待方重新执行
+        return await asyncio.wait_for(waiter, timeout=5)
+
+    assert asyncio.run(run()) == ("结果", False)
+    assert len(calls) == 2
+    assert not flight.in_flight("key")
+
+
+def test_concurrent_requests_crawl_once(app, upstream):
+    upstream.totals["1"] = 45
+    upstream.delay = 0.02
+    results = collect_concurrently({}, {}, {})
+    assert [len(comments) for comments, _, _ in results] == [45, 45, 45]
+    assert sorted(coalesced for _, _, coalesced in results) == [False, True, True]
+    # 每页 20 条，只采集了一次
+    assert upstream.calls == 3
+
+
+def test_force_refresh_is_not_merged_with_normal_request(app, upstream):
+    upstream.totals["1"] = 45
+    upstream.delay = 0.02
+    results = collect_concurrently({}, {"force_refresh": True})
+    assert [(cached, coalesced) for _, cached, coalesced in results] == [(False, False), (False, False)]
+
+
+def test_lock_waits_for_other_process_and_reads_its_result(app, upstream, monkeypatch):
+    app.config.update(COLLECT_LOCK_ENABLED=True, COLLECT_CACHE_TTL=0)
+    monkeypatch.setattr(singleflight, "LOCK_POLL_INTERVAL", 0.01)
+    key = "collect:1:100:0"
+    db.session.add(CollectLock(key=key, owner="other", expires_at=datetime.utcnow() + timedelta(seconds=60)))
+    db.session.commit()
+
+    async def other_process():
+        await asyncio.sleep(0.05)
+        CommentService().mark_collected("1", 100, 0)
+        CollectLock.query.filter_by(key=key).delete()
+        db.session.commit()
+
+    async def run():
+        result, _ = await asyncio.gather(CommentService().collect_shared("1"), other_process())
+        return result
+
+    comments, cached, coalesced = asyncio.run(run())
+    # 不受缓存窗口限制，直接返回其他进程等待期间保存的结果
+    assert (comments, cached, coalesced) == ([], True, False)
+    assert upstream.calls == 0
+
+
+def test_lock_is_released_and_expired_lock_is_taken_over(app, upstream):
+    app.config.update(COLLECT_LOCK_ENABLED=True)
+    upstream.totals["1"] = 5
+    key = "collect:1:100:0"
+    db.session.add(CollectLock(key=key, owner="crashed", expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    comments, cached, _ = asyncio.run(CommentService().collect_shared("1"))
+    assert len(comments) == 5 and not cached
+    assert CollectLock.query.count() == 0
+
+    async def hold():
+        async with collect_lock(key) as waited_since:
+            assert waited_since is None
+            assert CollectLock.query.filter_by(key=key).one().owner != "crashed"
+
+    asyncio.run(hold())
+    assert CollectLock.query.count() == 0